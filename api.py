@@ -1,10 +1,31 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-import joblib
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.routing import APIRoute
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from starlette.requests import ClientDisconnect
+from pydantic import BaseModel, Field, ValidationError
 import numpy as np
-import pandas as pd
-from typing import Optional
+from typing import Any, Optional, List
 import os
+import asyncio
+import contextlib
+import copy
+import functools
+import hmac
+import threading
+import time
+from datetime import datetime
+from types import MappingProxyType
+import tree_engine
+from prediction_cache import PredictionCache
+from inference_pool import InferencePool, InferenceOverloaded
+from micro_batcher import MicroBatcher
+from artifact_watcher import ArtifactWatcher, artifact_fingerprint
+import prediction_grid
+import model_bundle
+import feature_transform
+import metrics
 
 # FastAPIアプリケーションの作成
 app = FastAPI(
@@ -13,6 +34,63 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# バッチ予測で受け付ける最大件数（環境変数で変更可能）
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", 10000))
+
+# /predict/stream で1回にまとめて予測する件数の既定値（リクエストの chunk_size で変更可能）
+STREAM_CHUNK_SIZE = int(os.environ.get("STREAM_CHUNK_SIZE", 1000))
+
+# /predict/stream で受け付ける1行の最大バイト数（超えた行はエラーとして返し、改行まで読み捨てる）
+MAX_STREAM_LINE_BYTES = int(os.environ.get("MAX_STREAM_LINE_BYTES", 65536))
+
+# 読み込み時にスケーラーをモデルへ畳み込むかどうか（0で無効）
+FUSE_SCALER = os.environ.get("FUSE_SCALER", "1") != "0"
+
+# 決定木のアンサンブルをNumPyの推論エンジンで評価するかどうか（0で無効）
+TREE_ENGINE = os.environ.get("TREE_ENGINE", "1") != "0"
+
+# 推論エンジンを使う最大行数（これより多い場合はsklearnの方が速い）
+TREE_ENGINE_MAX_BATCH = int(os.environ.get("TREE_ENGINE_MAX_BATCH", 32))
+
+# 予測結果キャッシュの最大件数（0で無効）と有効期限（秒、0で無期限）
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", 10000))
+PREDICTION_CACHE_TTL = float(os.environ.get("PREDICTION_CACHE_TTL", 0))
+
+# グリッドモード: 事前計算した予測値の補間で /predict に応答する（1で有効）
+GRID_MODE = os.environ.get("GRID_MODE", "0") == "1"
+GRID_SETTINGS = {
+    # 補間誤差（対数価格）の上限。超える区間はモデルで予測する
+    'max_error': float(os.environ.get("GRID_MAX_ERROR", 0.01)),
+    'area_min': float(os.environ.get("GRID_AREA_MIN", 10)),
+    'area_max': float(os.environ.get("GRID_AREA_MAX", 10000)),
+    'n_area_points': int(os.environ.get("GRID_AREA_POINTS", 128)),
+    'max_building_year': int(os.environ.get("GRID_MAX_BUILDING_YEAR", 60))
+}
+GRID_FILE = 'models/prediction_grid.npz'
+
+# モデルバンドル（models/model_bundle.joblib）があれば優先して読み込むかどうか（0で無効）
+USE_MODEL_BUNDLE = os.environ.get("MODEL_BUNDLE", "1") != "0"
+
+# 推論の実行モード: inline（イベントループ内）/ thread（スレッドプール）/ process（プロセスプール）
+INFERENCE_MODE = os.environ.get("INFERENCE_MODE", "inline")
+
+# 同時に推論を実行する件数と、実行待ちで受け付ける件数（超えた場合は503を返す）
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", os.cpu_count() or 1))
+INFERENCE_QUEUE_SIZE = int(os.environ.get("INFERENCE_QUEUE_SIZE", 64))
+
+# マイクロバッチ: 同時に届いた /predict をまとめて予測するまでの待ち時間（ミリ秒、0で無効）と最大件数
+MICRO_BATCH_WINDOW_MS = float(os.environ.get("MICRO_BATCH_WINDOW_MS", 0))
+MICRO_BATCH_MAX_SIZE = int(os.environ.get("MICRO_BATCH_MAX_SIZE", 64))
+
+# モデルファイルの変更を確認する間隔（秒、0で監視しない）
+MODEL_RELOAD_INTERVAL = float(os.environ.get("MODEL_RELOAD_INTERVAL", 0))
+
+# 管理用エンドポイント（/admin/reload）のトークン（未設定の場合はエンドポイントを無効にする）
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+
+# リクエスト数・処理時間のメトリクスを記録するかどうか（0で無効、/metrics は有効のまま）
+METRICS_ENABLED = os.environ.get("METRICS", "1") != "0"
+
 # リクエストモデルの定義
 class PropertyRequest(BaseModel):
     district_name: str
@@ -25,103 +103,693 @@ class PropertyResponse(BaseModel):
     predicted_price_log: float
     confidence: str
 
+class BatchPropertyRequest(BaseModel):
+    # 1件ずつ PropertyRequest として検証し、不正な件はバッチ全体ではなくその件の error として返す
+    # （OpenAPIのスキーマには各件の形として PropertyRequest を公開する）
+    properties: List[Any] = Field(json_schema_extra={'items': {'$ref': '#/components/schemas/PropertyRequest'}})
+
+class BatchPredictionResult(BaseModel):
+    index: int
+    predicted_price: Optional[int] = None
+    predicted_price_log: Optional[float] = None
+    confidence: Optional[str] = None
+    error: Optional[str] = None
+
+class BatchPropertyResponse(BaseModel):
+    results: List[BatchPredictionResult]
+    success_count: int
+    error_count: int
+
+# メトリクス（/metrics でPrometheusのテキスト形式で公開する）
+metrics_registry = metrics.MetricsRegistry()
+REQUESTS_TOTAL = metrics_registry.counter(
+    'fukuyama_api_requests_total', 'HTTPリクエスト数', ['endpoint', 'method', 'status']
+)
+REQUEST_ERRORS_TOTAL = metrics_registry.counter(
+    'fukuyama_api_request_errors_total', 'エラー（ステータス400以上）を返したHTTPリクエスト数', ['endpoint', 'method', 'status']
+)
+REQUEST_DURATION = metrics_registry.histogram(
+    'fukuyama_api_request_duration_seconds', 'リクエストの処理時間（秒）', ['endpoint', 'method']
+)
+STAGE_DURATION = metrics_registry.histogram(
+    'fukuyama_api_stage_duration_seconds', '予測の段階ごとの処理時間（秒）', ['endpoint', 'stage']
+)
+MODEL_LOAD_SECONDS = metrics_registry.gauge(
+    'fukuyama_api_model_load_seconds', '直近の load_models の処理時間（秒）'
+)
+
+class MetricsRoute(APIRoute):
+    """
+    リクエスト数・エラー数・処理時間を記録するルート
+    エンドポイントが request_timer().mark() で記録した段階の前後に、
+    リクエストの解析（parse: 本文の読み込みとpydanticの検証）とレスポンスの変換（serialize）の時間を記録する
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        endpoint = self.path
+        method = ','.join(sorted(self.methods))
+
+        async def timed_handler(request: Request):
+            if not METRICS_ENABLED:
+                return await handler(request)
+
+            timer, token = metrics.start_request_timer(STAGE_DURATION, endpoint)
+            status = 500
+            try:
+                response = await handler(request)
+                status = response.status_code
+                if timer.marked():
+                    timer.mark('serialize')
+                return response
+            except StarletteHTTPException as e:
+                status = e.status_code
+                raise
+            except RequestValidationError:
+                status = 422
+                raise
+            finally:
+                metrics.reset_request_timer(token)
+                REQUEST_DURATION.labels(endpoint, method).observe(time.perf_counter() - timer.start)
+                REQUESTS_TOTAL.labels(endpoint, method, str(status)).inc()
+                if status >= 400:
+                    REQUEST_ERRORS_TOTAL.labels(endpoint, method, str(status)).inc()
+
+        return timed_handler
+
+app.router.route_class = MetricsRoute
+
 # モデルとエンコーダーの読み込み
 def load_models():
     """学習済みモデルとエンコーダーを読み込む"""
+    start = time.perf_counter()
     try:
-        # モデル情報の読み込み
-        model_info = joblib.load('models/model_info.pkl')
+        # モデル一式の読み込み（バンドルまたは個別ファイル）
+        artifacts = load_artifacts()
+        model_info = artifacts['model_info']
         
-        # 最良のモデルを読み込み
-        best_model = joblib.load('models/best_model.pkl')
+        # 標準化のパラメータ
+        mean = artifacts['scaler_params']['mean']
+        scale = artifacts['scaler_params']['scale']
+        scale_features = compile_scaler(mean, scale)
+        scaler_fused = False
         
-        # スケーラーを読み込み
-        scaler = joblib.load('models/scaler.pkl')
+        # 決定木のアンサンブルはNumPyの推論エンジンで予測し、
+        # sklearnのモデルは大きなバッチで初めて使う時点まで読み込まない
+        tree_ensemble = load_tree_ensemble(artifacts) if TREE_ENGINE else None
+        if tree_ensemble is not None:
+            if FUSE_SCALER:
+                fused_ensemble = tree_engine.fuse_scaler(tree_ensemble, mean, scale)
+                if verify_fused_model(tree_ensemble, fused_ensemble, mean, scale, scale_features, exact=True):
+                    tree_ensemble = fused_ensemble
+                    scaler_fused = True
+            
+            # 畳み込み済みの場合、sklearnのモデルには標準化してから渡す
+            predictor = LazySklearnModel(artifacts['load_sklearn'], compile_scaler(mean, scale) if scaler_fused else None)
+        else:
+            # スケーラーをモデルに畳み込めれば、推論時の標準化を省略する
+            predictor = artifacts['load_sklearn']()['model']
+            if FUSE_SCALER:
+                fused_model = fuse_scaler(predictor, mean, scale)
+                if fused_model is not None and verify_fused_model(predictor, fused_model, mean, scale, scale_features):
+                    predictor = fused_model
+                    scaler_fused = True
         
-        # エンコーダーを読み込み
-        district_encoder = joblib.load('label_encoders/district_encoder.pkl')
-        type_encoder = joblib.load('label_encoders/type_encoder.pkl')
-        year_encoder = joblib.load('label_encoders/year_encoder.pkl')
+        if scaler_fused:
+            scale_features = skip_scaling
         
-        return {
-            'model': best_model,
-            'scaler': scaler,
-            'district_encoder': district_encoder,
-            'type_encoder': type_encoder,
-            'year_encoder': year_encoder,
+        loaded = {
+            'version': artifacts['version'],
+            'predictor': predictor,
+            'scaler_fused': scaler_fused,
+            'scaler_params': artifacts['scaler_params'],
+            'tree_ensemble': tree_ensemble,
+            'load_sklearn': artifacts['load_sklearn'],
             'feature_columns': model_info['feature_columns'],
-            'model_name': model_info['best_model_name']
+            'model_name': model_info['best_model_name'],
+            'category_lookups': {
+                field: build_category_lookup(classes)
+                for field, classes in artifacts['encoder_classes'].items()
+            },
+            'build_features': compile_feature_builder(model_info['feature_columns']),
+            'scale_features': scale_features
         }
+        
+        # グリッドモードでは予測値のグリッドを読み込む（ない場合は作成して保存）
+        loaded['grid'] = load_or_build_grid(loaded) if GRID_MODE else None
+        
+        MODEL_LOAD_SECONDS.labels().set(time.perf_counter() - start)
+        return loaded
     except FileNotFoundError as e:
         raise HTTPException(status_code=500, detail=f"モデルファイルが見つかりません: {e}")
 
+def load_artifacts() -> dict:
+    """モデル一式を読み込む（バンドルがあればバンドルから、なければ個別ファイルから）"""
+    if USE_MODEL_BUNDLE and os.path.exists(model_bundle.BUNDLE_FILE):
+        if model_bundle.is_bundle_stale():
+            print("モデルバンドルより新しいモデルファイルがあるため、個別ファイルから読み込みます")
+        else:
+            return model_bundle.load_model_bundle()
+    return model_bundle.load_artifact_files()
+
+class LazySklearnModel:
+    """sklearnのモデルで予測する（モデルは最初の予測時に読み込む）"""
+
+    def __init__(self, load_sklearn, scale_features=None):
+        self.load_sklearn = load_sklearn
+        self.scale_features = scale_features
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        model = self.load_sklearn()['model']
+        if self.scale_features is not None:
+            X = self.scale_features(np.array(X, dtype=np.float64))
+        return model.predict(X)
+
+def build_category_lookup(classes) -> MappingProxyType:
+    """LabelEncoderのclasses_から変更不可の 文字列 -> コード 対応表を作成する"""
+    return MappingProxyType({label: code for code, label in enumerate(np.asarray(classes).tolist())})
+
+def compile_feature_builder(feature_columns: List[str]):
+    """
+    特徴量の列順を読み込み時に固定し、float64配列へ直接書き込む関数を作成する
+    （リクエストごとのDataFrame作成と列の並べ替えを省く）
+    """
+    columns = tuple(feature_columns)
+    n_features = len(columns)
+    local = threading.local()
+
+    def build_features(features: dict) -> np.ndarray:
+        # スレッドごとに確保済みのバッファを再利用する
+        buffer = getattr(local, 'buffer', None)
+        if buffer is None:
+            buffer = local.buffer = np.empty((1, n_features), dtype=np.float64)
+        row = buffer[0]
+        for i, column in enumerate(columns):
+            row[i] = features[column]
+        return buffer
+
+    return build_features
+
+def compile_scaler(mean: np.ndarray, scale: np.ndarray):
+    """StandardScalerと同じ計算を行う標準化関数を作成する（入力配列を上書きする）"""
+    mean = np.array(mean, dtype=np.float64)
+    scale = np.array(scale, dtype=np.float64)
+
+    def scale_features(X: np.ndarray) -> np.ndarray:
+        X -= mean
+        X /= scale
+        return X
+
+    return scale_features
+
+def skip_scaling(X: np.ndarray) -> np.ndarray:
+    """標準化済みのモデルを使う場合の何もしない標準化関数"""
+    return X
+
+def fuse_scaler(model, mean: np.ndarray, scale: np.ndarray):
+    """
+    StandardScalerをsklearnのモデルに畳み込んだコピーを作成する（線形モデルの係数と切片を元の特徴量空間に変換する）
+    畳み込めないモデルの場合はNoneを返す
+    決定木系のsklearnのモデルは入力をfloat32に変換して閾値と比較するため、元の特徴量空間の閾値では
+    float32で表せない入力の分岐が標準化した場合と変わることがある。そのため畳み込まない
+    （推論エンジンの配列は tree_engine.fuse_scaler でfloat64の入力と比較する閾値に変換する）
+    """
+    # 線形モデル: w·((x - mean) / scale) + b = (w / scale)·x + (b - w·(mean / scale))
+    if type(model).__name__ in ('LinearRegression', 'Ridge', 'Lasso'):
+        fused_model = copy.deepcopy(model)
+        coef = np.asarray(model.coef_, dtype=np.float64)
+        fused_model.coef_ = coef / scale
+        fused_model.intercept_ = model.intercept_ - np.dot(coef, mean / scale)
+        return fused_model
+
+    return None
+
+def verify_fused_model(model, fused_model, mean: np.ndarray, scale: np.ndarray, scale_features,
+                       exact: bool = False) -> bool:
+    """畳み込んだモデルと元のモデル（標準化あり）の予測が一致するか確認する"""
+    X = tree_engine.make_probe_rows(mean, scale)
+
+    expected = model.predict(scale_features(X.copy()))
+    actual = fused_model.predict(X)
+
+    matched = np.array_equal(actual, expected) if exact else np.allclose(actual, expected, rtol=1e-9, atol=1e-9)
+    if not matched:
+        print(f"スケーラーの畳み込みで予測値が一致しないため無効化します: 最大誤差 {np.max(np.abs(actual - expected)):.3e}")
+    return matched
+
+def load_tree_ensemble(artifacts: dict):
+    """
+    学習時に書き出した決定木の配列を使う（対応していないモデルや、sklearnと一致しない場合はNone）
+    バンドルの配列は作成時に照合済み。個別ファイルの配列やモデルから展開した配列はここで照合する
+    """
+    if artifacts['tree_ensemble'] is not None and artifacts['tree_ensemble_verified']:
+        return tree_engine.TreeEnsemble(artifacts['tree_ensemble'])
+
+    model = artifacts['load_sklearn']()['model']
+    if artifacts['tree_ensemble'] is not None:
+        ensemble = tree_engine.TreeEnsemble(artifacts['tree_ensemble'])
+    else:
+        ensemble = tree_engine.export_tree_ensemble(model)
+    if ensemble is None:
+        return None
+
+    mean = artifacts['scaler_params']['mean']
+    scale = artifacts['scaler_params']['scale']
+    X = compile_scaler(mean, scale)(tree_engine.make_probe_rows(mean, scale))
+    if ensemble.n_features_in_ != X.shape[1] or not np.array_equal(ensemble.predict(X), model.predict(X)):
+        print("決定木の配列がモデルと一致しないため、推論エンジンを無効化します")
+        return None
+    return ensemble
+
+def load_or_build_grid(loaded: dict):
+    """保存済みの予測グリッドを読み込み、モデルや設定が変わっていれば作り直す"""
+    if os.path.exists(GRID_FILE):
+        grid = prediction_grid.load_prediction_grid(GRID_FILE)
+        if grid.matches(loaded['version'], GRID_SETTINGS):
+            return grid
+        print("予測グリッドがモデルまたは設定と一致しないため作り直します")
+
+    lookups = loaded['category_lookups']
+    year_lookup = lookups['building_year_category']
+
+    def predict(district_codes, type_codes, area, building_year):
+        year_codes = np.array([year_lookup.get(c, 0) for c in feature_transform.categorize_building_years(building_year)])
+        features = feature_transform.compute_features(district_codes, type_codes, area, building_year, year_codes)
+        X = feature_transform.feature_matrix(features, loaded['feature_columns'])
+        X_scaled = loaded['scale_features'](X)
+        return loaded['predictor'].predict(X_scaled)
+
+    grid = prediction_grid.build_prediction_grid(
+        predict, len(lookups['district_name']), len(lookups['property_type']), loaded['version'], GRID_SETTINGS,
+        area_breakpoints=tree_area_breakpoints(loaded)
+    )
+    try:
+        prediction_grid.save_prediction_grid(grid, GRID_FILE)
+    except OSError as e:
+        print(f"予測グリッドを保存できませんでした: {e}")
+    return grid
+
+def tree_area_breakpoints(loaded: dict):
+    """
+    決定木系のモデルについて、築年数ごとに予測値が面積方向に変わりうる面積を返す関数を作成する
+    （面積・対数面積・面積×築年数の分岐の閾値を面積に換算したもの）。決定木系以外のモデルの場合はNone
+    """
+    ensemble = loaded['tree_ensemble']
+    if ensemble is None:
+        ensemble = tree_engine.export_tree_ensemble(loaded['predictor'])
+    if ensemble is not None:
+        split_thresholds = lambda j: tree_engine.split_thresholds(ensemble, j)
+    else:
+        # HistGradientBoostingは配列に展開できないため、学習済みの木から閾値を取り出す
+        hist_thresholds = tree_engine.hist_gradient_boosting_split_thresholds(loaded['predictor'])
+        if hist_thresholds is None:
+            return None
+        split_thresholds = lambda j: hist_thresholds.get(j, np.empty(0))
+
+    columns = loaded['feature_columns']
+    mean = loaded['scaler_params']['mean']
+    scale = loaded['scaler_params']['scale']
+
+    def thresholds(column):
+        if column not in columns:
+            return np.empty(0)
+        j = columns.index(column)
+        threshold = split_thresholds(j)
+        # 畳み込んでいない場合、閾値は標準化後の値なので元の特徴量空間に戻す
+        return threshold if loaded['scaler_fused'] else threshold * scale[j] + mean[j]
+
+    fixed = np.concatenate([thresholds('Area'), np.expm1(thresholds('Area_log'))])
+    interaction = thresholds('Area_BuildingYear_interaction')
+
+    def area_breakpoints(building_year):
+        if building_year <= 0:
+            return fixed
+        return np.concatenate([fixed, interaction / building_year])
+
+    return area_breakpoints
+
 # グローバル変数でモデルを保持
+# 再読み込みではこの変数を新しいモデル一式に置き換える。リクエストは最初に参照したモデル一式を最後まで使うため、
+# 処理中の予測は切り替え前のモデルで完了する
 models = None
 
+# 未知のカテゴリ値でフォールバックした件数（項目ごと）
+fallback_counts = {'district_name': 0, 'property_type': 0, 'building_year_category': 0}
+fallback_lock = threading.Lock()
+
+# /predict の予測結果キャッシュ（モデルのバージョンが変わると自動的に破棄される）
+prediction_cache = PredictionCache(
+    PREDICTION_CACHE_SIZE,
+    ttl=PREDICTION_CACHE_TTL if PREDICTION_CACHE_TTL > 0 else None
+)
+
+# モデルの再読み込み（同時に1回だけ実行する）
+reload_lock = asyncio.Lock()
+reload_status = {'reloads': 0, 'failures': 0, 'last_reload_at': None, 'last_error': None}
+
+# モデルファイルの監視（無効の場合はNone）
+artifact_watcher = None
+
+# 切り替え前のモデルの推論プールを停止するタスク
+retiring_tasks = set()
+
+metrics_registry.callback(
+    'fukuyama_api_category_fallbacks_total', '未知のカテゴリ値で0にフォールバックした件数', 'counter', ['field'],
+    lambda: [((field,), count) for field, count in fallback_counts.items()]
+)
+metrics_registry.callback(
+    'fukuyama_api_prediction_cache_lookups_total', '/predict の予測結果キャッシュの参照回数', 'counter', ['result'],
+    lambda: [(('hit',), prediction_cache.hits), (('miss',), prediction_cache.misses)]
+)
+metrics_registry.callback(
+    'fukuyama_api_model_reloads_total', 'モデルの再読み込みの回数', 'counter', ['result'],
+    lambda: [(('success',), reload_status['reloads']), (('failure',), reload_status['failures'])]
+)
+metrics_registry.callback(
+    'fukuyama_api_model_info', '使用中のモデル（値は常に1）', 'gauge', ['model', 'version'],
+    lambda: [((models['model_name'], models['version']), 1)] if models is not None else []
+)
+
+def reload_watch_paths() -> List[str]:
+    """再読み込みの対象として監視するファイル"""
+    return model_bundle.artifact_paths() + [model_bundle.BUNDLE_FILE]
+
+def start_serving(loaded: dict):
+    """モデル一式ごとの推論プール（inlineモードではNone）とマイクロバッチ（無効の場合はNone）を作成する"""
+    inference_pool = None
+    if INFERENCE_MODE != 'inline':
+        inference_pool = InferencePool(
+            INFERENCE_MODE, INFERENCE_WORKERS, INFERENCE_QUEUE_SIZE,
+            predict=functools.partial(predict_log_prices, loaded=loaded), api_file=os.path.abspath(__file__)
+        )
+        inference_pool.start()
+    loaded['inference_pool'] = inference_pool
+
+    micro_batcher = None
+    if MICRO_BATCH_WINDOW_MS > 0:
+        micro_batcher = MicroBatcher(
+            functools.partial(predict_unscaled, loaded=loaded), MICRO_BATCH_WINDOW_MS / 1e3, MICRO_BATCH_MAX_SIZE
+        )
+    loaded['micro_batcher'] = micro_batcher
+
+def describe_models(loaded: dict) -> str:
+    """読み込んだモデルの概要（ログ用）"""
+    return (f"{loaded['model_name']}（バージョン: {loaded['version']}、"
+            f"スケーラー畳み込み: {'有効' if loaded['scaler_fused'] else '無効'}、"
+            f"推論エンジン: {'有効' if loaded['tree_ensemble'] is not None else '無効'}）")
+
 @app.on_event("startup")
 async def startup_event():
     """アプリケーション起動時にモデルを読み込む"""
-    global models
+    global models, artifact_watcher
     try:
-        models = load_models()
-        print(f"モデル読み込み完了: {models['model_name']}")
+        loaded = load_models()
+        loaded['loaded_at'] = time.time()
+        print(f"モデル読み込み完了: {describe_models(loaded)}")
     except Exception as e:
         print(f"モデル読み込みエラー: {e}")
-        models = None
+        loaded = None
 
-def preprocess_input(district_name: str, area: float, building_year: int, property_type: str):
-    """入力データの前処理"""
-    
-    # 築年数のカテゴリ化
-    def categorize_building_year(year):
-        if year == 0:
-            return 'new'
-        elif year <= 5:
-            return 'very_new'
-        elif year <= 10:
-            return 'new'
-        elif year <= 20:
-            return 'medium'
-        elif year <= 30:
-            return 'old'
-        else:
-            return 'very_old'
-    
-    # 特徴量の作成
-    features = {}
-    
-    # 町名のエンコーディング
-    try:
-        features['DistrictName_encoded'] = models['district_encoder'].transform([district_name])[0]
-    except ValueError:
-        # 未知の町名の場合は最も頻度の高い町名で置換
-        features['DistrictName_encoded'] = 0
-    
-    # 建物タイプのエンコーディング
-    try:
-        features['Type_encoded'] = models['type_encoder'].transform([property_type])[0]
-    except ValueError:
-        # 未知のタイプの場合はデフォルト値
-        features['Type_encoded'] = 0
-    
-    # 面積
-    features['Area'] = area
-    features['Area_log'] = np.log1p(area)
-    
-    # 築年数
-    features['BuildingYear'] = building_year
+    if loaded is not None:
+        start_serving(loaded)
+        models = loaded
+        if loaded['inference_pool'] is not None:
+            inference_pool = loaded['inference_pool']
+            print(f"推論の実行モード: {INFERENCE_MODE}（ワーカー: {inference_pool.workers}、待ち行列: {inference_pool.queue_size}）")
+        if loaded['micro_batcher'] is not None:
+            print(f"マイクロバッチ: 有効（待ち時間: {MICRO_BATCH_WINDOW_MS}ms、最大件数: {MICRO_BATCH_MAX_SIZE}）")
+
+    # 起動時に読み込めなかった場合も、ファイルが置かれれば読み込む
+    if MODEL_RELOAD_INTERVAL > 0:
+        artifact_watcher = ArtifactWatcher(reload_watch_paths(), MODEL_RELOAD_INTERVAL, reload_models)
+        artifact_watcher.start()
+        print(f"モデルファイルの監視: 有効（間隔: {MODEL_RELOAD_INTERVAL}秒）")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """アプリケーション終了時にファイルの監視と推論のワーカーを停止する"""
+    global artifact_watcher
+    if artifact_watcher is not None:
+        artifact_watcher.stop()
+        artifact_watcher = None
+    if models is not None and models.get('inference_pool') is not None:
+        models['inference_pool'].shutdown()
+        models['inference_pool'] = None
+
+def load_and_validate_models():
+    """モデル一式を読み込み、試しに予測して使えることを確認する（スレッドで実行される）"""
+    loaded = load_models()
+    return loaded, validate_models(loaded)
+
+def validate_models(loaded: dict):
+    """
+    既知のカテゴリ値で数件を予測し、特徴量の列とモデルが合っていて予測値が有限であることを確認する
+    （試した特徴量行列（標準化済み）と予測値を返す）
+    """
+    lookups = loaded['category_lookups']
+    for field, lookup in lookups.items():
+        if not lookup:
+            raise ValueError(f"エンコーダーのカテゴリがありません: {field}")
+
+    area = np.array([50.0, 200.0, 1000.0])
+    building_year = np.array([0.0, 15.0, 40.0])
+    X = preprocess_columns(
+        [next(iter(lookups['district_name']))] * len(area), area, building_year,
+        [next(iter(lookups['property_type']))] * len(area), loaded
+    )
+    X_scaled = loaded['scale_features'](X)
+    predictions = np.asarray(predict_log_prices(X_scaled, loaded))
+    if predictions.shape != (len(area),) or not np.isfinite(predictions).all():
+        raise ValueError(f"試しに予測した値が不正です: {predictions}")
+    return X_scaled, predictions
+
+async def reload_models() -> dict:
+    """
+    モデル一式をバックグラウンドで読み込み・検証し、問題がなければ切り替える
+    （失敗した場合は例外を送出し、現在のモデルを使い続ける）
+    """
+    global models
+    async with reload_lock:
+        previous = models
+        fingerprint = artifact_fingerprint(reload_watch_paths())
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            loaded, (X_scaled, expected) = await loop.run_in_executor(None, load_and_validate_models)
+            if previous is not None and loaded['version'] == previous['version']:
+                if artifact_watcher is not None:
+                    artifact_watcher.current = fingerprint
+                return {"status": "unchanged", "model": previous['model_name'], "model_version": previous['version']}
+
+            start_serving(loaded)
+            # プールのワーカー（processモードでは別プロセスで読み込んだモデル）でも同じ予測値になることを確認する
+            if loaded['inference_pool'] is not None:
+                try:
+                    actual = await loaded['inference_pool'].run(X_scaled)
+                    if not np.allclose(actual, expected, rtol=1e-9, atol=1e-9):
+                        raise ValueError("推論ワーカーの予測値が読み込んだモデルと一致しません")
+                except BaseException:
+                    await loop.run_in_executor(None, loaded['inference_pool'].shutdown)
+                    raise
+        except Exception as e:
+            reload_status['failures'] += 1
+            reload_status['last_error'] = str(getattr(e, 'detail', e))
+            raise
+
+        # 切り替え（以降に届いたリクエストは新しいモデルを使う）
+        loaded['loaded_at'] = time.time()
+        models = loaded
+        reload_status['reloads'] += 1
+        reload_status['last_reload_at'] = loaded['loaded_at']
+        reload_status['last_error'] = None
+        if artifact_watcher is not None:
+            artifact_watcher.current = fingerprint
+        load_seconds = time.perf_counter() - start
+        print(f"モデルを再読み込みしました（{load_seconds:.2f}秒）: {describe_models(loaded)}")
+
+        if previous is not None:
+            task = asyncio.ensure_future(retire_models(previous))
+            retiring_tasks.add(task)
+            task.add_done_callback(retiring_tasks.discard)
+
+        return {
+            "status": "reloaded",
+            "model": loaded['model_name'],
+            "model_version": loaded['version'],
+            "previous_version": previous['version'] if previous is not None else None,
+            "load_seconds": load_seconds
+        }
+
+async def retire_models(loaded: dict):
+    """切り替え前のモデルで処理中の予測（マイクロバッチの待機分を含む）が終わってから推論プールを停止する"""
+    inference_pool = loaded.get('inference_pool')
+    micro_batcher = loaded.get('micro_batcher')
+    while ((inference_pool is not None and inference_pool.in_flight)
+           or (micro_batcher is not None and not micro_batcher.idle())):
+        await asyncio.sleep(0.05)
+    if inference_pool is not None:
+        await asyncio.get_running_loop().run_in_executor(None, inference_pool.shutdown)
+
+def preprocess_input(district_name: str, area: float, building_year: int, property_type: str, loaded: dict = None):
+    """入力データの前処理（特徴量の列名 -> 値 の辞書を返す）"""
     
-    # 築年数カテゴリのエンコーディング
-    year_category = categorize_building_year(building_year)
+    # 町名・建物タイプ・築年数カテゴリのエンコーディング（未知の値は0）
+    year_category = feature_transform.categorize_building_year(building_year)
+    return feature_transform.compute_features(
+        lookup_category('district_name', district_name, loaded),
+        lookup_category('property_type', property_type, loaded),
+        area,
+        building_year,
+        lookup_category('building_year_category', year_category, loaded)
+    )
+
+def lookup_category(field: str, value, loaded: dict = None) -> int:
+    """対応表でカテゴリ値をコードに変換する（未知の値は例外を出さず0にフォールバック）"""
+    code = (models if loaded is None else loaded)['category_lookups'][field].get(value)
+    if code is None:
+        with fallback_lock:
+            fallback_counts[field] += 1
+        return 0
+    return code
+
+def lookup_categories(field: str, values, loaded: dict = None) -> np.ndarray:
+    """対応表で複数のカテゴリ値をまとめてコードに変換する（未知の値は0）"""
+    table = (models if loaded is None else loaded)['category_lookups'][field]
+    codes = np.fromiter((table.get(value, -1) for value in values), dtype=np.int64, count=len(values))
+    unknown = codes < 0
+    n_unknown = int(unknown.sum())
+    if n_unknown:
+        codes[unknown] = 0
+        with fallback_lock:
+            fallback_counts[field] += n_unknown
+    return codes
+
+def preprocess_batch(requests: List[PropertyRequest], loaded: dict = None) -> np.ndarray:
+    """複数件の入力データをまとめて前処理し、特徴量行列を返す"""
+    return preprocess_columns(
+        [r.district_name for r in requests],
+        np.array([r.area for r in requests], dtype=np.float64),
+        np.array([r.building_year for r in requests], dtype=np.float64),
+        [r.property_type for r in requests],
+        loaded
+    )
+
+def preprocess_columns(district_names, area: np.ndarray, building_year: np.ndarray, property_types,
+                       loaded: dict = None) -> np.ndarray:
+    """列ごとの入力データ（町名・面積・築年数・建物タイプ）をまとめて前処理し、特徴量行列を返す"""
+    if loaded is None:
+        loaded = models
+
+    # 町名・建物タイプ・築年数カテゴリのエンコーディング（未知の値は0）
+    district_codes = lookup_categories('district_name', district_names, loaded)
+    type_codes = lookup_categories('property_type', property_types, loaded)
+    year_category_codes = lookup_categories(
+        'building_year_category', feature_transform.categorize_building_years(building_year), loaded
+    )
+
+    features = feature_transform.compute_features(district_codes, type_codes, area, building_year, year_category_codes)
+    return feature_transform.feature_matrix(features, loaded['feature_columns'])
+
+def predict_log_prices(X: np.ndarray, loaded: dict = None) -> np.ndarray:
+    """対数価格を予測する（少数行はNumPyの推論エンジン、多数行はsklearnで評価）"""
+    if loaded is None:
+        loaded = models
+    ensemble = loaded['tree_ensemble']
+    if ensemble is not None and len(X) <= TREE_ENGINE_MAX_BATCH:
+        return ensemble.predict(X)
+    return loaded['predictor'].predict(X)
+
+async def run_inference(X: np.ndarray, loaded: dict = None) -> np.ndarray:
+    """対数価格を予測する（プールがあればイベントループの外で実行し、埋まっていれば503）"""
+    if loaded is None:
+        loaded = models
+    inference_pool = loaded.get('inference_pool')
+    if inference_pool is None:
+        return predict_log_prices(X, loaded)
     try:
-        features['BuildingYear_category_encoded'] = models['year_encoder'].transform([year_category])[0]
-    except ValueError:
-        features['BuildingYear_category_encoded'] = 0
-    
-    # 交互作用項
-    features['Area_BuildingYear_interaction'] = area * building_year
-    
-    return features
+        return await inference_pool.run(X)
+    except InferenceOverloaded as e:
+        raise HTTPException(status_code=503, detail=f"混雑しています: {e}", headers={"Retry-After": "1"})
+
+async def predict_unscaled(X: np.ndarray, loaded: dict = None) -> np.ndarray:
+    """標準化前の特徴量行列から対数価格を予測する（マイクロバッチから呼ばれる）"""
+    if loaded is None:
+        loaded = models
+    return await run_inference(loaded['scale_features'](X), loaded)
+
+def make_cache_key(request: PropertyRequest) -> tuple:
+    """キャッシュのキーとして入力を正規化したタプルを作成する"""
+    return (request.district_name, float(request.area), int(request.building_year), request.property_type)
+
+def calculate_confidence(price_log_pred: float) -> str:
+    """予測値から信頼度を計算する（簡易版）"""
+    return "high" if 0.7 <= abs(price_log_pred) <= 2.0 else "medium" if 0.5 <= abs(price_log_pred) <= 2.5 else "low"
+
+def calculate_confidences(price_log_preds: np.ndarray) -> np.ndarray:
+    """予測値の配列からまとめて信頼度を計算する（calculate_confidenceと同じ基準）"""
+    magnitude = np.abs(price_log_preds)
+    conditions = [
+        (magnitude >= 0.7) & (magnitude <= 2.0),
+        (magnitude >= 0.5) & (magnitude <= 2.5)
+    ]
+    return np.select(conditions, ['high', 'medium'], default='low').astype(object)
+
+async def score_properties(properties: List[PropertyRequest], start_index: int = 0) -> List[BatchPredictionResult]:
+    """複数件をまとめて予測し、1件ずつの結果を返す（不正な入力の行はエラーとして扱う）"""
+    results = [BatchPredictionResult(index=start_index + i) for i in range(len(properties))]
+    # 予測の途中でモデルが切り替わっても、全件を同じモデルで予測する
+    loaded = models
+    timer = metrics.request_timer()
+
+    if properties:
+        # 全件の特徴量を一括で作成
+        X = preprocess_batch(properties, loaded)
+        timer.mark('preprocess_input')
+
+        # 不正な特徴量を含む行は個別にエラーとして扱う
+        valid = np.isfinite(X).all(axis=1)
+        for i in np.flatnonzero(~valid):
+            results[i].error = "特徴量に不正な値が含まれています（面積・築年数を確認してください）"
+
+        price_log_preds = np.full(len(X), np.nan)
+        remaining = valid.copy()
+
+        # グリッドモードでは補間できた行はモデルを呼び出さない
+        if loaded['grid'] is not None:
+            column = loaded['feature_columns'].index
+            grid_preds, found = loaded['grid'].lookup_many(
+                X[:, column('DistrictName_encoded')],
+                X[:, column('Type_encoded')],
+                X[:, column('Area')],
+                X[:, column('BuildingYear')]
+            )
+            found &= valid
+            price_log_preds[found] = grid_preds[found]
+            remaining &= ~found
+            timer.mark('grid_lookup')
+
+        if remaining.any():
+            # 標準化と予測を1回の呼び出しで行う
+            X_scaled = loaded['scale_features'](X[remaining])
+            timer.mark('scale')
+            price_log_preds[remaining] = await run_inference(X_scaled, loaded)
+            timer.mark('predict')
+
+        if valid.any():
+            with np.errstate(over='ignore', invalid='ignore'):
+                price_preds = np.expm1(price_log_preds)
+
+            for i in np.flatnonzero(valid):
+                price_log_pred, price_pred = price_log_preds[i], price_preds[i]
+                if not np.isfinite(price_pred):
+                    results[i].error = "予測価格が範囲外です"
+                    continue
+                results[i].predicted_price = int(price_pred)
+                results[i].predicted_price_log = float(price_log_pred)
+                results[i].confidence = calculate_confidence(price_log_pred)
+            timer.mark('postprocess')
+
+    return results
 
 @app.get("/")
 async def root():
@@ -131,7 +799,11 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "predict": "/predict - 価格予測",
+            "predict_batch": "/predict/batch - 一括価格予測",
+            "predict_stream": "/predict/stream - NDJSONでの大量価格予測",
             "health": "/health - ヘルスチェック",
+            "metrics": "/metrics - Prometheus形式のメトリクス",
+            "admin_reload": "/admin/reload - モデルの再読み込み（要 X-Admin-Token）",
             "docs": "/docs - API仕様書"
         }
     }
@@ -139,53 +811,301 @@ async def root():
 @app.get("/health")
 async def health_check():
     """ヘルスチェックエンドポイント"""
-    if models is None:
-        return {"status": "unhealthy", "message": "モデルが読み込まれていません"}
-    return {"status": "healthy", "model": models['model_name']}
+    loaded = models
+    if loaded is None:
+        return {"status": "unhealthy", "message": "モデルが読み込まれていません", "reload": reload_info()}
+    inference_pool = loaded.get('inference_pool')
+    micro_batcher = loaded.get('micro_batcher')
+    return {
+        "status": "healthy",
+        "model": loaded['model_name'],
+        "model_version": loaded['version'],
+        "model_loaded_at": format_timestamp(loaded.get('loaded_at')),
+        "reload": reload_info(),
+        "fallback_counts": dict(fallback_counts),
+        "cache": prediction_cache.stats(),
+        "grid": loaded['grid'].info() if loaded['grid'] is not None else None,
+        "inference": inference_pool.stats() if inference_pool is not None else {"mode": "inline"},
+        "micro_batch": micro_batcher.stats() if micro_batcher is not None else None
+    }
+
+def format_timestamp(timestamp: Optional[float]) -> Optional[str]:
+    """UNIX時刻をタイムゾーン付きのISO 8601形式にする"""
+    return datetime.fromtimestamp(timestamp).astimezone().isoformat(timespec='seconds') if timestamp else None
+
+def reload_info() -> dict:
+    """モデルの再読み込みの状況"""
+    return {
+        "in_progress": reload_lock.locked(),
+        "reloads": reload_status['reloads'],
+        "failures": reload_status['failures'],
+        "last_reload_at": format_timestamp(reload_status['last_reload_at']),
+        "last_error": reload_status['last_error'],
+        "watch_interval": MODEL_RELOAD_INTERVAL if MODEL_RELOAD_INTERVAL > 0 else None
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """リクエスト数・エラー数・段階ごとの処理時間などをPrometheusのテキスト形式で返す"""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.post("/admin/reload")
+async def admin_reload(x_admin_token: Optional[str] = Header(None)):
+    """
+    モデルとエンコーダーを読み込み直し、検証できた場合だけ切り替える
+    （処理中の予測は切り替え前のモデルで完了する。失敗した場合は現在のモデルを使い続ける）
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="管理用エンドポイントは無効です（環境変数 ADMIN_TOKEN を設定してください）")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8')):
+        raise HTTPException(status_code=401, detail="管理用トークンが正しくありません")
+    if reload_lock.locked():
+        raise HTTPException(status_code=409, detail="モデルを再読み込み中です")
+
+    try:
+        return await reload_models()
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"モデルの再読み込みに失敗しました（現在のモデルを使い続けます）: {getattr(e, 'detail', e)}"
+        )
 
 @app.post("/predict", response_model=PropertyResponse)
 async def predict_price(request: PropertyRequest):
     """不動産価格を予測する"""
     
-    if models is None:
+    # 段階ごとの処理時間（前の段階の終わりからの時間）を記録する
+    timer = metrics.request_timer()
+    timer.mark('parse')
+    
+    # 予測の途中でモデルが切り替わっても、このリクエストは同じモデルで予測する
+    loaded = models
+    if loaded is None:
         raise HTTPException(status_code=500, detail="モデルが読み込まれていません")
     
+    # 同じ入力の予測結果があればそのまま返す
+    cache_key = make_cache_key(request)
+    cached_response = prediction_cache.get(cache_key, loaded['version'])
+    timer.mark('cache_lookup')
+    if cached_response is not None:
+        return cached_response
+    
     try:
         # 入力データの前処理
         features = preprocess_input(
             request.district_name,
             request.area,
             request.building_year,
-            request.property_type
+            request.property_type,
+            loaded
         )
+        timer.mark('preprocess_input')
         
-        # 特徴量をDataFrameに変換
-        feature_df = pd.DataFrame([features])
+        # グリッドモードでは事前計算した予測値を補間する（範囲外・誤差の大きい区間はNone）
+        price_log_pred = None
+        if loaded['grid'] is not None:
+            price_log_pred = loaded['grid'].lookup(
+                features['DistrictName_encoded'],
+                features['Type_encoded'],
+                request.area,
+                request.building_year
+            )
+            timer.mark('grid_lookup')
         
-        # 特徴量の順序を調整
-        X = feature_df[models['feature_columns']]
-        
-        # 特徴量の標準化
-        X_scaled = models['scaler'].transform(X)
-        
-        # 予測（対数変換された価格）
-        price_log_pred = models['model'].predict(X_scaled)[0]
+        if price_log_pred is None:
+            # 読み込み時に固定した列順でfloat64配列に変換
+            X = loaded['build_features'](features)
+            timer.mark('build_features')
+            
+            micro_batcher = loaded.get('micro_batcher')
+            if micro_batcher is not None:
+                # 同時に届いた他のリクエストとまとめて標準化・予測する
+                price_log_pred = await micro_batcher.submit(X)
+                timer.mark('micro_batch')
+            else:
+                # 特徴量の標準化
+                X_scaled = loaded['scale_features'](X)
+                timer.mark('scale')
+                
+                # 予測（対数変換された価格）
+                price_log_pred = (await run_inference(X_scaled, loaded))[0]
+                timer.mark('predict')
         
         # 元の価格に変換
         price_pred = np.expm1(price_log_pred)
         
         # 信頼度の計算（簡易版）
-        confidence = "high" if 0.7 <= abs(price_log_pred) <= 2.0 else "medium" if 0.5 <= abs(price_log_pred) <= 2.5 else "low"
+        confidence = calculate_confidence(price_log_pred)
         
-        return PropertyResponse(
+        response = PropertyResponse(
             predicted_price=int(price_pred),
             predicted_price_log=float(price_log_pred),
             confidence=confidence
         )
+        prediction_cache.put(cache_key, response, loaded['version'])
+        
+        return response
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"予測エラー: {str(e)}")
 
+@app.post("/predict/batch", response_model=BatchPropertyResponse)
+async def predict_price_batch(request: BatchPropertyRequest):
+    """複数の不動産価格をまとめて予測する"""
+
+    if models is None:
+        raise HTTPException(status_code=500, detail="モデルが読み込まれていません")
+
+    if len(request.properties) > BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"バッチサイズが上限を超えています: {len(request.properties)} > {BATCH_MAX_SIZE}"
+        )
+
+    try:
+        results = [None] * len(request.properties)
+        properties = []
+        property_indices = []
+        for i, item in enumerate(request.properties):
+            try:
+                properties.append(PropertyRequest.model_validate(item))
+                property_indices.append(i)
+            except ValidationError as e:
+                results[i] = BatchPredictionResult(index=i, error=f"入力が不正です: {e.errors()[0]['msg']}")
+        metrics.request_timer().mark('parse')
+
+        for result, i in zip(await score_properties(properties), property_indices):
+            result.index = i
+            results[i] = result
+
+        error_count = sum(1 for result in results if result.error is not None)
+
+        return BatchPropertyResponse(
+            results=results,
+            success_count=len(results) - error_count,
+            error_count=error_count
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"予測エラー: {str(e)}")
+
+@app.post("/predict/stream")
+async def predict_price_stream(request: Request, chunk_size: int = STREAM_CHUNK_SIZE):
+    """
+    NDJSON（1行に1件のPropertyRequest）を受け取り、chunk_size 件ごとに予測してNDJSONで返す
+    入力を読みながら結果を返すため、件数が多くてもメモリ使用量は一定
+    """
+
+    if models is None:
+        raise HTTPException(status_code=500, detail="モデルが読み込まれていません")
+
+    if not 1 <= chunk_size <= BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"chunk_sizeは1以上{BATCH_MAX_SIZE}以下で指定してください: {chunk_size}"
+        )
+
+    return RequestStreamingResponse(
+        stream_predictions(request.stream(), chunk_size),
+        media_type="application/x-ndjson"
+    )
+
+class RequestStreamingResponse(StreamingResponse):
+    """
+    リクエスト本文を読みながら返すStreamingResponse
+    （StreamingResponseの切断の監視はリクエスト本文のメッセージを読み捨ててしまうため行わない。
+    切断は書き込み時の OSError（ASGI 2.4以降のサーバー）と本文の読み込み時の ClientDisconnect で検出する）
+    """
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.stream_response(send)
+        except (OSError, ClientDisconnect):
+            # クライアントが切断した場合は、残りの本文を読まずに予測を打ち切る
+            print("クライアントが切断したため、ストリーミング予測を打ち切りました")
+        finally:
+            await self.body_iterator.aclose()
+
+async def stream_predictions(body, chunk_size: int):
+    """受信したNDJSONを chunk_size 件ずつ予測し、結果の行を順に返す"""
+    index = 0
+    properties = []
+    property_indices = []
+    parse_errors = []
+
+    async def flush():
+        # 解析できなかった行と予測した行を入力の順番で出力する
+        results = list(parse_errors)
+        if properties:
+            try:
+                scored = await score_properties(properties)
+            except HTTPException as e:
+                scored = [BatchPredictionResult(index=0, error=str(e.detail)) for _ in properties]
+            except Exception as e:
+                scored = [BatchPredictionResult(index=0, error=f"予測エラー: {str(e)}") for _ in properties]
+            for result, property_index in zip(scored, property_indices):
+                result.index = property_index
+                results.append(result)
+        results.sort(key=lambda result: result.index)
+
+        properties.clear()
+        property_indices.clear()
+        parse_errors.clear()
+        return ''.join(result.model_dump_json() + '\n' for result in results)
+
+    def parse(line: bytes):
+        nonlocal index
+        try:
+            properties.append(PropertyRequest.model_validate_json(line))
+            property_indices.append(index)
+        except ValidationError as e:
+            parse_errors.append(BatchPredictionResult(index=index, error=f"入力が不正です: {e.errors()[0]['msg']}"))
+        index += 1
+
+    def reject_line():
+        nonlocal index
+        parse_errors.append(BatchPredictionResult(
+            index=index, error=f"1行が長すぎます（上限: {MAX_STREAM_LINE_BYTES}バイト）"
+        ))
+        index += 1
+
+    buffer = b''
+    # 上限を超えた行の残りを改行まで読み捨てている間はTrue
+    skipping = False
+    async with contextlib.aclosing(body):
+        async for data in body:
+            buffer += data
+            *lines, buffer = buffer.split(b'\n')
+            for line in lines:
+                if skipping:
+                    skipping = False
+                elif len(line) > MAX_STREAM_LINE_BYTES:
+                    reject_line()
+                elif line.strip():
+                    parse(line)
+                if len(properties) + len(parse_errors) >= chunk_size:
+                    yield await flush()
+
+            # 改行が来ないまま上限を超えた場合は、その行をエラーにしてバッファを空にする
+            if len(buffer) > MAX_STREAM_LINE_BYTES:
+                if not skipping:
+                    reject_line()
+                    skipping = True
+                buffer = b''
+                if len(properties) + len(parse_errors) >= chunk_size:
+                    yield await flush()
+
+    # 最後の行が改行で終わっていない場合
+    if buffer.strip() and not skipping:
+        parse(buffer)
+
+    if properties or parse_errors:
+        yield await flush()
+
 @app.get("/districts")
 async def get_districts():
     """利用可能な町名のリストを取得"""
@@ -193,7 +1113,7 @@ async def get_districts():
         raise HTTPException(status_code=500, detail="モデルが読み込まれていません")
     
     try:
-        districts = models['district_encoder'].classes_.tolist()
+        districts = list(models['category_lookups']['district_name'])
         return {"districts": districts}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"町名リスト取得エラー: {str(e)}")
@@ -205,7 +1125,7 @@ async def get_property_types():
         raise HTTPException(status_code=500, detail="モデルが読み込まれていません")
     
     try:
-        types = models['type_encoder'].classes_.tolist()
+        types = list(models['category_lookups']['property_type'])
         return {"property_types": types}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"建物タイプリスト取得エラー: {str(e)}")
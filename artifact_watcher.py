@@ -0,0 +1,67 @@
+"""
+学習済みファイル（models/ と label_encoders/）の変更の監視
+
+一定間隔でファイルの更新時刻とサイズを確認し、変更があればコールバック（再読み込み）を呼び出す。
+学習の途中で書き込み中のファイルを読み込まないよう、変更を検知した後、
+次の確認でも同じ状態（書き込みが終わっている）であることを確かめてから呼び出す
+"""
+
+import asyncio
+import os
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+def artifact_fingerprint(paths: List[str]) -> Tuple:
+    """ファイルごとの（パス, 更新時刻, サイズ）のタプル（存在しないファイルは時刻・サイズがNone）"""
+    fingerprint = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            fingerprint.append((path, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            fingerprint.append((path, None, None))
+    return tuple(fingerprint)
+
+class ArtifactWatcher:
+    """ファイルの変更を監視し、変更が落ち着いた時点で on_change を呼び出す"""
+
+    def __init__(self, paths: List[str], interval: float, on_change: Callable[[], Awaitable]):
+        self.paths = list(paths)
+        self.interval = interval
+        self.on_change = on_change
+        # 読み込み済みのファイルの状態（再読み込みした側が更新する）
+        self.current = artifact_fingerprint(self.paths)
+        self._task: Optional[asyncio.Task] = None
+        self.changes = 0
+
+    def start(self):
+        """監視を開始する（イベントループ内で呼び出す）"""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        """監視を停止する"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        pending = None
+        while True:
+            await asyncio.sleep(self.interval)
+            fingerprint = artifact_fingerprint(self.paths)
+            if fingerprint == self.current:
+                pending = None
+                continue
+            if fingerprint != pending:
+                # 変更を検知した（書き込みが続いている可能性があるため次の確認まで待つ）
+                pending = fingerprint
+                continue
+
+            pending = None
+            self.changes += 1
+            try:
+                await self.on_change()
+            except Exception as e:
+                print(f"モデルファイルの変更を検知しましたが、再読み込みに失敗しました: {e}")
+            # 失敗した場合も同じファイルの状態では再試行しない（次に変更されたときに読み込む）
+            self.current = fingerprint
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+物件ファイルの一括価格予測（HTTPを経由しないオフライン実行）
+
+CSVまたはParquetの物件ファイルをチャンクごとに読み込み、APIと同じ前処理・モデルで予測して、
+結果を読み込んだ順にCSV / NDJSON / Parquetへ書き出す。
+予測は複数のプロセスに分担させる。モデルは親プロセスで load_models により1回だけ読み込み、
+fork したワーカーはそれをコピーオンライトで共有する（ワーカーごとにモデルを復元しない）
+
+入力ファイルの列:
+    district_name, area, building_year, property_type（省略時は "宅地(土地と建物)"）
+
+実行方法:
+    python batch_predict.py properties.csv predictions.csv
+    python batch_predict.py properties.parquet predictions.ndjson --workers 8 --chunk-size 50000
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_PROPERTY_TYPE = "宅地(土地と建物)"
+
+# api.py（親プロセスで読み込み、forkしたワーカーに引き継ぐ）
+api = None
+
+def load_api():
+    """api.pyを読み込み、モデルを読み込む"""
+    global api
+    from app import api as module
+    module.models = module.load_models()
+    api = module
+
+def read_chunks(file_path: str, chunk_size: int):
+    """入力ファイルを chunk_size 行ずつのDataFrameとして読み込む"""
+    if file_path.endswith('.parquet'):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquetファイルの読み込みには pyarrow が必要です: pip install pyarrow")
+        for batch in pq.ParquetFile(file_path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(
+            file_path, chunksize=chunk_size, dtype={'district_name': str, 'property_type': str}
+        )
+
+def score_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    """1チャンク分を前処理・予測する（ワーカープロセスで実行される）"""
+    missing = [column for column in ['district_name', 'area', 'building_year'] if column not in chunk.columns]
+    if missing:
+        raise ValueError(f"入力ファイルに必要な列がありません: {missing}")
+
+    if 'property_type' in chunk.columns:
+        property_types = chunk['property_type'].fillna(DEFAULT_PROPERTY_TYPE)
+    else:
+        property_types = pd.Series(DEFAULT_PROPERTY_TYPE, index=chunk.index)
+    area = pd.to_numeric(chunk['area'], errors='coerce').to_numpy(dtype=np.float64)
+    building_year = pd.to_numeric(chunk['building_year'], errors='coerce').to_numpy(dtype=np.float64)
+
+    # APIの一括予測と同じ前処理（/predict の preprocess_input と同じ特徴量になる）
+    X = api.preprocess_columns(chunk['district_name'].tolist(), area, building_year, property_types.tolist())
+
+    has_district = chunk['district_name'].notna().to_numpy()
+    valid = np.isfinite(X).all(axis=1) & has_district
+    price_log_preds = np.full(len(X), np.nan)
+    if valid.any():
+        price_log_preds[valid] = api.predict_log_prices(api.models['scale_features'](X[valid]))
+
+    with np.errstate(over='ignore', invalid='ignore'):
+        price_preds = np.expm1(price_log_preds)
+    predicted = np.isfinite(price_preds)
+
+    result = chunk.copy()
+    result['predicted_price'] = pd.array(np.where(predicted, np.trunc(price_preds), np.nan), dtype='Int64')
+    result['predicted_price_log'] = np.where(predicted, price_log_preds, np.nan)
+    result['confidence'] = np.where(predicted, api.calculate_confidences(price_log_preds), None)
+    result['error'] = np.select(
+        [~has_district, ~valid, ~predicted],
+        ["町名がありません", "特徴量に不正な値が含まれています（面積・築年数を確認してください）", "予測価格が範囲外です"],
+        default=None
+    )
+    return result
+
+class PredictionWriter:
+    """予測結果を出力ファイルに順に追記する（拡張子で形式を選ぶ）"""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.parquet_writer = None
+        self.first = True
+        if file_path.endswith('.parquet'):
+            self.format = 'parquet'
+        elif file_path.endswith(('.ndjson', '.jsonl')):
+            self.format = 'ndjson'
+        else:
+            self.format = 'csv'
+
+    def write(self, result: pd.DataFrame):
+        """1チャンク分の予測結果を追記する"""
+        if self.format == 'csv':
+            result.to_csv(self.file_path, mode='w' if self.first else 'a', header=self.first, index=False)
+        elif self.format == 'ndjson':
+            # to_jsonは小数を丸めるため、予測値を正確に残せるjson.dumpsで書き出す
+            records = result.astype(object).where(result.notna(), None).to_dict(orient='records')
+            with open(self.file_path, 'w' if self.first else 'a', encoding='utf-8') as f:
+                f.writelines(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(result, preserve_index=False)
+            if self.parquet_writer is None:
+                self.parquet_writer = pq.ParquetWriter(self.file_path, table.schema)
+            self.parquet_writer.write_table(table)
+        self.first = False
+
+    def close(self):
+        """出力ファイルを閉じる"""
+        if self.parquet_writer is not None:
+            self.parquet_writer.close()
+
+def make_executor(workers: int) -> ProcessPoolExecutor:
+    """ワーカープロセスを作成する（forkできない環境ではワーカーごとにモデルを読み込む）"""
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'))
+    return ProcessPoolExecutor(max_workers=workers, initializer=load_api)
+
+def main():
+    parser = argparse.ArgumentParser(description='物件ファイルの一括価格予測')
+    parser.add_argument('input', help='入力ファイル（.csv / .parquet）')
+    parser.add_argument('output', help='出力ファイル（.csv / .ndjson / .parquet）')
+    parser.add_argument('--chunk-size', type=int, default=50000, help='1回に読み込み・予測する行数')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='予測を行うプロセス数')
+    args = parser.parse_args()
+
+    # api.py はモデルファイルをプロジェクトルートからの相対パスで読み込む
+    input_path = os.path.abspath(args.input)
+    output_path = os.path.abspath(args.output)
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    load_api()
+    # sklearnのモデルを使う場合は、forkする前に読み込んでワーカーと共有する
+    if api.models['tree_ensemble'] is None or args.chunk_size > api.TREE_ENGINE_MAX_BATCH:
+        api.models['load_sklearn']()
+
+    writer = PredictionWriter(output_path)
+    start = time.perf_counter()
+    counts = {'rows': 0, 'errors': 0}
+
+    def write_result(future):
+        result = future.result()
+        writer.write(result)
+        counts['rows'] += len(result)
+        counts['errors'] += int(result['error'].notna().sum())
+        print(f"{counts['rows']:,} 行 ({counts['rows'] / (time.perf_counter() - start):,.0f} 行/秒)", file=sys.stderr)
+
+    with make_executor(args.workers) as executor:
+        # 読み込みが予測より先行しすぎないよう、処理中のチャンク数を制限する
+        pending = deque()
+        for chunk in read_chunks(input_path, args.chunk_size):
+            pending.append(executor.submit(score_chunk, chunk))
+            if len(pending) >= args.workers * 2:
+                write_result(pending.popleft())
+        while pending:
+            write_result(pending.popleft())
+
+    writer.close()
+    elapsed = time.perf_counter() - start
+    print(f"予測完了: {counts['rows']:,} 行（エラー {counts['errors']:,} 行）、{elapsed:.1f}秒、"
+          f"{counts['rows'] / elapsed:,.0f} 行/秒（ワーカー: {args.workers}）")
+    print(f"出力ファイル: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+オフライン一括予測（batch_predict.py）のワーカー数ごとのスループットを計測する
+
+合成した物件のCSVを作成し、ワーカー数を 1, 2, 4, ... と増やして batch_predict.py を実行し、
+1秒あたりの処理行数と1ワーカーに対する速度向上率を表示する
+
+実行方法:
+    python benchmarks/bench_batch_predict.py
+    python benchmarks/bench_batch_predict.py --rows 2000000 --workers 1 2 4 8
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from common import ROOT_DIR
+
+def make_input(file_path: str, n_rows: int):
+    """学習済みエンコーダーの町名・建物タイプを使って合成した物件のCSVを作成する"""
+    districts = joblib.load(os.path.join(ROOT_DIR, 'label_encoders', 'district_encoder.pkl')).classes_
+    types = joblib.load(os.path.join(ROOT_DIR, 'label_encoders', 'type_encoder.pkl')).classes_
+    rng = np.random.default_rng(0)
+    pd.DataFrame({
+        'district_name': rng.choice(districts, n_rows),
+        'area': rng.uniform(10, 3000, n_rows).round(1),
+        'building_year': rng.integers(0, 60, n_rows),
+        'property_type': rng.choice(types, n_rows)
+    }).to_csv(file_path, index=False)
+
+def run_batch_predict(input_path: str, output_path: str, workers: int, chunk_size: int) -> float:
+    """batch_predict.py を実行し、報告された1秒あたりの処理行数を返す"""
+    result = subprocess.run(
+        [sys.executable, 'batch_predict.py', input_path, output_path,
+         '--workers', str(workers), '--chunk-size', str(chunk_size)],
+        cwd=ROOT_DIR, capture_output=True, text=True, check=True
+    )
+    match = re.search(r'([\d,]+) 行/秒（ワーカー', result.stdout)
+    return float(match.group(1).replace(',', ''))
+
+def main():
+    cpu_count = os.cpu_count() or 1
+    default_workers = sorted({2 ** i for i in range(cpu_count.bit_length()) if 2 ** i <= cpu_count} | {cpu_count})
+
+    parser = argparse.ArgumentParser(description='オフライン一括予測のスループット計測')
+    parser.add_argument('--rows', type=int, default=1000000, help='合成する物件の行数')
+    parser.add_argument('--workers', type=int, nargs='+', default=default_workers, help='計測するワーカー数')
+    parser.add_argument('--chunk-size', type=int, default=50000, help='1回に読み込み・予測する行数')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_path = os.path.join(tmp_dir, 'properties.csv')
+        output_path = os.path.join(tmp_dir, 'predictions.csv')
+        make_input(input_path, args.rows)
+
+        print(f"行数: {args.rows:,}、チャンク: {args.chunk_size:,} 行、CPU数: {cpu_count}")
+        print(f"{'ワーカー数':>10}{'行/秒':>14}{'速度向上':>10}")
+        baseline = None
+        for workers in args.workers:
+            throughput = run_batch_predict(input_path, output_path, workers, args.chunk_size)
+            baseline = baseline or throughput
+            print(f"{workers:>10}{throughput:>14,.0f}{throughput / baseline:>9.2f}x")
+
+if __name__ == "__main__":
+    main()
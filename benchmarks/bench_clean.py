@@ -0,0 +1,85 @@
+"""
+preprocess_data の列のクリーニング（面積・取引価格・築年数）の速度を計測する
+
+変更前の1セルずつの .apply(extract_numeric_value / extract_building_year) と、
+列ごとにまとめて変換する clean_numeric_column / clean_building_year_column を比較し、
+全ての行で結果が一致することを確認する
+
+実行方法:
+    python benchmarks/bench_clean.py
+    python benchmarks/bench_clean.py --rows 5000000
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from common import ROOT_DIR
+
+sys.path.insert(0, ROOT_DIR)
+import data_preprocessing
+
+# 取引データに現れる表記（空文字・空白・欠損値・数字を含まない値も含める）
+AREA_VALUES = ['2000㎡以上', '', ' ', None, np.nan, '面積不明', 100, 85.5]
+BUILDING_YEAR_VALUES = ['戦前', '', ' ', None, np.nan, '平成10年', '12345年', 2001]
+
+def make_frame(n_rows: int) -> pd.DataFrame:
+    """合成した取引データ（前処理前の文字列の列）"""
+    rng = np.random.default_rng(0)
+    area = rng.integers(10, 3000, n_rows).astype(str).astype(object)
+    trade_price = (rng.integers(100, 50000, n_rows) * 10000).astype(str).astype(object)
+    building_year = np.char.add(rng.integers(1950, 2024, n_rows).astype(str), '年').astype(object)
+
+    # 一部の行を特殊な表記に置き換える
+    for column, values in [(area, AREA_VALUES), (trade_price, AREA_VALUES), (building_year, BUILDING_YEAR_VALUES)]:
+        rows = rng.choice(n_rows, size=n_rows // 20, replace=False)
+        column[rows] = np.array(values, dtype=object)[rng.integers(len(values), size=len(rows))]
+
+    return pd.DataFrame({'Area': area, 'TradePrice': trade_price, 'BuildingYear': building_year})
+
+def legacy_clean(df: pd.DataFrame) -> pd.DataFrame:
+    """変更前のクリーニング（1セルずつ正規表現を実行）"""
+    return pd.DataFrame({
+        'Area': df['Area'].apply(data_preprocessing.extract_numeric_value),
+        'TradePrice': df['TradePrice'].apply(data_preprocessing.extract_numeric_value),
+        'BuildingYear': df['BuildingYear'].apply(data_preprocessing.extract_building_year)
+    })
+
+def vectorized_clean(df: pd.DataFrame) -> pd.DataFrame:
+    """現在のクリーニング（列ごとにまとめて変換）"""
+    return pd.DataFrame({
+        'Area': data_preprocessing.clean_numeric_column(df['Area']),
+        'TradePrice': data_preprocessing.clean_numeric_column(df['TradePrice']),
+        'BuildingYear': data_preprocessing.clean_building_year_column(df['BuildingYear'])
+    })
+
+def main():
+    parser = argparse.ArgumentParser(description='列のクリーニングの計測')
+    parser.add_argument('--rows', type=int, default=2000000, help='合成する行数')
+    args = parser.parse_args()
+
+    df = make_frame(args.rows)
+    print(f"行数: {args.rows:,}")
+
+    timings = {}
+    results = {}
+    for label, clean in [('変更前（.apply）', legacy_clean), ('列ごとの変換', vectorized_clean)]:
+        start = time.perf_counter()
+        results[label] = clean(df)
+        timings[label] = time.perf_counter() - start
+        print(f"{label:<20}{timings[label]:>8.2f}秒{args.rows / timings[label]:>14,.0f} 行/秒")
+
+    legacy, vectorized = results.values()
+    for column in legacy.columns:
+        matched = np.array_equal(
+            legacy[column].to_numpy(dtype=float), vectorized[column].to_numpy(dtype=float), equal_nan=True
+        )
+        print(f"一致確認 {column}: {'一致' if matched else '不一致'}")
+
+    print(f"速度向上: {timings['変更前（.apply）'] / timings['列ごとの変換']:.1f}倍")
+
+if __name__ == "__main__":
+    main()
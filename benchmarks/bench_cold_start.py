@@ -0,0 +1,77 @@
+"""
+コールドスタート時間を計測する
+
+新しいPythonプロセスで api.py の読み込み → load_models → 最初の /predict までの時間を計測し、
+個別ファイル（6つのjoblib.load）とモデルバンドル（mmap_mode）の読み込みを比較する
+
+実行方法:
+    python model_bundle.py              # バンドルがない場合は先に作成する
+    python benchmarks/bench_cold_start.py
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from common import ROOT_DIR
+
+# 子プロセスで実行する計測用スクリプト
+CHILD_SCRIPT = """
+import time
+start = time.perf_counter()
+
+import asyncio, json, sys, warnings
+warnings.filterwarnings('ignore')
+sys.path.insert(0, 'benchmarks')
+from common import load_api_module
+
+api = load_api_module()
+imported = time.perf_counter()
+
+api.models = api.load_models()
+loaded = time.perf_counter()
+
+request = api.PropertyRequest(district_name='丸之内', area=100.0, building_year=5)
+asyncio.run(api.predict_price(request))
+responded = time.perf_counter()
+
+print(json.dumps({
+    'import': imported - start,
+    'load_models': loaded - imported,
+    'first_predict': responded - loaded,
+    'total': responded - start
+}))
+"""
+
+def run_cold_start(use_bundle: bool) -> dict:
+    """新しいプロセスで1回計測する"""
+    env = dict(os.environ, MODEL_BUNDLE='1' if use_bundle else '0', PREDICTION_CACHE_SIZE='0')
+    result = subprocess.run(
+        [sys.executable, '-c', CHILD_SCRIPT], cwd=ROOT_DIR, env=env,
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description='コールドスタート時間の計測')
+    parser.add_argument('--repeat', type=int, default=10, help='各構成の計測回数')
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(ROOT_DIR, 'models', 'model_bundle.joblib')):
+        print("models/model_bundle.joblib がありません。先に python model_bundle.py を実行してください。")
+        return
+
+    stages = ['import', 'load_models', 'first_predict', 'total']
+    print(f"{'構成':<16}" + ''.join(f"{stage:>15}" for stage in stages) + "  （中央値、ミリ秒）")
+
+    for label, use_bundle in [('個別ファイル', False), ('バンドル(mmap)', True)]:
+        runs = [run_cold_start(use_bundle) for _ in range(args.repeat)]
+        medians = {stage: np.median([run[stage] for run in runs]) * 1e3 for stage in stages}
+        print(f"{label:<16}" + ''.join(f"{medians[stage]:>15.1f}" for stage in stages))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+特徴量の計算（feature_transform）の速度を計測する
+
+変更前の create_features（築年数のカテゴリ化を .apply で1行ずつ実行）と、
+feature_transform を使う現在の create_features を合成データで比較し、7つの特徴量が全ての行で一致することを確認する。
+あわせて、/predict の1件分の特徴量計算（変更前の preprocess_input と同じ処理）の時間も比較する
+
+実行方法:
+    python benchmarks/bench_features.py
+    python benchmarks/bench_features.py --rows 5000000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from sklearn.preprocessing import LabelEncoder
+
+from common import ROOT_DIR
+
+sys.path.insert(0, ROOT_DIR)
+import feature_transform
+import model_training
+from bench_intermediate import make_frame
+
+def legacy_categorize_building_year(year):
+    """変更前の築年数のカテゴリ化（学習・APIそれぞれにあった1件ずつの関数）"""
+    if year == 0:
+        return 'new'
+    elif year <= 5:
+        return 'very_new'
+    elif year <= 10:
+        return 'new'
+    elif year <= 20:
+        return 'medium'
+    elif year <= 30:
+        return 'old'
+    else:
+        return 'very_old'
+
+def legacy_create_features(df):
+    """変更前の create_features（エンコーダーの保存を除く）"""
+    df_features = df.copy()
+    df_features['DistrictName_encoded'] = LabelEncoder().fit_transform(df_features['DistrictName'])
+    df_features['Type_encoded'] = LabelEncoder().fit_transform(df_features['Type'])
+    df_features['Area_log'] = np.log1p(df_features['Area'])
+    df_features['BuildingYear_category'] = df_features['BuildingYear'].apply(legacy_categorize_building_year)
+    df_features['BuildingYear_category_encoded'] = LabelEncoder().fit_transform(df_features['BuildingYear_category'])
+    df_features['Area_BuildingYear_interaction'] = df_features['Area'] * df_features['BuildingYear']
+    df_features['TradePrice_log'] = np.log1p(df_features['TradePrice'])
+    return df_features
+
+def create_features(df):
+    """現在の create_features（エンコーダーは一時ディレクトリに保存する）"""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        os.makedirs('label_encoders')
+        try:
+            return model_training.create_features(df)
+        finally:
+            os.chdir(cwd)
+
+def legacy_single_row(area, building_year):
+    """変更前の preprocess_input の特徴量計算（エンコード済みのコードは0とする）"""
+    year_category = legacy_categorize_building_year(building_year)
+    return {
+        'DistrictName_encoded': 0,
+        'Type_encoded': 0,
+        'Area': area,
+        'Area_log': np.log1p(area),
+        'BuildingYear': building_year,
+        'BuildingYear_category_encoded': len(year_category),
+        'Area_BuildingYear_interaction': area * building_year
+    }
+
+def single_row(area, building_year):
+    """現在の preprocess_input の特徴量計算（エンコード済みのコードは0とする）"""
+    year_category = feature_transform.categorize_building_year(building_year)
+    return feature_transform.compute_features(0, 0, area, building_year, len(year_category))
+
+def main():
+    parser = argparse.ArgumentParser(description='特徴量の計算の計測')
+    parser.add_argument('--rows', type=int, default=1000000, help='合成する行数')
+    parser.add_argument('--single-rows', type=int, default=100000, help='1件ずつの計算を繰り返す回数')
+    args = parser.parse_args()
+
+    df = make_frame(args.rows)
+    # 新築・境界値の築年数を含める
+    df.loc[df.index[::7], 'BuildingYear'] = 0
+    df.loc[df.index[1::11], 'BuildingYear'] = 30
+    print(f"行数: {args.rows:,}")
+
+    timings = {}
+    results = {}
+    for label, create in [('変更前（.apply）', legacy_create_features), ('feature_transform', create_features)]:
+        start = time.perf_counter()
+        results[label] = create(df)
+        timings[label] = time.perf_counter() - start
+        print(f"{label:<20}{timings[label]:>8.2f}秒{args.rows / timings[label]:>14,.0f} 行/秒")
+    print(f"速度向上: {timings['変更前（.apply）'] / timings['feature_transform']:.1f}倍")
+
+    legacy, current = results.values()
+    for column in feature_transform.FEATURE_COLUMNS:
+        matched = np.array_equal(legacy[column].to_numpy(dtype=float), current[column].to_numpy(dtype=float))
+        print(f"一致確認 {column}: {'一致' if matched else '不一致'}")
+
+    # 1件ずつの計算（/predict の前処理）
+    rng = np.random.default_rng(0)
+    inputs = list(zip(rng.uniform(10, 3000, args.single_rows).tolist(), rng.integers(0, 60, args.single_rows).tolist()))
+    print(f"\n1件ずつの計算: {args.single_rows:,} 回")
+    for label, compute in [('変更前', legacy_single_row), ('feature_transform', single_row)]:
+        start = time.perf_counter()
+        for area, building_year in inputs:
+            compute(area, building_year)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<20}{elapsed / args.single_rows * 1e6:>8.2f}μs/件")
+    matched = all(legacy_single_row(*row) == single_row(*row) for row in inputs[:1000])
+    print(f"一致確認: {'一致' if matched else '不一致'}")
+
+if __name__ == "__main__":
+    main()
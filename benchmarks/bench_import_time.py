@@ -0,0 +1,110 @@
+"""
+エントリーポイント（api.py / app.py / api/index.py）のimport時間とメモリ使用量を計測する
+
+新しいPythonプロセスを -X importtime 付きで起動し、import → load_models → 最初の /predict までの時間、
+最大RSS、時間のかかったトップレベルのモジュール、pandas / sklearn が読み込まれたかどうかを表示する
+
+実行方法:
+    python model_bundle.py              # バンドルを使う場合は先に作成する
+    python benchmarks/bench_import_time.py
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from common import ROOT_DIR
+
+ENTRY_POINTS = ['api.py', 'app.py', 'api/index.py']
+
+# 読み込まれたかどうかを確認する重いモジュール
+HEAVY_MODULES = ['pandas', 'sklearn']
+
+# 子プロセスで実行する計測用スクリプト
+CHILD_SCRIPT = """
+import time
+start = time.perf_counter()
+
+import asyncio, importlib.util, json, resource, sys, warnings
+warnings.filterwarnings('ignore')
+sys.path.insert(0, '.')
+spec = importlib.util.spec_from_file_location('entry_point', sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+api = sys.modules.get('fukuyama_api', module)
+imported = time.perf_counter()
+after_import = {name: name in sys.modules for name in sys.argv[2:]}
+
+api.models = api.load_models()
+loaded = time.perf_counter()
+after_load = {name: name in sys.modules for name in sys.argv[2:]}
+
+request = api.PropertyRequest(district_name='丸之内', area=100.0, building_year=5)
+asyncio.run(api.predict_price(request))
+responded = time.perf_counter()
+after_predict = {name: name in sys.modules for name in sys.argv[2:]}
+
+print(json.dumps({
+    'import': imported - start,
+    'load_models': loaded - imported,
+    'first_predict': responded - loaded,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'after_import': after_import,
+    'after_load': after_load,
+    'after_predict': after_predict
+}))
+"""
+
+def parse_importtime(stderr: str) -> dict:
+    """-X importtime の出力からトップレベルのパッケージごとの累積時間（ミリ秒）を集計する"""
+    totals = defaultdict(float)
+    pattern = re.compile(r'^import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)$')
+    for line in stderr.splitlines():
+        match = pattern.match(line)
+        # インデントのないモジュールが最初にimportされたトップレベルのモジュール
+        if match and match.group(2) == ' ':
+            totals[match.group(3).split('.')[0]] += int(match.group(1)) / 1e3
+    return dict(totals)
+
+def run_entry_point(entry_point: str, use_bundle: bool) -> tuple:
+    """新しいプロセスでエントリーポイントを1回計測する"""
+    env = dict(os.environ, MODEL_BUNDLE='1' if use_bundle else '0', PREDICTION_CACHE_SIZE='0')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD_SCRIPT, entry_point] + HEAVY_MODULES,
+        cwd=ROOT_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1]), parse_importtime(result.stderr)
+
+def format_loaded(flags: dict) -> str:
+    loaded = [name for name, present in flags.items() if present]
+    return ', '.join(loaded) if loaded else 'なし'
+
+def main():
+    parser = argparse.ArgumentParser(description='エントリーポイントのimport時間の計測')
+    parser.add_argument('--top', type=int, default=8, help='表示する重いモジュールの数')
+    args = parser.parse_args()
+
+    configs = [('個別ファイル', False)]
+    if os.path.exists(os.path.join(ROOT_DIR, 'models', 'model_bundle.joblib')):
+        configs.append(('バンドル', True))
+    else:
+        print("models/model_bundle.joblib がないため、個別ファイルの場合のみ計測します")
+
+    for entry_point in ENTRY_POINTS:
+        for label, use_bundle in configs:
+            timings, modules = run_entry_point(entry_point, use_bundle)
+            print(f"\n[{entry_point}（{label}）]")
+            print(f"  import: {timings['import'] * 1e3:.1f}ms、load_models: {timings['load_models'] * 1e3:.1f}ms、"
+                  f"最初の予測: {timings['first_predict'] * 1e3:.1f}ms、最大RSS: {timings['max_rss_mb']:.0f}MB")
+            print(f"  読み込まれた重いモジュール: import後 {format_loaded(timings['after_import'])} / "
+                  f"load_models後 {format_loaded(timings['after_load'])} / "
+                  f"予測後 {format_loaded(timings['after_predict'])}")
+            top = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:args.top]
+            print("  import時間の大きいモジュール: " + '、'.join(f"{name} {ms:.0f}ms" for name, ms in top))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+追加データによる差分更新（model_training.py --incremental）と全データでの再学習を比較する
+
+合成した既存データで全ての候補モデルを学習したあと、新しい四半期のデータ（未知の町名を含む）を追加する。
+候補モデルごとに、既存データ + 追加データで学習し直した場合と、既存のモデルを差分更新した場合の
+学習時間と、同じ評価データでの評価指標の差（ドリフト）を表示する
+
+実行方法:
+    python benchmarks/bench_incremental.py
+    python benchmarks/bench_incremental.py --rows 50000 --new-rows 12500
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+
+from common import ROOT_DIR
+
+sys.path.insert(0, ROOT_DIR)
+import model_training
+from incremental_training import linear_statistics, update_model
+
+def make_quarter(n_rows: int, n_districts: int, seed: int) -> pd.DataFrame:
+    """合成した1四半期分の前処理済みデータ"""
+    rng = np.random.default_rng(seed)
+    district_index = rng.integers(n_districts, size=n_rows)
+    area = rng.integers(10, 2000, n_rows).astype(np.float64)
+    building_year = rng.integers(0, 60, n_rows).astype(np.float64)
+    price = area * 100000 * (1 + district_index / 300) * (1 - building_year / 200) * rng.lognormal(0, 0.3, n_rows)
+    return pd.DataFrame({
+        'DistrictName': [f'町{i}' for i in district_index],
+        'Area': area,
+        'BuildingYear': building_year,
+        'TradePrice': np.round(price, -4),
+        'Type': rng.choice(['宅地(土地)', '宅地(土地と建物)', '中古マンション等'], n_rows)
+    })
+
+def split(df: pd.DataFrame, encoders: dict):
+    """特徴量を作成し、学習用と評価用に分ける"""
+    X = model_training.encode_features(df, encoders)
+    y = np.log1p(df['TradePrice']).to_numpy()
+    return train_test_split(X, y, test_size=0.2, random_state=42)
+
+def main():
+    parser = argparse.ArgumentParser(description='差分更新と全データでの再学習の比較')
+    parser.add_argument('--rows', type=int, default=20000, help='既存データの行数')
+    parser.add_argument('--new-rows', type=int, default=5000, help='追加データの行数')
+    args = parser.parse_args()
+
+    base = make_quarter(args.rows, 250, seed=0)
+    new = make_quarter(args.new_rows, 300, seed=1)
+
+    # 既存データでエンコーダーとスケーラーを学習する（差分更新ではどちらも学習し直さない）
+    encoders = {}
+    for field, column in [('district', 'DistrictName'), ('type', 'Type')]:
+        encoders[field], _ = model_training.fit_label_encoder(base[column])
+    encoders['year'], _ = model_training.fit_label_encoder(
+        model_training.feature_transform.categorize_building_years(base['BuildingYear'].to_numpy())
+    )
+    X_base, X_base_test, y_base, y_base_test = split(base, encoders)
+    X_new, X_new_test, y_new, y_new_test = split(new, encoders)
+    scaler = StandardScaler().fit(X_base)
+    X_base, X_base_test, X_new, X_new_test = (scaler.transform(X) for X in (X_base, X_base_test, X_new, X_new_test))
+    X_all = np.vstack([X_base, X_new])
+    y_all = np.concatenate([y_base, y_new])
+    X_test = np.vstack([X_base_test, X_new_test])
+    y_test = np.concatenate([y_base_test, y_new_test])
+    stats = linear_statistics(X_base, y_base)
+
+    print(f"既存データ: {len(X_base):,} 行、追加データ: {len(X_new):,} 行、評価データ: {len(X_test):,} 行（既存 + 追加）")
+    print(f"\n{'モデル':<26}{'再学習(秒)':>10}{'差分(秒)':>10}{'速度向上':>10}"
+          f"{'再学習R²':>10}{'差分R²':>10}{'R²の差':>10}{'RMSEの差':>10}")
+    for name in model_training.make_candidate_models():
+        start = time.perf_counter()
+        full = model_training.make_candidate_model(name).fit(X_all, y_all)
+        full_seconds = time.perf_counter() - start
+
+        model = model_training.make_candidate_model(name).fit(X_base, y_base)
+        start = time.perf_counter()
+        model = update_model(model, X_new, y_new, stats)
+        update_seconds = time.perf_counter() - start
+
+        full_result = model_training.evaluate_model(full, X_test, y_test)
+        update_result = model_training.evaluate_model(model, X_test, y_test)
+        print(f"{name:<26}{full_seconds:>10.2f}{update_seconds:>10.2f}{full_seconds / update_seconds:>9.1f}x"
+              f"{full_result['r2']:>10.4f}{update_result['r2']:>10.4f}"
+              f"{update_result['r2'] - full_result['r2']:>+10.4f}{update_result['rmse'] - full_result['rmse']:>+10.4f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+前処理済みデータ（data_preprocessing.py -> model_training.py の受け渡し）の形式ごとの
+書き込み・読み込み時間とファイルサイズを計測する
+
+合成した前処理済みデータを CSV / Parquet / Feather で save_preprocessed により保存し、
+load_preprocessed で読み込んで、処理時間・サイズ・読み込み後の列の型と内容の一致を比較する
+（変更前の pd.read_csv のみで読み込んだ場合も計測する）
+
+実行方法:
+    python benchmarks/bench_intermediate.py
+    python benchmarks/bench_intermediate.py --rows 5000000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from common import ROOT_DIR
+
+sys.path.insert(0, ROOT_DIR)
+import data_preprocessing
+
+def make_frame(n_rows: int) -> pd.DataFrame:
+    """合成した前処理済みデータ（filter_records の出力と同じ列と型）"""
+    rng = np.random.default_rng(0)
+    districts = np.array([f'町{i}' for i in range(300)], dtype=object)
+    types = np.array(['宅地(土地)', '宅地(土地と建物)', '中古マンション等', '林地', '農地'], dtype=object)
+    return pd.DataFrame({
+        'DistrictName': districts[rng.integers(len(districts), size=n_rows)],
+        'Area': rng.integers(10, 2000, n_rows).astype(np.float64),
+        'BuildingYear': rng.integers(0, 60, n_rows).astype(np.float64),
+        'TradePrice': (rng.integers(100, 50000, n_rows) * 10000).astype(np.float64),
+        'Type': types[rng.integers(len(types), size=n_rows)]
+    })
+
+def timed(func, *args):
+    """関数の実行時間（秒）と戻り値を返す"""
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+def same_values(expected: pd.DataFrame, actual: pd.DataFrame) -> bool:
+    """型を問わず、全ての列の値が一致するか"""
+    return all(
+        np.array_equal(expected[col].to_numpy(dtype=object), actual[col].to_numpy(dtype=object))
+        for col in expected.columns
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description='前処理済みデータの形式ごとの計測')
+    parser.add_argument('--rows', type=int, default=2000000, help='合成する行数')
+    args = parser.parse_args()
+
+    df = make_frame(args.rows)
+    print(f"行数: {args.rows:,}")
+    print(f"{'形式':<22}{'書き込み(秒)':>12}{'読み込み(秒)':>12}{'サイズ(MB)':>12}  {'町名の型':<10}{'一致':>4}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, 'preprocessed_data.csv')
+        for label, file_name, load in [
+            ('CSV（変更前の読み込み）', 'preprocessed_data.csv', pd.read_csv),
+            ('CSV', 'preprocessed_data.csv', data_preprocessing.load_preprocessed),
+            ('Parquet', 'preprocessed_data.parquet', data_preprocessing.load_preprocessed),
+            ('Feather', 'preprocessed_data.feather', data_preprocessing.load_preprocessed)
+        ]:
+            file_path = os.path.join(tmp_dir, file_name)
+            write_seconds, _ = timed(data_preprocessing.save_preprocessed, df, file_path)
+            read_seconds, loaded = timed(load, file_path)
+            size_mb = os.path.getsize(file_path) / 1024 / 1024
+            print(f"{label:<22}{write_seconds:>12.2f}{read_seconds:>12.2f}{size_mb:>12.1f}  "
+                  f"{str(loaded['DistrictName'].dtype):<10}{'はい' if same_values(df, loaded) else 'いいえ':>4}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+メトリクスの記録（/metrics）による /predict のオーバーヘッドを計測する
+
+- 記録1回あたりの時間（段階の記録 RequestTimer.mark、カウンター、ヒストグラム）
+- /predict をASGIアプリとして直接呼び出した場合の1リクエストあたりの時間
+  （同じ入力をメトリクスの記録の有効・無効で1件ずつ交互に呼び出し、時間の揺らぎの影響を受けないようにする）
+- /metrics の出力の作成にかかる時間
+
+実行方法:
+    python benchmarks/bench_metrics.py
+    python benchmarks/bench_metrics.py --requests 20000 --rounds 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from common import ROOT_DIR, load_api_module, measure, print_timings
+
+sys.path.insert(0, ROOT_DIR)
+import metrics
+
+def make_scope(path: str, method: str, body: bytes) -> dict:
+    """ASGIのHTTPリクエストのscope"""
+    return {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': method, 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'query_string': b'', 'root_path': '', 'client': ('127.0.0.1', 50000), 'server': ('127.0.0.1', 8000),
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+    }
+
+async def call_app(app, path: str, method: str = 'GET', body: bytes = b'') -> int:
+    """ASGIアプリを直接呼び出し、ステータスコードを返す（HTTPサーバー・クライアントの時間を含まない）"""
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    status = []
+
+    async def receive():
+        return messages.pop() if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await app(make_scope(path, method, body), receive, send)
+    return status[0]
+
+async def time_requests(api, bodies, modes) -> np.ndarray:
+    """/predict を1件ずつ呼び出し（modes[i] がメトリクスの記録の有効・無効）、1リクエストあたりの時間（マイクロ秒）を返す"""
+    timings = np.empty(len(bodies))
+    for i, (body, enabled) in enumerate(zip(bodies, modes)):
+        api.METRICS_ENABLED = enabled
+        start = time.perf_counter()
+        status = await call_app(api.app, '/predict', 'POST', body)
+        timings[i] = time.perf_counter() - start
+        if status != 200:
+            raise RuntimeError(f"/predict がエラーを返しました: {status}")
+    api.METRICS_ENABLED = True
+    return timings * 1e6
+
+async def run(args):
+    api = load_api_module()
+    await api.startup_event()
+    if api.models is None:
+        raise SystemExit("モデルが読み込まれていません（先に model_training.py を実行してください）")
+
+    # 記録1回あたりの時間
+    histogram = metrics.Histogram('bench_seconds', '計測用', ['endpoint', 'stage'])
+    counter = metrics.Counter('bench_total', '計測用', ['endpoint', 'method', 'status'])
+    timer = metrics.RequestTimer(histogram, '/predict')
+    print("記録1回あたりの時間:")
+    print_timings("RequestTimer.mark", measure(lambda: timer.mark('predict'), repeat=100000))
+    print_timings("Counter.inc", measure(lambda: counter.labels('/predict', 'POST', '200').inc(), repeat=100000))
+    print_timings("request_timer()（タイマーなし）", measure(metrics.request_timer, repeat=100000))
+
+    # /predict の1リクエストあたりの時間（同じ入力を有効・無効で1回ずつ、順番を入れ替えながら呼び出す）
+    rng = np.random.default_rng(0)
+    districts = list(api.models['category_lookups']['district_name'])
+    bodies = [
+        json.dumps({
+            'district_name': districts[rng.integers(len(districts))],
+            'area': float(rng.uniform(10, 3000)),
+            'building_year': int(rng.integers(0, 60))
+        }).encode()
+        for _ in range(args.requests)
+    ]
+    await time_requests(api, bodies[:1000], [True] * 1000)
+
+    results = {True: [], False: []}
+    for round_index in range(args.rounds):
+        first = round_index % 2 == 0
+        modes = np.tile([first, not first], len(bodies)).tolist()
+        timings = await time_requests(api, [body for body in bodies for _ in range(2)], modes)
+        for enabled in (True, False):
+            results[enabled].append(timings[np.array(modes) == enabled])
+
+    print(f"\n/predict（ASGIを直接呼び出し、有効・無効それぞれ {args.requests:,} 件 × {args.rounds} 回）:")
+    for enabled, label in [(False, 'メトリクス無効'), (True, 'メトリクス有効')]:
+        timings = np.concatenate(results[enabled])
+        results[enabled] = timings
+        print_timings(label, {
+            'mean': float(timings.mean()),
+            'p50': float(np.percentile(timings, 50)),
+            'p99': float(np.percentile(timings, 99))
+        })
+    # 同じ入力の有効・無効の差の中央値
+    overhead = float(np.median(results[True] - results[False]))
+    print(f"オーバーヘッド（同じ入力での差の中央値）: {overhead:.1f}us（{overhead / np.median(results[False]) * 100:+.1f}%）")
+
+    # /metrics の出力の作成
+    print()
+    print_timings("/metrics の作成", measure(api.metrics_registry.render, repeat=200, warmup=10))
+    print(f"/metrics の行数: {len(api.metrics_registry.render().splitlines()):,}")
+
+    await api.shutdown_event()
+
+def main():
+    parser = argparse.ArgumentParser(description='メトリクスの記録のオーバーヘッドの計測')
+    parser.add_argument('--requests', type=int, default=5000, help='1回の計測で呼び出す /predict の件数')
+    parser.add_argument('--rounds', type=int, default=3, help='有効・無効を交互に計測する回数')
+    args = parser.parse_args()
+
+    # 予測結果キャッシュにヒットしないよう無効にする
+    os.environ['PREDICTION_CACHE_SIZE'] = '0'
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
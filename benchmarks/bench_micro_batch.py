@@ -0,0 +1,128 @@
+"""
+マイクロバッチの待ち時間ごとに /predict のスループットとレイテンシを計測する負荷試験
+
+待ち時間（MICRO_BATCH_WINDOW_MS）を変えてuvicornのサーバーを起動し、
+複数のクライアントスレッドから同時に /predict を呼び出して、
+1秒あたりの処理件数・p50・p99・1回にまとめられた平均件数を表示する
+
+実行方法:
+    python benchmarks/bench_micro_batch.py
+    python benchmarks/bench_micro_batch.py --windows 0 1 2 5 --clients 64 --duration 10
+"""
+
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+from common import ROOT_DIR
+
+DISTRICTS = ['丸之内', '久松台', '今津町', '伊勢丘', '元町', '未知の町']
+
+def wait_for_server(port: int, timeout: float = 60.0):
+    """サーバーがモデルを読み込み終えるまで待つ"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/health')
+            if json.loads(conn.getresponse().read()).get('status') == 'healthy':
+                return
+        except (OSError, ValueError):
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("サーバーが起動しませんでした")
+
+def get_health(port: int) -> dict:
+    """/health の内容を取得する"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    conn.request('GET', '/health')
+    return json.loads(conn.getresponse().read())
+
+def run_client(port: int, stop_at: float, seed: int, latencies: list, errors: list):
+    """1つのクライアント（接続を使い回して /predict を繰り返し呼び出す）"""
+    rng = np.random.default_rng(seed)
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    headers = {'Content-Type': 'application/json'}
+    while time.monotonic() < stop_at:
+        body = json.dumps({
+            'district_name': DISTRICTS[rng.integers(len(DISTRICTS))],
+            'area': float(rng.uniform(10, 3000)),
+            'building_year': int(rng.integers(0, 60))
+        })
+        start = time.perf_counter()
+        conn.request('POST', '/predict', body=body, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        elapsed = time.perf_counter() - start
+        if response.status == 200:
+            latencies.append(elapsed)
+        else:
+            errors.append(response.status)
+
+def run_load(window_ms: float, args) -> dict:
+    """指定した待ち時間でサーバーを起動し、負荷をかける"""
+    env = dict(
+        os.environ,
+        MICRO_BATCH_WINDOW_MS=str(window_ms),
+        MICRO_BATCH_MAX_SIZE=str(args.max_batch_size),
+        # 同じ入力の予測結果を使い回さないようにキャッシュは無効にする
+        PREDICTION_CACHE_SIZE='0'
+    )
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'app:app', '--port', str(args.port), '--log-level', 'warning'],
+        cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_for_server(args.port)
+
+        latencies, errors = [], []
+        stop_at = time.monotonic() + args.duration
+        threads = [
+            threading.Thread(target=run_client, args=(args.port, stop_at, seed, latencies, errors))
+            for seed in range(args.clients)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        micro_batch = get_health(args.port).get('micro_batch') or {}
+        timings = np.array(latencies) * 1e3
+        return {
+            'throughput': len(latencies) / elapsed,
+            'p50': np.percentile(timings, 50) if len(timings) else float('nan'),
+            'p99': np.percentile(timings, 99) if len(timings) else float('nan'),
+            'errors': len(errors),
+            'mean_batch_size': micro_batch.get('mean_batch_size', 1.0)
+        }
+    finally:
+        server.terminate()
+        server.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description='マイクロバッチの負荷試験')
+    parser.add_argument('--windows', type=float, nargs='+', default=[0, 1, 2, 5], help='待ち時間（ミリ秒、0はマイクロバッチなし）')
+    parser.add_argument('--clients', type=int, default=32, help='同時に呼び出すクライアント数')
+    parser.add_argument('--duration', type=float, default=5.0, help='各構成の計測時間（秒）')
+    parser.add_argument('--max-batch-size', type=int, default=64, help='1回にまとめる最大件数')
+    parser.add_argument('--port', type=int, default=8765, help='計測用サーバーのポート番号')
+    args = parser.parse_args()
+
+    print(f"クライアント数: {args.clients}、計測時間: {args.duration}秒")
+    print(f"{'待ち時間(ms)':>12}{'件/秒':>10}{'p50(ms)':>10}{'p99(ms)':>10}{'平均バッチ':>10}{'エラー':>8}")
+    for window_ms in args.windows:
+        result = run_load(window_ms, args)
+        print(f"{window_ms:>12.1f}{result['throughput']:>10.0f}{result['p50']:>10.2f}{result['p99']:>10.2f}"
+              f"{result['mean_batch_size']:>10.1f}{result['errors']:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+取引データの読み込みと列の変換（ファイル -> 変換済みのDataFrame）の速度とメモリ使用量を計測する
+
+合成した取引レコードのファイルを作成し、変更前の処理（ファイル全体を読み込んで正規表現でレコードのリストを作成し、
+DataFrameに変換して1行ずつ数値に変換）と、現在の処理（iter_data_records のレコードを records_to_frame で
+逐次変換）を別プロセスで実行して、処理時間と最大RSSを比較する。
+スプレッドシート書き出し形式は、有効なJSONの場合と、各レコードの最後の項目にカンマが付いた
+JSONではない場合（変更前の解析が対象としていた形式）の両方を計測し、変換結果が変更前と一致しない場合は
+終了コード1で終了する
+
+実行方法:
+    python benchmarks/bench_parse.py
+    python benchmarks/bench_parse.py --records 200000
+"""
+
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from common import ROOT_DIR
+
+# 子プロセスで実行する計測用スクリプト
+CHILD_SCRIPT = """
+import hashlib, json, re, resource, sys, time
+sys.path.insert(0, {root!r})
+sys.path.insert(0, {benchmarks!r})
+import data_preprocessing
+from bench_parse import legacy_clean_json_data, legacy_records_to_frame
+
+parser, file_path = sys.argv[1], sys.argv[2]
+start = time.perf_counter()
+if parser == 'legacy':
+    df = legacy_records_to_frame(legacy_clean_json_data(file_path))
+else:
+    df = data_preprocessing.records_to_frame(data_preprocessing.iter_data_records(file_path))
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'records': len(df),
+    'seconds': elapsed,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    # 変更前の築年数は欠損値がなければ整数型になるため、数値の列はfloatにそろえて比較する
+    'digest': hashlib.sha256(
+        df.astype({{'Area': float, 'BuildingYear': float, 'TradePrice': float}}).to_csv(index=False).encode()
+    ).hexdigest()
+}}))
+"""
+
+def legacy_parse_record(match: str) -> dict:
+    """変更前のレコード解析（行ごとに "キー": "値" を分割）"""
+    record = {}
+    for line in match.split('\n'):
+        line = line.strip()
+        if ':' in line and line.count('"') >= 2:
+            parts = line.split(':', 1)
+            if len(parts) == 2:
+                key = parts[0].strip().strip('"')
+                value = parts[1].strip().strip('",')
+                if value.startswith('"') and value.endswith('"'):
+                    value = value[1:-1]
+                record[key] = value
+    return record
+
+def legacy_clean_json_data(file_path: str) -> list:
+    """変更前のclean_json_data（ファイル全体を読み込み、正規表現でレコードを抽出）"""
+    import re
+    with open(file_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    records = []
+    for match in re.findall(r'\{[^}]*\},', content, re.DOTALL):
+        record = legacy_parse_record(match[:-1])
+        if record:
+            records.append(record)
+    return records
+
+def legacy_records_to_frame(records: list):
+    """変更前の変換（レコードのリストからDataFrameを作成し、1行ずつ数値に変換）"""
+    import pandas as pd
+    from data_preprocessing import extract_building_year, extract_numeric_value
+    df = pd.DataFrame(records)[['DistrictName', 'Area', 'BuildingYear', 'TradePrice', 'Type']].copy()
+    df['Area'] = df['Area'].apply(extract_numeric_value)
+    df['TradePrice'] = df['TradePrice'].apply(extract_numeric_value)
+    df['BuildingYear'] = df['BuildingYear'].apply(extract_building_year)
+    return df
+
+def make_record(i: int) -> dict:
+    """合成した取引レコード"""
+    return {
+        'Type': '宅地(土地と建物)' if i % 3 else '宅地(土地)',
+        'Region': '住宅地',
+        'MunicipalityCode': '34207',
+        'Prefecture': '広島県',
+        'Municipality': '福山市',
+        'DistrictName': f'町{i % 80}',
+        'TradePrice': str(5000000 + (i * 7919) % 50000000),
+        'Area': str(50 + i % 500),
+        'BuildingYear': f'{1970 + i % 54}年',
+        'Structure': '木造',
+        'Period': '2024年第1四半期'
+    }
+
+def make_inputs(tmp_dir: str, n_records: int) -> dict:
+    """
+    スプレッドシート書き出し形式（レコードごとに改行したJSON。各レコードが有効なJSONのものと、
+    最後の項目にカンマが付いたもの）、
+    NDJSON、CSVのファイルを作成する
+    """
+    paths = {
+        'json': os.path.join(tmp_dir, 'records.csv'),
+        'trailing_comma': os.path.join(tmp_dir, 'records_trailing_comma.csv'),
+        'ndjson': os.path.join(tmp_dir, 'records.ndjson'),
+        'csv': os.path.join(tmp_dir, 'records_table.csv')
+    }
+    with open(paths['json'], 'w', encoding='utf-8') as json_file, \
+            open(paths['trailing_comma'], 'w', encoding='utf-8') as trailing_file, \
+            open(paths['ndjson'], 'w', encoding='utf-8') as ndjson_file, \
+            open(paths['csv'], 'w', encoding='utf-8', newline='') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=list(make_record(0)))
+        writer.writeheader()
+        json_file.write('[\n')
+        trailing_file.write('[\n')
+        for i in range(n_records):
+            record = make_record(i)
+            text = json.dumps(record, ensure_ascii=False, indent=4)
+            # 変更前の解析は "}," で終わるレコードだけを抽出するため、最後のレコードにもカンマを付ける
+            json_file.write(text + ',\n')
+            # 最後の項目にもカンマを付ける（JSONとしては不正）
+            trailing_file.write(text[:-2] + ',\n},\n')
+            ndjson_file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            writer.writerow(record)
+        json_file.write(']\n')
+        trailing_file.write(']\n')
+    return paths
+
+def run_parser(parser: str, file_path: str) -> dict:
+    """新しいプロセスで1回計測する"""
+    script = CHILD_SCRIPT.format(root=ROOT_DIR, benchmarks=os.path.join(ROOT_DIR, 'benchmarks'))
+    result = subprocess.run(
+        [sys.executable, '-c', script, parser, file_path],
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description='取引データの読み込みの計測')
+    parser.add_argument('--records', type=int, default=1000000, help='合成するレコード数')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = make_inputs(tmp_dir, args.records)
+        size_mb = os.path.getsize(paths['json']) / 1024 / 1024
+        print(f"レコード数: {args.records:,}（スプレッドシート書き出し形式: {size_mb:.0f}MB）")
+        print(f"{'解析方法':<36}{'件数':>12}{'秒':>10}{'件/秒':>12}{'最大RSS(MB)':>14}")
+
+        digests = {}
+        for label, parser_name, file_type in [
+            ('変更前（有効なJSON）', 'legacy', 'json'),
+            ('現在（有効なJSON）', 'current', 'json'),
+            ('変更前（末尾のカンマ付き）', 'legacy', 'trailing_comma'),
+            ('現在（末尾のカンマ付き）', 'current', 'trailing_comma'),
+            ('現在（NDJSON）', 'current', 'ndjson'),
+            ('現在（CSV）', 'current', 'csv')
+        ]:
+            result = run_parser(parser_name, paths[file_type])
+            digests[(parser_name, file_type)] = result['digest']
+            print(f"{label:<36}{result['records']:>12,}{result['seconds']:>10.2f}"
+                  f"{result['records'] / result['seconds']:>12,.0f}{result['max_rss_mb']:>14.0f}")
+
+        mismatched = []
+        for file_type, label in [('json', '有効なJSON'), ('trailing_comma', '末尾のカンマ付き')]:
+            matched = digests[('legacy', file_type)] == digests[('current', file_type)]
+            print(f"一致確認（{label}）: {'一致' if matched else '不一致'}")
+            if not matched:
+                mismatched.append(label)
+        if mismatched:
+            sys.exit(f"変換結果が変更前と一致しません: {', '.join(mismatched)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+/predict の1リクエストあたりの推論レイテンシを計測する
+
+旧経路（LabelEncoder.transform + DataFrame作成 + scaler.transform）と、
+読み込み時に作成した対応表・特徴量ビルダーを使う現在の経路を比較する
+
+実行方法:
+    python benchmarks/bench_predict.py
+"""
+
+import argparse
+import sys
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from common import load_api_module, measure, print_timings
+
+warnings.filterwarnings('ignore')
+
+def legacy_encode(encoder, value):
+    """変更前のカテゴリ変換（未知の値は例外経由で0）"""
+    try:
+        return encoder.transform([value])[0]
+    except ValueError:
+        return 0
+
+def legacy_preprocess(api, request):
+    """変更前の前処理（LabelEncoder.transformを1件ずつ呼び出す）"""
+    sklearn_objects = api.models['load_sklearn']()
+    area = request.area
+    building_year = request.building_year
+    year_category = api.feature_transform.categorize_building_year(building_year)
+    return {
+        'DistrictName_encoded': legacy_encode(sklearn_objects['district_encoder'], request.district_name),
+        'Type_encoded': legacy_encode(sklearn_objects['type_encoder'], request.property_type),
+        'Area': area,
+        'Area_log': np.log1p(area),
+        'BuildingYear': building_year,
+        'BuildingYear_category_encoded': legacy_encode(sklearn_objects['year_encoder'], year_category),
+        'Area_BuildingYear_interaction': area * building_year
+    }
+
+def legacy_predict(api, request):
+    """変更前の推論経路（LabelEncoder + DataFrame経由）"""
+    features = legacy_preprocess(api, request)
+    feature_df = pd.DataFrame([features])
+    X = feature_df[api.models['feature_columns']]
+    sklearn_objects = api.models['load_sklearn']()
+    X_scaled = sklearn_objects['scaler'].transform(X)
+    return sklearn_objects['model'].predict(X_scaled)[0]
+
+def current_predict(api, request):
+    """現在の推論経路（対応表 + float64配列へ直接書き込み）"""
+    features = api.preprocess_input(
+        request.district_name, request.area, request.building_year, request.property_type
+    )
+    X = api.models['build_features'](features)
+    X_scaled = api.models['scale_features'](X)
+    return api.predict_log_prices(X_scaled)[0]
+
+def main():
+    parser = argparse.ArgumentParser(description='/predict の推論レイテンシ計測')
+    parser.add_argument('--repeat', type=int, default=2000, help='計測回数')
+    parser.add_argument('--samples', type=int, default=500, help='一致確認に使う入力数')
+    args = parser.parse_args()
+
+    api = load_api_module()
+    api.models = api.load_models()
+
+    # 一致確認用の入力を作成（未知の町名・タイプも含める）
+    rng = np.random.default_rng(42)
+    districts = list(api.models['category_lookups']['district_name']) + ['未知の町']
+    types = list(api.models['category_lookups']['property_type']) + ['未知のタイプ']
+    requests = [
+        api.PropertyRequest(
+            district_name=districts[rng.integers(len(districts))],
+            area=float(rng.uniform(10, 3000)),
+            building_year=int(rng.integers(0, 60)),
+            property_type=types[rng.integers(len(types))]
+        )
+        for _ in range(args.samples)
+    ]
+
+    # スケーラーを畳み込んだ場合は浮動小数点の丸め誤差の範囲で一致を確認する
+    mismatches = sum(
+        not np.isclose(legacy_predict(api, request), current_predict(api, request), rtol=1e-9, atol=1e-9)
+        for request in requests
+    )
+    print(f"モデル: {api.models['model_name']}"
+          f"（スケーラー畳み込み: {api.models['scaler_fused']}、推論エンジン: {api.models['tree_ensemble'] is not None}）")
+    print(f"予測値の一致確認: {args.samples - mismatches}/{args.samples} 件が一致")
+    if mismatches:
+        sys.exit(f"予測値が変更前の経路と一致しません: {mismatches} 件")
+
+    request = requests[0]
+    unknown_request = api.PropertyRequest(district_name='未知の町', area=100.0, building_year=5)
+
+    for label, target in [('既知の町名', request), ('未知の町名', unknown_request)]:
+        legacy = measure(lambda: legacy_predict(api, target), repeat=args.repeat)
+        current = measure(lambda: current_predict(api, target), repeat=args.repeat)
+
+        print(f"\n[{label}]")
+        print_timings('変更前', legacy)
+        print_timings('変更後', current)
+        print(f"高速化: {legacy['mean'] / current['mean']:.2f}x")
+
+    print(f"\nフォールバック件数: {api.fallback_counts}")
+
+if __name__ == "__main__":
+    main()
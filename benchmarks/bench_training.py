@@ -0,0 +1,104 @@
+"""
+モデル選択（model_training.train_models）の逐次実行と並列実行の処理時間を計測する
+
+合成した前処理済みデータで、変更前の逐次ループ（モデルごとに cross_val_score(cv=5)）、
+共有した分割を使う逐次実行、プロセスプールによる並列実行を比較し、
+全てのモデルの評価指標と選ばれるモデルが一致することを確認する
+
+実行方法:
+    python benchmarks/bench_training.py
+    python benchmarks/bench_training.py --rows 50000 --workers 8
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from common import ROOT_DIR
+
+sys.path.insert(0, ROOT_DIR)
+import model_training
+from bench_intermediate import make_frame
+from sklearn.model_selection import train_test_split, cross_val_score
+from sklearn.preprocessing import StandardScaler
+
+def legacy_train_models(X_train, X_test, y_train, y_test):
+    """変更前の train_models（モデルごとに学習し、cross_val_score(cv=5) で再学習する）"""
+    results = {}
+    for name, model in model_training.make_candidate_models().items():
+        model.fit(X_train, y_train)
+        result = {'model': model, **model_training.evaluate_model(model, X_test, y_test)}
+        cv_scores = cross_val_score(model, X_train, y_train, cv=5, scoring='r2')
+        result['cv_mean'] = cv_scores.mean()
+        result['cv_std'] = cv_scores.std()
+        results[name] = result
+    return results
+
+def make_training_data(n_rows: int):
+    """model_training.main と同じ手順で、標準化済みの学習・テストデータを作成する"""
+    df = make_frame(n_rows)
+    # 町名・建物タイプごとの価格差をつける
+    rng = np.random.default_rng(1)
+    district_effect = df['DistrictName'].str.slice(1).astype(int).to_numpy() / 300
+    df['TradePrice'] = np.round(df['Area'] * 100000 * (1 + district_effect) * rng.lognormal(0, 0.3, n_rows), -4)
+
+    # create_features はエンコーダーをカレントディレクトリに保存するため、一時ディレクトリで実行する
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        os.makedirs('label_encoders')
+        try:
+            df_features = model_training.create_features(df)
+        finally:
+            os.chdir(cwd)
+
+    feature_columns = [
+        'DistrictName_encoded', 'Type_encoded', 'Area', 'Area_log',
+        'BuildingYear', 'BuildingYear_category_encoded', 'Area_BuildingYear_interaction'
+    ]
+    X_train, X_test, y_train, y_test = train_test_split(
+        df_features[feature_columns], df_features['TradePrice_log'], test_size=0.2, random_state=42
+    )
+    scaler = StandardScaler()
+    return scaler.fit_transform(X_train), scaler.transform(X_test), y_train, y_test
+
+def main():
+    parser = argparse.ArgumentParser(description='モデル選択の逐次実行と並列実行の計測')
+    parser.add_argument('--rows', type=int, default=10000, help='合成する行数')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='並列実行のプロセス数')
+    args = parser.parse_args()
+
+    X_train, X_test, y_train, y_test = make_training_data(args.rows)
+    print(f"行数: {args.rows:,}、並列実行のプロセス数: {args.workers}、CPU数: {os.cpu_count()}")
+
+    timings = {}
+    results = {}
+    for label, train in [
+        ('変更前（逐次）', legacy_train_models),
+        ('共有した分割（逐次）', lambda *data: model_training.train_models(*data, workers=1)),
+        ('並列', lambda *data: model_training.train_models(*data, workers=args.workers))
+    ]:
+        start = time.perf_counter()
+        results[label] = train(X_train, X_test, y_train, y_test)
+        timings[label] = time.perf_counter() - start
+
+    print(f"\n{'実行方法':<24}{'秒':>10}{'速度向上':>10}  最良のモデル")
+    baseline = timings['変更前（逐次）']
+    for label, result in results.items():
+        best_model_name = max(result, key=lambda name: result[name]['r2'])
+        print(f"{label:<24}{timings[label]:>10.2f}{baseline / timings[label]:>9.2f}x  {best_model_name}")
+
+    legacy = results['変更前（逐次）']
+    for label, result in results.items():
+        matched = all(
+            np.isclose(legacy[name][metric], result[name][metric], rtol=0, atol=1e-12)
+            for name in legacy for metric in ['mse', 'rmse', 'mae', 'r2', 'cv_mean', 'cv_std']
+        )
+        print(f"評価指標の一致 {label}: {'一致' if matched else '不一致'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+決定木アンサンブルのNumPy推論エンジンとsklearnの predict を比較する
+
+バッチサイズ 1 〜 100,000 件で予測時間を計測し、予測値が完全に一致することを確認する
+（APIは TREE_ENGINE_MAX_BATCH 件以下の場合のみ推論エンジンを使うため、その値の目安にする）
+
+実行方法:
+    python benchmarks/bench_tree_engine.py
+"""
+
+import argparse
+import sys
+import time
+import warnings
+
+import joblib
+import numpy as np
+
+from common import load_api_module
+
+warnings.filterwarnings('ignore')
+
+def best_time(func, repeat: int) -> float:
+    """repeat回実行した中で最短の実行時間（秒）を返す"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description='決定木推論エンジンのベンチマーク')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 10, 100, 1000, 10000, 100000])
+    args = parser.parse_args()
+
+    load_api_module()
+    import tree_engine
+
+    model = joblib.load('models/best_model.pkl')
+    scaler = joblib.load('models/scaler.pkl')
+    ensemble = tree_engine.export_tree_ensemble(model)
+    if ensemble is None:
+        print(f"決定木のアンサンブルではないため対象外です: {type(model).__name__}")
+        return
+
+    print(f"モデル: {type(model).__name__}（木の数: {len(ensemble.roots)}、ノード数: {len(ensemble.feature)}、最大深さ: {ensemble.max_depth}）")
+    print(f"{'batch':>8} {'sklearn':>12} {'numpy':>12} {'高速化':>8} {'一致':>6}")
+
+    rng = np.random.default_rng(0)
+    mismatched = []
+    for batch_size in args.batch_sizes:
+        X = rng.normal(scaler.mean_, scaler.scale_, size=(batch_size, len(scaler.mean_)))
+        X_scaled = scaler.transform(X)
+
+        repeat = max(3, min(200, 20000 // batch_size))
+        sklearn_time = best_time(lambda: model.predict(X_scaled), repeat)
+        numpy_time = best_time(lambda: ensemble.predict(X_scaled), repeat)
+        identical = np.array_equal(model.predict(X_scaled), ensemble.predict(X_scaled))
+
+        print(f"{batch_size:>8} {sklearn_time * 1e3:>10.3f}ms {numpy_time * 1e3:>10.3f}ms "
+              f"{sklearn_time / numpy_time:>7.2f}x {str(identical):>6}")
+        if not identical:
+            mismatched.append(batch_size)
+
+    if mismatched:
+        sys.exit(f"予測値がsklearnと一致しません（batch: {', '.join(map(str, mismatched))}）")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+ベンチマーク共通処理
+"""
+
+import importlib.util
+import os
+import sys
+import time
+from typing import Callable, Dict
+
+import numpy as np
+
+# プロジェクトのルートディレクトリ
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def load_api_module():
+    """
+    api.pyを読み込む
+    （api/パッケージと名前が衝突するため、ファイルパスを指定して読み込む）
+    """
+    os.chdir(ROOT_DIR)
+    if ROOT_DIR not in sys.path:
+        sys.path.insert(0, ROOT_DIR)
+
+    spec = importlib.util.spec_from_file_location('api_module', os.path.join(ROOT_DIR, 'api.py'))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['api_module'] = module
+    spec.loader.exec_module(module)
+    return module
+
+def measure(func: Callable, repeat: int = 1000, warmup: int = 50) -> Dict[str, float]:
+    """
+    関数の1回あたりの実行時間（マイクロ秒）を計測する
+    """
+    for _ in range(warmup):
+        func()
+
+    timings = np.empty(repeat)
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings[i] = time.perf_counter() - start
+
+    timings *= 1e6
+    return {
+        'mean': float(timings.mean()),
+        'p50': float(np.percentile(timings, 50)),
+        'p99': float(np.percentile(timings, 99))
+    }
+
+def print_timings(label: str, timings: Dict[str, float]):
+    """計測結果を1行で表示する"""
+    print(f"{label:<32} mean={timings['mean']:9.1f}us  p50={timings['p50']:9.1f}us  p99={timings['p99']:9.1f}us")
@@ -1,50 +1,203 @@
+import argparse
+import csv
+import glob
+import hashlib
+import inspect
+import itertools
 import json
+import os
+import time
 import pandas as pd
 import numpy as np
 import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from preprocess_cache import ShardCache, file_content_hash
 import warnings
 warnings.filterwarnings('ignore')
 
+# 前処理する取引データと前処理済みデータの出力先
+DEFAULT_SOURCE_FILE = "2024年福山市の取引情報（土地） - シート1 (1).csv"
+# 拡張子で形式を選ぶ（.parquet / .feather は型付きの列指向形式、.csv はテキスト）
+PREPROCESSED_FILE = "preprocessed_data.parquet"
+LEGACY_PREPROCESSED_FILE = "preprocessed_data.csv"
+
+# 前処理済みデータでカテゴリ型として保存する列
+CATEGORICAL_COLUMNS = ['DistrictName', 'Type']
+
+# ファイルごとの前処理結果（シャード）のキャッシュ（空文字で無効）
+PREPROCESS_CACHE_DIR = os.environ.get('PREPROCESS_CACHE_DIR', '.preprocess_cache')
+
+# 前処理の結果が変わる変更をしたら上げる（解析・変換の関数のソースコードもキャッシュのキーに含まれる）
+CLEANING_VERSION = 1
+
+# ファイルを読み込む単位（文字数）
+READ_CHUNK_CHARS = 1 << 20
+
+# JSONとして解析できないレコードとみなすまでに先読みする最大文字数
+MAX_RECORD_CHARS = 1 << 20
+
+# レコードをDataFrameに変換する単位（件数）。この件数分のレコードの辞書だけを保持する
+RECORDS_CHUNK_SIZE = 100000
+
+# 国土交通省の取引価格情報CSVの列名 -> APIのキー名
+CSV_COLUMN_ALIASES = {
+    '種類': 'Type',
+    '地区名': 'DistrictName',
+    '取引価格（総額）': 'TradePrice',
+    '面積（㎡）': 'Area',
+    '建築年': 'BuildingYear'
+}
+
+# {"status": "OK", "data": [ ... ]} のようにレコードの配列を包んだJSONの先頭部分
+JSON_WRAPPER_PATTERN = re.compile(
+    r'\s*\{(?:\s*"[^"]*"\s*:\s*(?:"[^"]*"|[-+\d.eE]+|true|false|null)\s*,)*\s*"[^"]*"\s*:\s*\['
+)
+
+def detect_file_type(file_path: str, head: str) -> str:
+    """拡張子と先頭の内容からファイルの形式（json / ndjson / csv）を判定する"""
+    if file_path.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    # スプレッドシートから書き出したファイルは拡張子が.csvでも中身がJSONの場合がある
+    if head.lstrip()[:1] in ('{', '['):
+        return 'json'
+    return 'csv'
+
+def parse_record_lines(text: str) -> Dict[str, Any]:
+    """
+    1行に1つの "キー": "値" が書かれたレコードを解析する
+    （JSONとして解析できないレコード用。従来のclean_json_dataと同じ規則）
+    """
+    record = {}
+    for line in text.split('\n'):
+        line = line.strip()
+        if ':' in line and line.count('"') >= 2:
+            # キーと値を分離
+            key, value = line.split(':', 1)
+            key = key.strip().strip('"')
+            value = value.strip().strip('",')
+
+            # 値のクリーンアップ
+            if value.startswith('"') and value.endswith('"'):
+                value = value[1:-1]
+
+            record[key] = value
+    return record
+
+def parse_lenient_record(text: str) -> Dict[str, Any]:
+    """
+    末尾のカンマなどでJSONとして解析できないレコード（{ ... }）を解析する
+    閉じ括弧の直前のカンマ（スプレッドシート書き出しの各レコードの最後の項目に付く）を取り除いてJSONとして解析し、
+    それでも解析できない場合は行ごとの規則で解析する
+    """
+    body = text.rstrip()
+    if body.endswith('}'):
+        body = body[:-1].rstrip().removesuffix(',') + '}'
+    try:
+        record = json.loads(body)
+    except ValueError:
+        return parse_record_lines(text)
+    return record if isinstance(record, dict) else parse_record_lines(text)
+
+def iter_json_records(f, buffer: str = '') -> Iterator[Dict[str, Any]]:
+    """
+    JSONのレコード（{ ... }）を先頭から1件ずつ取り出す
+    配列・カンマ区切りの並び・{"data": [...]} 形式のいずれにも対応し、入れ子の括弧も正しく扱う。
+    読み込んだ範囲のうち未処理の部分だけを保持するため、ファイル全体の文字列は保持しない。
+    JSONとして解析できないレコード（末尾のカンマなど）が見つかった場合は、以降のレコードを
+    { から } までの範囲ごとに parse_lenient_record で解析する（先頭からのデコードの失敗をレコードごとに繰り返さない）
+    """
+    decoder = json.JSONDecoder()
+    eof = False
+    json_format = True
+
+    def read_more():
+        nonlocal buffer, eof
+        chunk = f.read(READ_CHUNK_CHARS)
+        if chunk:
+            buffer += chunk
+        else:
+            eof = True
+
+    while len(buffer) < READ_CHUNK_CHARS and not eof:
+        read_more()
+
+    # レコードの配列を包んだ形式の場合は配列の中から読み始める
+    wrapper = JSON_WRAPPER_PATTERN.match(buffer)
+    pos = wrapper.end() if wrapper else 0
+
+    while True:
+        start = buffer.find('{', pos)
+        if start < 0:
+            if eof:
+                return
+            buffer = ''
+            pos = 0
+            read_more()
+            continue
+
+        if json_format:
+            try:
+                record, end = decoder.raw_decode(buffer, start)
+            except json.JSONDecodeError:
+                # レコードの途中で読み込みが切れている可能性があるため、先読みしてから判断する
+                if not eof and len(buffer) - start < MAX_RECORD_CHARS:
+                    buffer = buffer[start:]
+                    pos = 0
+                    read_more()
+                    continue
+                # JSONではない形式と判断し、このレコードから範囲ごとに解析する
+                json_format = False
+                continue
+        else:
+            close = buffer.find('}', start)
+            if close < 0 and not eof:
+                buffer = buffer[start:]
+                pos = 0
+                read_more()
+                continue
+            end = close + 1 if close >= 0 else len(buffer)
+            record = parse_lenient_record(buffer[start:end])
+
+        if record:
+            yield record
+        pos = end
+
+        # 処理済みの部分を捨て、次のレコードの分を読み込む
+        if len(buffer) - pos < MAX_RECORD_CHARS and not eof:
+            buffer = buffer[pos:]
+            pos = 0
+            read_more()
+
+def iter_records(f, file_type: str = 'json') -> Iterator[Dict[str, Any]]:
+    """ファイルハンドルからレコードを1件ずつ取り出す（file_type: json / ndjson / csv）"""
+    if file_type == 'ndjson':
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+    elif file_type == 'csv':
+        for row in csv.DictReader(f):
+            yield {CSV_COLUMN_ALIASES.get(key, key): value for key, value in row.items()}
+    else:
+        yield from iter_json_records(f)
+
+def iter_data_records(file_path: str) -> Iterator[Dict[str, Any]]:
+    """データファイルからレコードを1件ずつ取り出す（形式は内容と拡張子から判定する）"""
+    with open(file_path, 'r', encoding='utf-8', newline='') as f:
+        head = f.read(READ_CHUNK_CHARS)
+        file_type = detect_file_type(file_path, head)
+        if file_type == 'json':
+            yield from iter_json_records(f, head)
+        else:
+            f.seek(0)
+            yield from iter_records(f, file_type)
+
 def clean_json_data(file_path: str) -> List[Dict[str, Any]]:
     """
     データファイルを読み込んで、レコードを抽出する
+    （全件のリストを返す。前処理では iter_data_records のレコードを records_to_frame で逐次変換する）
     """
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    records = []
-    
-    # レコードのパターンを検索（{ から }, まで）
-    pattern = r'\{[^}]*\},'
-    matches = re.findall(pattern, content, re.DOTALL)
-    
-    for match in matches:
-        # 最後のカンマを削除
-        match = match[:-1]
-        
-        # レコード内のキーと値を抽出
-        record = {}
-        
-        # 行ごとに処理
-        lines = match.split('\n')
-        for line in lines:
-            line = line.strip()
-            if ':' in line and line.count('"') >= 2:
-                # キーと値を分離
-                parts = line.split(':', 1)
-                if len(parts) == 2:
-                    key = parts[0].strip().strip('"')
-                    value = parts[1].strip().strip('",')
-                    
-                    # 値のクリーンアップ
-                    if value.startswith('"') and value.endswith('"'):
-                        value = value[1:-1]
-                    
-                    record[key] = value
-        
-        if record:  # 空でないレコードのみ追加
-            records.append(record)
+    records = list(iter_data_records(file_path))
     
     print(f"抽出したレコード数: {len(records)}")
     return records
@@ -76,56 +229,118 @@ def extract_building_year(building_year: str) -> float:
         return 2024 - year  # 築年数を計算
     return np.nan
 
+def clean_numeric_column(values: pd.Series) -> pd.Series:
+    """
+    列をまとめて数値に変換する（extract_numeric_value と同じ規則）
+    同じ値は1回だけ変換し、結果を各行に割り当てる
+    """
+    codes, uniques = pd.factorize(values)
+
+    # 値ごとに最初の数字の並びを取り出す（欠損値・空文字・数字を含まない値はNaN）
+    numbers = pd.Series(np.asarray(uniques, dtype=object)).astype(str).str.extract(r'(\d+)', expand=False)
+    cleaned = np.append(numbers.astype(float).to_numpy(), np.nan)
+
+    # 欠損値のコード（-1）は末尾のNaNを指す
+    return pd.Series(cleaned[codes], index=values.index, name=values.name)
+
+def clean_building_year_column(values: pd.Series) -> pd.Series:
+    """
+    築年の列をまとめて築年数に変換する（extract_building_year と同じ規則、2024年基準）
+    同じ値は1回だけ変換し、結果を各行に割り当てる
+    """
+    codes, uniques = pd.factorize(values)
+
+    years = pd.Series(np.asarray(uniques, dtype=object)).astype(str).str.extract(r'(\d{4})年', expand=False)
+    ages = np.append((2024 - years.astype(float)).to_numpy(), np.nan)
+
+    return pd.Series(ages[codes], index=values.index, name=values.name)
+
 def preprocess_data(file_path: str) -> pd.DataFrame:
     """
     データの前処理を行う
     """
     print("データを読み込み中...")
-    raw_data = clean_json_data(file_path)
+    records = iter_data_records(file_path)
+    first_record = next(records, None)
     
-    if not raw_data:
+    if first_record is None:
         print("データの読み込みに失敗しました")
         return pd.DataFrame()
     
-    print(f"読み込んだレコード数: {len(raw_data)}")
-    
     # 最初のレコードの内容を表示
-    if raw_data:
-        print("最初のレコードの内容:")
-        print(raw_data[0])
-        print("\n利用可能なキー:")
-        print(list(raw_data[0].keys()))
+    print("最初のレコードの内容:")
+    print(first_record)
+    print("\n利用可能なキー:")
+    print(list(first_record.keys()))
     
-    # DataFrameに変換
-    df = pd.DataFrame(raw_data)
+    df = records_to_frame(itertools.chain([first_record], records))
+    if df.empty:
+        return df
+    
+    return filter_records(df)
+
+def records_to_frame(records: Iterable[Dict[str, Any]], stats: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+    """
+    レコードをDataFrameに変換し、必要な列の抽出と数値への変換を行う（行ごとに独立した処理）
+    レコードは RECORDS_CHUNK_SIZE 件ずつ取り出して変換するため、全件のレコードの辞書は保持しない。
+    stats を指定すると、件数（records）と取り出し・変換の時間（parse_seconds / convert_seconds）を設定する
+    """
+    required_columns = ['DistrictName', 'Area', 'BuildingYear', 'TradePrice', 'Type']
+    records = iter(records)
+    frames = []
+    # いずれかのレコードに含まれていた列（最初に現れた順）
+    columns = {}
+    n_records = 0
+    parse_seconds = convert_seconds = 0.0
+    
+    print("データクリーニング中...")
+    while True:
+        start = time.perf_counter()
+        chunk = list(itertools.islice(records, RECORDS_CHUNK_SIZE))
+        parsed = time.perf_counter()
+        parse_seconds += parsed - start
+        if not chunk:
+            break
+        n_records += len(chunk)
+        
+        # DataFrameに変換し、必要な列だけを残す（ないレコードの列は欠損値）
+        df = pd.DataFrame(chunk)
+        columns.update(dict.fromkeys(df.columns))
+        df = df.reindex(columns=required_columns)
+        
+        # 数値データの変換（列ごとにまとめて変換）
+        df['Area'] = clean_numeric_column(df['Area'])
+        df['TradePrice'] = clean_numeric_column(df['TradePrice'])
+        df['BuildingYear'] = clean_building_year_column(df['BuildingYear'])
+        frames.append(df)
+        convert_seconds += time.perf_counter() - parsed
+    
+    if stats is not None:
+        stats.update(records=n_records, parse_seconds=parse_seconds, convert_seconds=convert_seconds)
+    print(f"抽出したレコード数: {n_records}")
     
     # 利用可能な列を確認
-    print(f"\nDataFrameの列: {list(df.columns)}")
+    print(f"\nDataFrameの列: {list(columns)}")
     
     # 必要な列のみを抽出（存在する列のみ）
     available_columns = []
-    required_columns = ['DistrictName', 'Area', 'BuildingYear', 'TradePrice', 'Type']
-    
     for col in required_columns:
-        if col in df.columns:
+        if col in columns:
             available_columns.append(col)
         else:
             print(f"警告: 列 '{col}' が見つかりません")
     
-    if available_columns:
-        df = df[available_columns].copy()
-        print(f"使用する列: {available_columns}")
-    else:
+    if not available_columns:
         print("エラー: 必要な列が見つかりません")
         return pd.DataFrame()
+    print(f"使用する列: {available_columns}")
     
-    print("データクリーニング中...")
-    
-    # 数値データの変換
-    df['Area'] = df['Area'].apply(extract_numeric_value)
-    df['TradePrice'] = df['TradePrice'].apply(extract_numeric_value)
-    df['BuildingYear'] = df['BuildingYear'].apply(extract_building_year)
-    
+    return pd.concat(frames, ignore_index=True)[available_columns]
+
+def filter_records(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    欠損値の処理と異常値の除去を行う（面積の中央値など、全ての行を使う処理）
+    """
     # 欠損値の処理
     print("欠損値の処理中...")
     initial_count = len(df)
@@ -159,6 +374,143 @@ def preprocess_data(file_path: str) -> pd.DataFrame:
     
     return df
 
+def expand_sources(patterns: List[str]) -> List[str]:
+    """globパターンを展開し、重複を除いた取引データのファイル一覧を返す"""
+    file_paths = []
+    for pattern in patterns:
+        for file_path in sorted(glob.glob(pattern)):
+            if file_path not in file_paths:
+                file_paths.append(file_path)
+    return file_paths
+
+def parse_and_convert(file_path: str) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """1ファイルを読み込み、列の抽出と数値への変換までを行う（ワーカープロセスで実行される）"""
+    stats = {'file': file_path}
+    df = records_to_frame(iter_data_records(file_path), stats)
+    return df, stats
+
+def cleaning_version() -> str:
+    """シャードのキャッシュのキーに使う前処理のバージョン（CLEANING_VERSIONと解析・変換の関数のソースコード）"""
+    digest = hashlib.sha256(repr((CLEANING_VERSION, CSV_COLUMN_ALIASES, pd.__version__)).encode())
+    for func in [detect_file_type, parse_record_lines, parse_lenient_record, iter_json_records, iter_records,
+                 iter_data_records, clean_numeric_column, clean_building_year_column, records_to_frame]:
+        digest.update(inspect.getsource(func).encode())
+    return f"v{CLEANING_VERSION}-{digest.hexdigest()[:12]}"
+
+def ingest_files(file_paths: List[str], workers: int, cache: ShardCache = None) -> pd.DataFrame:
+    """
+    複数のファイルを並列に読み込んで前処理し、1つのDataFrameにまとめる
+    ファイルごとの読み込みと変換はプロセスプールで行い、欠損値の処理と異常値の除去は
+    結合後の全ての行に対して行う（1つのファイルにまとめて前処理した場合と同じ結果になる）
+    cache を指定すると、内容が変わっていないファイルは読み込まずにキャッシュのシャードを使う
+    """
+    start = time.perf_counter()
+
+    # キャッシュにないファイルだけを読み込む
+    shards = [None] * len(file_paths)
+    content_hashes = [None] * len(file_paths)
+    if cache is not None:
+        for i, file_path in enumerate(file_paths):
+            content_hashes[i] = file_content_hash(file_path)
+            shards[i] = cache.get(file_path, content_hashes[i])
+    missing = [i for i, shard in enumerate(shards) if shard is None]
+    cache_finished = time.perf_counter()
+
+    if missing:
+        print(f"{len(missing)} ファイルを {min(workers, len(missing))} プロセスで読み込み中...")
+    if len(missing) > 1 and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(parse_and_convert, [file_paths[i] for i in missing]))
+    else:
+        results = [parse_and_convert(file_paths[i]) for i in missing]
+    read_finished = time.perf_counter()
+
+    for i, (df, _) in zip(missing, results):
+        shards[i] = df
+        if cache is not None:
+            cache.put(content_hashes[i], df)
+    if cache is not None:
+        report_cache(cache, cache_finished - start)
+
+    frames = []
+    for file_path, df in zip(file_paths, shards):
+        if df.empty:
+            print(f"警告: '{file_path}' から前処理できるレコードがありませんでした")
+            continue
+        frames.append(df)
+
+    if not frames:
+        return pd.DataFrame()
+
+    df = filter_records(pd.concat(frames, ignore_index=True))
+    finished = time.perf_counter()
+
+    # 段階ごとの処理速度（読み込みと変換はワーカーの処理時間の合計あたり）
+    n_parsed = sum(stats['records'] for _, stats in results)
+    n_records = sum(len(shard) for shard in shards)
+    parse_seconds = sum(stats['parse_seconds'] for _, stats in results)
+    convert_seconds = sum(stats['convert_seconds'] for _, stats in results)
+    print("\n=== 前処理の処理速度 ===")
+    if cache is not None:
+        print(f"キャッシュ: {n_records - n_parsed:,} 件、{cache_finished - start:.2f}秒（ハッシュ計算・シャード読み込み）")
+    print(f"読み込み: {n_parsed:,} 件、{parse_seconds:.2f}秒（ワーカー合計）、{n_parsed / max(parse_seconds, 1e-9):,.0f} 件/秒")
+    print(f"列の変換: {n_parsed:,} 件、{convert_seconds:.2f}秒（ワーカー合計）、{n_parsed / max(convert_seconds, 1e-9):,.0f} 件/秒")
+    print(f"結合・フィルタ: {len(df):,} 件、{finished - read_finished:.2f}秒")
+    print(f"全体: {n_records:,} 件、{finished - start:.2f}秒、{n_records / (finished - start):,.0f} 件/秒")
+
+    return df
+
+def report_cache(cache: ShardCache, seconds: float):
+    """シャードのキャッシュのヒット・ミスを表示する"""
+    print(f"\n=== 前処理キャッシュ（{cache.cache_dir}、前処理バージョン {cache.version}） ===")
+    for hit in cache.hits:
+        print(f"ヒット: {hit['file']}（{hit['hash'][:12]}、{hit['rows']:,} 件）")
+    for miss in cache.misses:
+        print(f"ミス:   {miss['file']}（{miss['hash'][:12]}）")
+    print(f"ヒット {len(cache.hits)} / ミス {len(cache.misses)} シャード（確認 {seconds:.2f}秒）")
+
+def preprocessed_format(file_path: str) -> str:
+    """前処理済みデータの形式を拡張子から判定する"""
+    if file_path.endswith('.parquet'):
+        return 'parquet'
+    if file_path.endswith(('.feather', '.arrow')):
+        return 'feather'
+    return 'csv'
+
+def save_preprocessed(df: pd.DataFrame, file_path: str = PREPROCESSED_FILE):
+    """
+    前処理済みデータを保存する
+    Parquet / Feather では町名・建物タイプをカテゴリ型、数値列をfloat64のまま保存する
+    """
+    file_format = preprocessed_format(file_path)
+    if file_format == 'csv':
+        df.to_csv(file_path, index=False, encoding='utf-8')
+        return
+
+    df = df.reset_index(drop=True)
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    try:
+        if file_format == 'parquet':
+            df.to_parquet(file_path, index=False)
+        else:
+            df.to_feather(file_path)
+    except ImportError:
+        raise SystemExit(f"{file_format}形式での保存には pyarrow が必要です: pip install -r requirements-training.txt "
+                         f"（CSVで保存する場合は --output {LEGACY_PREPROCESSED_FILE}）")
+
+def load_preprocessed(file_path: str = PREPROCESSED_FILE) -> pd.DataFrame:
+    """前処理済みデータを読み込む（CSVの場合も町名・建物タイプはカテゴリ型にそろえる）"""
+    file_format = preprocessed_format(file_path)
+    if file_format == 'parquet':
+        return pd.read_parquet(file_path)
+    if file_format == 'feather':
+        return pd.read_feather(file_path)
+    dtype = {col: 'category' for col in CATEGORICAL_COLUMNS}
+    dtype.update({'Area': 'float64', 'TradePrice': 'float64', 'BuildingYear': 'float64'})
+    return pd.read_csv(file_path, dtype=dtype)
+
 def analyze_data(df: pd.DataFrame):
     """
     データの基本統計を表示
@@ -178,16 +530,36 @@ def analyze_data(df: pd.DataFrame):
     print(df['Type'].value_counts())
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='取引データの前処理')
+    parser.add_argument('sources', nargs='*', default=[DEFAULT_SOURCE_FILE],
+                        help='取引データのファイル（globパターン可、複数指定すると並列に読み込む）')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='複数ファイルを読み込むプロセス数')
+    parser.add_argument('--cache-dir', default=PREPROCESS_CACHE_DIR,
+                        help='ファイルごとの前処理結果のキャッシュ（内容が変わっていないファイルは読み込まない）')
+    parser.add_argument('--no-cache', action='store_true', help='キャッシュを使わずに全てのファイルを前処理する')
+    parser.add_argument('--output', default=PREPROCESSED_FILE,
+                        help='前処理済みデータの出力先（拡張子で形式を選ぶ: .parquet / .feather / .csv）')
+    args = parser.parse_args()
+
     # データの前処理
-    file_path = "2024年福山市の取引情報（土地） - シート1 (1).csv"
-    df = preprocess_data(file_path)
+    file_paths = expand_sources(args.sources)
+    if file_paths and args.cache_dir and not args.no_cache:
+        cache = ShardCache(args.cache_dir, cleaning_version())
+        removed = cache.prune()
+        if removed:
+            print(f"前処理のバージョンが異なるシャードを {removed} 個削除しました")
+        df = ingest_files(file_paths, args.workers, cache)
+    elif len(file_paths) > 1:
+        df = ingest_files(file_paths, args.workers)
+    else:
+        df = preprocess_data(file_paths[0] if file_paths else args.sources[0])
     
     if not df.empty:
         # データ分析
         analyze_data(df)
         
         # 前処理済みデータを保存
-        df.to_csv("preprocessed_data.csv", index=False, encoding='utf-8')
-        print(f"\n前処理済みデータを 'preprocessed_data.csv' に保存しました")
+        save_preprocessed(df, args.output)
+        print(f"\n前処理済みデータを '{args.output}' に保存しました")
     else:
         print("データの前処理に失敗しました")
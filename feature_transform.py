@@ -0,0 +1,73 @@
+"""
+特徴量の計算（学習と推論で共通）
+
+model_training.create_features と api.py の前処理はどちらもこのモジュールで特徴量を計算する。
+カテゴリのエンコーディング（LabelEncoder / 対応表）は呼び出し側で行い、ここではコードを受け取る
+"""
+
+from typing import Any, Dict, List
+
+import numpy as np
+
+# 特徴量の列順（model_info['feature_columns'] と同じ）
+FEATURE_COLUMNS = [
+    'DistrictName_encoded', 'Type_encoded', 'Area', 'Area_log',
+    'BuildingYear', 'BuildingYear_category_encoded', 'Area_BuildingYear_interaction'
+]
+
+# 築年数のカテゴリ: BUILDING_YEAR_BINS[i-1] < 築年数 <= BUILDING_YEAR_BINS[i] が BUILDING_YEAR_LABELS[i]
+# （30年超は 'very_old'、新築（0年）は 'new'）
+BUILDING_YEAR_BINS = np.array([5, 10, 20, 30])
+BUILDING_YEAR_LABELS = np.array(['very_new', 'new', 'medium', 'old', 'very_old'], dtype=object)
+NEW_BUILDING_LABEL = 'new'
+_BUILDING_YEAR_UPPER_BOUNDS = list(zip(BUILDING_YEAR_BINS.tolist(), BUILDING_YEAR_LABELS.tolist()))
+
+def categorize_building_years(building_years) -> np.ndarray:
+    """築年数の配列をまとめてカテゴリ化する（欠損値は 'very_old'）"""
+    building_years = np.asarray(building_years, dtype=np.float64)
+    labels = BUILDING_YEAR_LABELS[np.digitize(building_years, BUILDING_YEAR_BINS, right=True)]
+    labels[building_years == 0] = NEW_BUILDING_LABEL
+    return labels
+
+def categorize_building_year(building_year: float) -> str:
+    """1件の築年数をカテゴリ化する（categorize_building_years と同じ区分）"""
+    if building_year == 0:
+        return NEW_BUILDING_LABEL
+    for bound, label in _BUILDING_YEAR_UPPER_BOUNDS:
+        if building_year <= bound:
+            return label
+    return BUILDING_YEAR_LABELS[-1]
+
+def compute_features(district_codes, type_codes, area, building_year, year_category_codes) -> Dict[str, Any]:
+    """
+    エンコード済みの値から特徴量を計算し、列名 -> 値 の辞書で返す
+    1件分のスカラーでもN件分の配列でも同じ式で計算する
+    """
+    features = {}
+
+    features['DistrictName_encoded'] = district_codes
+    features['Type_encoded'] = type_codes
+
+    # 面積（負の面積はNaNとなり、呼び出し側で行単位のエラーとして扱う）
+    # 1件の場合はリクエストごとの処理時間を増やさないよう、np.errstate を使わない
+    features['Area'] = area
+    if isinstance(area, np.ndarray):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            features['Area_log'] = np.log1p(area)
+    else:
+        features['Area_log'] = np.log1p(area)
+
+    # 築年数とカテゴリ
+    features['BuildingYear'] = building_year
+    features['BuildingYear_category_encoded'] = year_category_codes
+
+    # 交互作用項
+    features['Area_BuildingYear_interaction'] = area * building_year
+
+    return features
+
+def feature_matrix(features: Dict[str, Any], feature_columns: List[str] = FEATURE_COLUMNS) -> np.ndarray:
+    """compute_features の結果を特徴量行列（float64、feature_columns の列順）にする"""
+    return np.column_stack(
+        [features[column] for column in feature_columns]
+    ).astype(np.float64)
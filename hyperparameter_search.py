@@ -0,0 +1,117 @@
+"""
+候補モデルのハイパーパラメータ探索（時間予算つきの Successive Halving）
+"""
+
+import math
+import multiprocessing
+import time
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+from sklearn.metrics import r2_score
+from sklearn.model_selection import ParameterGrid, ParameterSampler
+
+# ワーカープロセスが使う探索用のデータ（initializerで設定される）
+_search_data = None
+
+def sample_configs(space: Dict[str, list], n_configs: int, random_state: int) -> List[Dict[str, Any]]:
+    """探索空間から設定を選ぶ（組み合わせが n_configs 以下なら全て）"""
+    grid = ParameterGrid(space)
+    if len(grid) <= n_configs:
+        return list(grid)
+    return list(ParameterSampler(space, n_iter=n_configs, random_state=random_state))
+
+def _init_search_worker(make_model, X, y, train_index, valid_index):
+    """ワーカープロセスに探索用のデータを設定する"""
+    global _search_data
+    _search_data = (make_model, X, y, train_index, valid_index)
+
+def _evaluate_config(name: str, params: Dict[str, Any], n_rows: int) -> float:
+    """学習用の分割の先頭 n_rows 行で学習し、検証用の分割のR²を返す（ワーカープロセスで実行される）"""
+    make_model, X, y, train_index, valid_index = _search_data
+    rows = train_index[:n_rows]
+    model = make_model(name, params)
+    model.fit(X[rows], y[rows])
+    return r2_score(y[valid_index], model.predict(X[valid_index]))
+
+def successive_halving(make_model: Callable, spaces: Dict[str, Dict[str, list]], X: np.ndarray, y: np.ndarray,
+                       fold, budget_seconds: float, workers: int, n_configs: int = 27, eta: int = 3,
+                       min_rows: int = 500, random_state: int = 42) -> Dict[str, Dict[str, Any]]:
+    """
+    全ての候補モデルのハイパーパラメータを Successive Halving で探索する
+
+    - 各モデルの設定を n_configs 個選び、少ない行数で学習・評価して上位 1/eta だけを
+      eta 倍の行数で評価し直す（最後の段階は学習用の分割の全ての行）
+    - 評価は交差検証の1つ目の分割（fold = (学習用の行, 検証用の行)）で行う
+    - 全てのモデル・設定の学習をプロセスプールで並列に実行する
+    - budget_seconds を過ぎると、プロセスプールを terminate() してまだ始まっていない学習も実行中の学習も
+      打ち切り、評価済みの最良の設定を返す
+    - 勾配ブースティングの早期終了（n_iter_no_change / early_stopping）は、sklearnが学習に渡した行の中から
+      validation_fraction の割合を取り分けて判定する。この行は検証用の分割とは別で、検証用の分割は
+      学習に一切使わずにスコアの計算だけに使う（最終的な学習でも同じ設定で早期終了する）
+
+    戻り値はモデル名 -> {'params', 'score', 'n_rows', 'evaluated'}。
+    1つも評価できなかったモデルは含まれない
+    """
+    start = time.perf_counter()
+    deadline = start + budget_seconds
+    train_index = np.random.default_rng(random_state).permutation(fold[0])
+    valid_index = fold[1]
+
+    # 段階ごとの行数: 最後が学習用の分割の全ての行、前の段階ほど 1/eta
+    n_rungs = max(1, min(
+        math.ceil(math.log(n_configs, eta)) + 1,
+        int(math.log(max(len(train_index) / min_rows, 1), eta)) + 1
+    ))
+    rung_rows = [len(train_index) // eta ** (n_rungs - 1 - rung) for rung in range(n_rungs)]
+
+    survivors = {name: sample_configs(space, n_configs, random_state) for name, space in spaces.items()}
+    best = {}
+    print(f"ハイパーパラメータ探索: {sum(len(c) for c in survivors.values())} 設定、{n_rungs} 段階 "
+          f"（{rung_rows[0]:,} 行 → {rung_rows[-1]:,} 行）、予算 {budget_seconds:.0f}秒、{workers} プロセス")
+
+    context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+    pool = context.Pool(workers, initializer=_init_search_worker,
+                        initargs=(make_model, X, y, train_index, valid_index))
+    try:
+        for rung, n_rows in enumerate(rung_rows):
+            # 予算が途中で尽きても全てのモデルが評価されるよう、モデルを順に1設定ずつ投入する
+            # （同じ順番の中では時間のかかるアンサンブルを先にする）
+            jobs = {}
+            for i in range(max(len(configs) for configs in survivors.values())):
+                for name in reversed(list(survivors)):
+                    if i < len(survivors[name]):
+                        params = survivors[name][i]
+                        jobs[pool.apply_async(_evaluate_config, (name, params, n_rows))] = (name, params)
+            for job in jobs:
+                job.wait(max(deadline - time.perf_counter(), 0))
+            done = [job for job in jobs if job.ready()]
+            not_done = [job for job in jobs if not job.ready()]
+
+            scores = {name: [] for name in survivors}
+            for job in done:
+                name, params = jobs[job]
+                try:
+                    scores[name].append((job.get(), params))
+                except Exception as e:
+                    print(f"警告: {name} {params} の評価に失敗しました: {e}")
+
+            for name, evaluated in scores.items():
+                if not evaluated:
+                    continue
+                evaluated.sort(key=lambda item: item[0], reverse=True)
+                best[name] = {'params': evaluated[0][1], 'score': evaluated[0][0], 'n_rows': n_rows,
+                              'evaluated': best.get(name, {}).get('evaluated', 0) + len(evaluated)}
+                survivors[name] = [params for _, params in evaluated[:max(1, len(evaluated) // eta)]]
+
+            print(f"段階 {rung + 1}/{n_rungs}: {n_rows:,} 行、{len(done)} 設定を評価"
+                  f"（経過 {time.perf_counter() - start:.1f}秒）")
+            if not_done:
+                print(f"時間予算を使い切ったため、{len(not_done)} 設定の評価を打ち切りました")
+                break
+    finally:
+        # 実行中の学習を待たずにワーカープロセスを終了させる
+        pool.terminate()
+        pool.join()
+
+    return best
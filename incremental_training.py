@@ -0,0 +1,113 @@
+"""
+追加データによる学習済みモデルの差分更新（全データでの再学習を行わない）
+
+- 線形モデル: 学習データの十分統計量（行数・合計・XᵀX・Xᵀy）を保存しておき、追加データの統計量を足して解き直す
+  （LinearRegression / Ridge は全データで学習した場合と同じ係数、Lasso は座標降下法で同じ目的関数を解く）
+- 決定木のアンサンブル: warm_start で追加データに対する木を追加する
+  （追加する木の数は、これまでの行数に対する追加データの行数の比に比例させる）
+- LabelEncoder: 既存のコードを変えずに、未知の値を classes_ の末尾に追加する
+"""
+
+import math
+from typing import Any, Dict
+
+import numpy as np
+
+# Lassoの座標降下法の収束判定と最大反復回数
+LASSO_TOL = 1e-10
+LASSO_MAX_ITER = 10000
+
+def linear_statistics(X: np.ndarray, y: np.ndarray) -> Dict[str, Any]:
+    """線形モデルの十分統計量（標準化済みの特徴量に対する行数・合計・XᵀX・Xᵀy）"""
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    return {
+        'n': len(X),
+        'sum_x': X.sum(axis=0),
+        'sum_y': float(y.sum()),
+        'xtx': X.T @ X,
+        'xty': X.T @ y
+    }
+
+def merge_statistics(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
+    """2つのデータの十分統計量を足し合わせる"""
+    return {key: a[key] + b[key] for key in a}
+
+def centered_statistics(stats: Dict[str, Any]):
+    """平均を引いた特徴量に対する XᵀX・Xᵀy と、特徴量・目的変数の平均"""
+    n = stats['n']
+    mean_x = stats['sum_x'] / n
+    mean_y = stats['sum_y'] / n
+    sxx = stats['xtx'] - n * np.outer(mean_x, mean_x)
+    sxy = stats['xty'] - n * mean_x * mean_y
+    return sxx, sxy, mean_x, mean_y
+
+def solve_lasso(gram: np.ndarray, xy: np.ndarray, alpha: float, coef: np.ndarray) -> np.ndarray:
+    """
+    (1 / 2n)||y - Xw||² + alpha||w||₁ を座標降下法で解く（gram = XᵀX / n、xy = Xᵀy / n、平均を引いた値）
+    coef を初期値にする（更新前の係数から始めると少ない反復で収束する）
+    """
+    coef = np.array(coef, dtype=np.float64)
+    for _ in range(LASSO_MAX_ITER):
+        max_change = 0.0
+        for j in range(len(coef)):
+            if gram[j, j] == 0:
+                continue
+            rho = xy[j] - gram[j] @ coef + gram[j, j] * coef[j]
+            new = np.sign(rho) * max(abs(rho) - alpha, 0.0) / gram[j, j]
+            max_change = max(max_change, abs(new - coef[j]))
+            coef[j] = new
+        if max_change < LASSO_TOL:
+            break
+    return coef
+
+def update_linear_model(model, stats: Dict[str, Any]):
+    """十分統計量から線形モデルの係数と切片を計算し直す"""
+    sxx, sxy, mean_x, mean_y = centered_statistics(stats)
+    model_type = type(model).__name__
+    if model_type == 'LinearRegression':
+        coef = np.linalg.lstsq(sxx, sxy, rcond=None)[0]
+    elif model_type == 'Ridge':
+        coef = np.linalg.solve(sxx + model.alpha * np.eye(len(sxx)), sxy)
+    else:
+        coef = solve_lasso(sxx / stats['n'], sxy / stats['n'], model.alpha, model.coef_)
+    model.coef_ = coef
+    model.intercept_ = mean_y - mean_x @ coef
+    return model
+
+def additional_trees(n_estimators: int, n_seen: int, n_new: int) -> int:
+    """追加データに対して追加する木の数（これまでの木の数 × 追加データの行数 / これまでの行数）"""
+    return max(1, math.ceil(n_estimators * n_new / max(n_seen, 1)))
+
+def update_model(model, X_new: np.ndarray, y_new: np.ndarray, stats: Dict[str, Any]):
+    """
+    学習済みのモデルを追加データで更新する（model を直接更新して返す）
+    stats はこれまでの学習データの十分統計量（追加データ分を足したものは呼び出し側で保存する）
+    """
+    model_type = type(model).__name__
+    if model_type in ('LinearRegression', 'Ridge', 'Lasso'):
+        return update_linear_model(model, merge_statistics(stats, linear_statistics(X_new, y_new)))
+
+    if model_type in ('RandomForestRegressor', 'GradientBoostingRegressor'):
+        n_trees = len(model.estimators_)
+        model.set_params(warm_start=True, n_estimators=n_trees + additional_trees(n_trees, stats['n'], len(X_new)))
+        return model.fit(X_new, y_new)
+
+    if model_type == 'Pipeline' and type(model[-1]).__name__ == 'HistGradientBoostingRegressor':
+        # カテゴリ番号への変換は学習済みのものを使い（番号を変えない）、ブースティングだけを続ける
+        booster = model[-1]
+        n_iter = booster.n_iter_
+        booster.set_params(warm_start=True, early_stopping=False,
+                           max_iter=n_iter + additional_trees(n_iter, stats['n'], len(X_new)))
+        booster.fit(model[:-1].transform(X_new), y_new)
+        return model
+
+    raise ValueError(f"差分更新に対応していないモデルです: {model_type}")
+
+def extend_label_encoder(encoder, values) -> int:
+    """LabelEncoderに未知の値を追加し（既存の値のコードは変えない）、追加した数を返す"""
+    known = set(encoder.classes_.tolist())
+    new_values = [value for value in dict.fromkeys(np.asarray(values).tolist()) if value not in known]
+    if new_values:
+        encoder.classes_ = np.concatenate([encoder.classes_.astype(object), np.array(new_values, dtype=object)])
+    return len(new_values)
@@ -0,0 +1,105 @@
+"""
+推論をイベントループの外で実行するプール
+
+- thread: スレッドプールで実行する（NumPy・sklearnの計算中はGILが解放される）
+- process: プロセスプールで実行する（各プロセスが api.py を読み込み、モデルを個別に持つ）
+
+同時に実行する件数（workers）と待ち行列の長さ（queue_size）を制限し、
+待ち行列が埋まっている場合は InferenceOverloaded を送出して受け付けない
+"""
+
+import asyncio
+import importlib.util
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+import numpy as np
+
+class InferenceOverloaded(Exception):
+    """待ち行列が埋まっていて推論を受け付けられない"""
+
+class InferencePool:
+    """件数を制限して推論を実行するプール"""
+
+    def __init__(self, mode: str, workers: int, queue_size: int, predict: Callable, api_file: str = None):
+        if mode not in ('thread', 'process'):
+            raise ValueError(f"推論の実行モードが不正です: {mode}（thread / process）")
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+        self.predict = predict
+        self.api_file = api_file
+        self._executor = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def start(self):
+        """ワーカーを起動する"""
+        if self.mode == 'thread':
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='inference')
+        else:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker, initargs=(self.api_file,)
+            )
+
+    def shutdown(self):
+        """ワーカーを停止する"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    async def run(self, X: np.ndarray) -> np.ndarray:
+        """特徴量行列の対数価格を予測する（待ち行列が埋まっている場合は InferenceOverloaded）"""
+        with self._lock:
+            if self.in_flight >= self.workers + self.queue_size:
+                self.rejected += 1
+                raise InferenceOverloaded(
+                    f"推論の待ち行列が埋まっています（実行中と待機中: {self.in_flight}件）"
+                )
+            self.in_flight += 1
+
+        try:
+            loop = asyncio.get_running_loop()
+            # 呼び出し元のバッファ（/predict の特徴量バッファ）は次のリクエストで書き換えられるため、コピーを渡す
+            # （processモードでも引数のpickle化は送信用のスレッドで後から行われるため、コピーが必要）
+            X = np.array(X)
+            if self.mode == 'thread':
+                return await loop.run_in_executor(self._executor, self.predict, X)
+            return await loop.run_in_executor(self._executor, _predict_in_worker, X)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """実行状況を返す"""
+        with self._lock:
+            return {
+                'mode': self.mode,
+                'workers': self.workers,
+                'queue_size': self.queue_size,
+                'in_flight': self.in_flight,
+                'completed': self.completed,
+                'rejected': self.rejected
+            }
+
+# ワーカープロセス内で読み込んだ api.py
+_worker_api = None
+
+def _init_worker(api_file: str):
+    """ワーカープロセスで api.py を読み込み、モデルを読み込む"""
+    global _worker_api
+    spec = importlib.util.spec_from_file_location('fukuyama_api', api_file)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['fukuyama_api'] = module
+    spec.loader.exec_module(module)
+    module.models = module.load_models()
+    _worker_api = module
+
+def _predict_in_worker(X: np.ndarray) -> np.ndarray:
+    """ワーカープロセスで対数価格を予測する"""
+    return _worker_api.predict_log_prices(X)
@@ -0,0 +1,231 @@
+"""
+Prometheusのテキスト形式で公開するメトリクス（カウンター・ゲージ・ヒストグラム）
+
+本番環境で常に有効にできるよう、記録は perf_counter の差分をヒストグラムのバケットに数えるだけにしている。
+ラベルの組み合わせごとの値は初回に作成して使い回し、集計（累積値の計算・文字列化）は /metrics の取得時にだけ行う。
+記録と集計はどちらもイベントループのスレッドで行う前提で、ロックを取らない
+（別のスレッドから更新するのはゲージの値の代入だけにする）
+"""
+
+import math
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple
+
+# レイテンシのバケット（秒）。1件の予測の各段階（数μs〜）から大きなバッチ（数秒）まで
+DEFAULT_BUCKETS = (
+    0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+def format_value(value: float) -> str:
+    """Prometheusの数値の表記"""
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    """ラベルの表記（{name="value",...}、ラベルがなければ空文字列）"""
+    if not names:
+        return ''
+    escaped = (
+        str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+        for value in values
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+class _Metric:
+    """ラベルの組み合わせごとの値を持つメトリクスの共通部分"""
+
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+
+    def labels(self, *values):
+        """ラベルの値の組み合わせに対応する値を返す（初回だけ作成する）"""
+        child = self._children.get(values)
+        if child is None:
+            child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(format_labels(self.labelnames, values), values, child))
+        return lines
+
+    def _render_child(self, labels: str, values: tuple, child) -> List[str]:
+        return [f'{self.name}{labels} {format_value(child.value)}']
+
+class _Value:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def set(self, value: float):
+        self.value = value
+
+class Counter(_Metric):
+    """増えるだけの値（リクエスト数・エラー数など）"""
+
+    kind = 'counter'
+
+    def _new_child(self):
+        return _Value()
+
+class Gauge(_Metric):
+    """任意に変わる値（読み込み時間など）"""
+
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _Value()
+
+class _HistogramValue:
+    __slots__ = ('bounds', 'counts', 'sum')
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # counts[i] は bounds[i-1] < 値 <= bounds[i] の件数（最後は上限なし）
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+class Histogram(_Metric):
+    """値の分布（バケットごとの件数・合計・件数）"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.bounds = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.bounds)
+
+    def _render_child(self, labels: str, values: tuple, child) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds + (math.inf,), child.counts):
+            cumulative += count
+            bucket_labels = format_labels(self.labelnames + ('le',), values + (format_value(bound),))
+            lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+        lines.append(f'{self.name}_sum{labels} {format_value(child.sum)}')
+        lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+class CallbackMetric:
+    """取得時に関数を呼び出して値を集める（他のモジュールが持つ集計値を公開する場合）"""
+
+    def __init__(self, name: str, documentation: str, kind: str, labelnames: Sequence[str],
+                 collect: Callable[[], Iterable[Tuple[tuple, float]]]):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for values, value in self.collect():
+            lines.append(f'{self.name}{format_labels(self.labelnames, values)} {format_value(value)}')
+        return lines
+
+class MetricsRegistry:
+    """メトリクスの登録とテキスト形式への変換"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name: str, documentation: str, kind: str, labelnames: Sequence[str],
+                 collect: Callable[[], Iterable[Tuple[tuple, float]]]) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, kind, labelnames, collect))
+
+    def render(self) -> str:
+        """Prometheusのテキスト形式（version 0.0.4）"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+class RequestTimer:
+    """
+    1件のリクエストの段階ごとの処理時間を記録する
+    mark(stage) は前回の mark（最初はリクエストの開始）からの経過時間をその段階の時間として記録する
+    """
+
+    __slots__ = ('histogram', 'endpoint', 'start', 'last')
+
+    def __init__(self, histogram: Histogram, endpoint: str):
+        self.histogram = histogram
+        self.endpoint = endpoint
+        self.start = self.last = time.perf_counter()
+
+    def mark(self, stage: str):
+        now = time.perf_counter()
+        self.histogram.labels(self.endpoint, stage).observe(now - self.last)
+        self.last = now
+
+    def marked(self) -> bool:
+        """段階を1つ以上記録したか"""
+        return self.last != self.start
+
+class _NullTimer:
+    """計測しない場合のタイマー（エンドポイントを直接呼び出した場合など）"""
+
+    __slots__ = ()
+
+    def mark(self, stage: str):
+        pass
+
+    def marked(self) -> bool:
+        return False
+
+NULL_TIMER = _NullTimer()
+
+# 処理中のリクエストのタイマー（リクエストごとのコンテキストに設定される）
+_current_timer: ContextVar[Optional[RequestTimer]] = ContextVar('request_timer', default=None)
+
+def start_request_timer(histogram: Histogram, endpoint: str):
+    """リクエストのタイマーを開始し、(タイマー, 元に戻すためのトークン) を返す"""
+    timer = RequestTimer(histogram, endpoint)
+    return timer, _current_timer.set(timer)
+
+def reset_request_timer(token):
+    _current_timer.reset(token)
+
+def request_timer():
+    """処理中のリクエストのタイマー（なければ何もしないタイマー）"""
+    return _current_timer.get() or NULL_TIMER
@@ -0,0 +1,99 @@
+"""
+同時に届いた /predict のリクエストをまとめて予測するマイクロバッチ
+
+最初のリクエストが届いてから window 秒待つか、max_batch_size 件集まった時点で
+特徴量行列をまとめて1回だけ予測し、各リクエストの future に結果を返す。
+同時に届くリクエストが多いほど1回にまとめる件数が増え、少ない場合は小さなバッチで処理される
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, List
+
+import numpy as np
+
+class MicroBatcher:
+    """単発の予測リクエストをまとめて評価する"""
+
+    def __init__(self, predict: Callable[[np.ndarray], Awaitable[np.ndarray]], window: float, max_batch_size: int):
+        # predict: 標準化前の特徴量行列を受け取り、対数価格の配列を返すコルーチン関数
+        self.predict = predict
+        self.window = window
+        self.max_batch_size = max(1, max_batch_size)
+        self._rows: List[np.ndarray] = []
+        self._futures: List[asyncio.Future] = []
+        self._timer = None
+        self._tasks = set()
+        self.batches = 0
+        self.requests = 0
+        self.max_observed_batch = 0
+
+    async def submit(self, row: np.ndarray) -> float:
+        """特徴量1行分の対数価格を予測する（他のリクエストとまとめて評価される）"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        # 呼び出し元のバッファは次のリクエストで書き換えられるためコピーして保持する
+        self._rows.append(np.array(row, dtype=np.float64).ravel())
+        self._futures.append(future)
+
+        if len(self._rows) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self):
+        """集まったリクエストを1つのバッチとして予測を開始する"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._rows:
+            return
+
+        rows, futures = self._rows, self._futures
+        self._rows, self._futures = [], []
+        self.batches += 1
+        self.requests += len(rows)
+        self.max_observed_batch = max(self.max_observed_batch, len(rows))
+        # 実行中のタスクが破棄されないよう参照を保持する
+        task = asyncio.ensure_future(self._run_batch(np.vstack(rows), futures))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, X: np.ndarray, futures: List[asyncio.Future]):
+        # 不正な値を含む行はバッチから外し、その行のリクエストだけをエラーにする
+        valid = np.isfinite(X).all(axis=1)
+        for i in np.flatnonzero(~valid):
+            if not futures[i].done():
+                futures[i].set_exception(ValueError("Input X contains NaN or infinity."))
+
+        rows = np.flatnonzero(valid)
+        if len(rows) == 0:
+            return
+
+        try:
+            predictions = await self.predict(X[rows])
+        except BaseException as e:
+            for i in rows:
+                if not futures[i].done():
+                    futures[i].set_exception(e)
+            return
+
+        for i, prediction in zip(rows, predictions):
+            if not futures[i].done():
+                futures[i].set_result(float(prediction))
+
+    def idle(self) -> bool:
+        """待機中・実行中のリクエストがないか"""
+        return not self._rows and not self._tasks
+
+    def stats(self) -> Dict[str, float]:
+        """まとめた件数の統計を返す"""
+        return {
+            'window_ms': self.window * 1e3,
+            'max_batch_size': self.max_batch_size,
+            'batches': self.batches,
+            'requests': self.requests,
+            'mean_batch_size': self.requests / self.batches if self.batches else 0.0,
+            'max_observed_batch': self.max_observed_batch
+        }
@@ -0,0 +1,171 @@
+"""
+学習済みモデル一式を1ファイルにまとめたバンドル
+
+推論に必要な値（モデル情報・標準化のパラメータ・エンコーダーのクラス・決定木の配列）は
+sklearnに依存しない形で無圧縮で保存し、NumPy配列は mmap_mode で読み込めるようにする。
+sklearnのオブジェクト（モデル・スケーラー・エンコーダー）はバイト列として同じファイルに格納し、
+必要になった時点で初めて復元する（sklearnのimportを遅らせるため）
+
+既存の個別ファイルからバンドルを作成する場合:
+    python model_bundle.py
+"""
+
+import hashlib
+import os
+import pickle
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+import joblib
+import numpy as np
+
+import tree_engine
+
+BUNDLE_FILE = 'models/model_bundle.joblib'
+
+# バンドルの形式のバージョン（形式を変えたら上げる）
+BUNDLE_FORMAT_VERSION = 2
+
+# 個別ファイルの配置（sklearnのオブジェクト名 -> ファイル）
+MODEL_INFO_FILE = 'models/model_info.pkl'
+SKLEARN_FILES = {
+    'model': 'models/best_model.pkl',
+    'scaler': 'models/scaler.pkl',
+    'district_encoder': 'label_encoders/district_encoder.pkl',
+    'type_encoder': 'label_encoders/type_encoder.pkl',
+    'year_encoder': 'label_encoders/year_encoder.pkl'
+}
+TREE_ENSEMBLE_FILE = 'models/tree_ensemble.npz'
+
+# エンコーダーと入力項目の対応
+ENCODER_FIELDS = {
+    'district_name': 'district_encoder',
+    'property_type': 'type_encoder',
+    'building_year_category': 'year_encoder'
+}
+
+def artifact_paths() -> List[str]:
+    """モデルのバージョン計算に使うファイルの一覧"""
+    return [MODEL_INFO_FILE] + list(SKLEARN_FILES.values()) + [TREE_ENSEMBLE_FILE]
+
+def compute_artifact_version() -> str:
+    """個別ファイルの内容からモデルのバージョン（ハッシュ値）を計算する"""
+    digest = hashlib.sha256()
+    for path in artifact_paths():
+        if not os.path.exists(path):
+            continue
+        digest.update(path.encode('utf-8'))
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+def scaler_params(scaler) -> Dict[str, np.ndarray]:
+    """StandardScalerの平均と標準偏差（使わない場合は0と1）を取り出す"""
+    n_features = len(scaler.mean_)
+    return {
+        'mean': np.asarray(scaler.mean_ if scaler.with_mean else np.zeros(n_features), dtype=np.float64),
+        'scale': np.asarray(scaler.scale_ if scaler.with_std else np.ones(n_features), dtype=np.float64)
+    }
+
+def load_artifact_files() -> Dict[str, Any]:
+    """個別ファイルからモデル一式を読み込む（sklearnのオブジェクトもすぐに読み込む）"""
+    sklearn_objects = {name: joblib.load(path) for name, path in SKLEARN_FILES.items()}
+
+    tree_arrays = None
+    if os.path.exists(TREE_ENSEMBLE_FILE):
+        with np.load(TREE_ENSEMBLE_FILE, allow_pickle=False) as data:
+            tree_arrays = {key: data[key] for key in data.files}
+
+    return {
+        'version': compute_artifact_version(),
+        'model_info': joblib.load(MODEL_INFO_FILE),
+        'scaler_params': scaler_params(sklearn_objects['scaler']),
+        'encoder_classes': {
+            field: sklearn_objects[name].classes_ for field, name in ENCODER_FIELDS.items()
+        },
+        'tree_ensemble': tree_arrays,
+        # 個別ファイルの配列は古い可能性があるため、読み込み側でモデルと照合する
+        'tree_ensemble_verified': False,
+        'load_sklearn': lambda: sklearn_objects
+    }
+
+def save_model_bundle(file_path: str = BUNDLE_FILE):
+    """個別ファイルを読み込み、1つのバンドルにまとめて保存する"""
+    artifacts = load_artifact_files()
+    sklearn_objects = artifacts['load_sklearn']()
+    model = sklearn_objects['model']
+    params = artifacts['scaler_params']
+
+    # 決定木の配列はsklearnの予測と完全に一致する場合のみ格納する
+    if artifacts['tree_ensemble'] is not None:
+        ensemble = tree_engine.TreeEnsemble(artifacts['tree_ensemble'])
+    else:
+        ensemble = tree_engine.export_tree_ensemble(model)
+
+    tree_arrays = None
+    if ensemble is not None:
+        X = (tree_engine.make_probe_rows(params['mean'], params['scale']) - params['mean']) / params['scale']
+        if ensemble.n_features_in_ == X.shape[1] and np.array_equal(ensemble.predict(X), model.predict(X)):
+            tree_arrays = ensemble.arrays
+        else:
+            print("決定木の配列がモデルと一致しないため、バンドルに含めません")
+
+    bundle = {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'version': artifacts['version'],
+        'model_info': artifacts['model_info'],
+        'scaler_params': params,
+        'encoder_classes': artifacts['encoder_classes'],
+        'tree_ensemble': tree_arrays,
+        'sklearn_objects': pickle.dumps(sklearn_objects, protocol=pickle.HIGHEST_PROTOCOL)
+    }
+
+    # mmap_modeで読み込めるよう無圧縮で保存する
+    joblib.dump(bundle, file_path, compress=0)
+    print(f"モデルバンドルを保存しました: {file_path}（バージョン: {artifacts['version']}）")
+
+def lazy_loader(payload: bytes) -> Callable[[], Dict[str, Any]]:
+    """sklearnのオブジェクトを最初に呼ばれた時点で復元する関数を作成する"""
+    loaded = {}
+    lock = threading.Lock()
+
+    def load_sklearn():
+        with lock:
+            if not loaded:
+                start = time.perf_counter()
+                loaded.update(pickle.loads(payload))
+                print(f"sklearnのモデルを読み込みました（{(time.perf_counter() - start) * 1e3:.0f}ms）")
+        return loaded
+
+    return load_sklearn
+
+def load_model_bundle(file_path: str = BUNDLE_FILE, mmap_mode: str = 'r') -> Dict[str, Any]:
+    """バンドルからモデル一式を読み込む（NumPy配列はメモリマップされ、sklearnは必要になるまで読み込まない）"""
+    bundle = joblib.load(file_path, mmap_mode=mmap_mode)
+    if bundle.get('format_version') != BUNDLE_FORMAT_VERSION:
+        raise ValueError(
+            f"モデルバンドルの形式が対応していません: {bundle.get('format_version')} (期待値: {BUNDLE_FORMAT_VERSION})"
+        )
+
+    return {
+        'version': bundle['version'],
+        'model_info': bundle['model_info'],
+        'scaler_params': bundle['scaler_params'],
+        'encoder_classes': bundle['encoder_classes'],
+        'tree_ensemble': bundle['tree_ensemble'],
+        'tree_ensemble_verified': bundle['tree_ensemble'] is not None,
+        'load_sklearn': lazy_loader(bundle['sklearn_objects'])
+    }
+
+def is_bundle_stale(file_path: str = BUNDLE_FILE) -> bool:
+    """バンドルより新しい個別ファイルがあるか確認する"""
+    bundle_mtime = os.path.getmtime(file_path)
+    return any(
+        os.path.exists(path) and os.path.getmtime(path) > bundle_mtime
+        for path in artifact_paths()
+    )
+
+if __name__ == "__main__":
+    save_model_bundle()
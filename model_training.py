@@ -2,14 +2,37 @@ import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor, HistGradientBoostingRegressor
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OrdinalEncoder
 from sklearn.linear_model import LinearRegression, Ridge, Lasso
 from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
-from sklearn.model_selection import cross_val_score
+from sklearn.model_selection import cross_val_score, KFold
+import argparse
 import joblib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 import warnings
+from tree_engine import export_tree_ensemble, save_tree_ensemble
+from model_bundle import save_model_bundle
+import feature_transform
+from hyperparameter_search import successive_halving
+from incremental_training import linear_statistics, merge_statistics, update_model, extend_label_encoder
+from data_preprocessing import PREPROCESSED_FILE, LEGACY_PREPROCESSED_FILE, load_preprocessed
 warnings.filterwarnings('ignore')
 
+def fit_label_encoder(values):
+    """
+    LabelEncoderを学習し、コードの配列とともに返す（fit_transform と同じ結果）
+    全ての行を並べ替える代わりに、重複を除いた値だけでエンコーダーを学習する
+    """
+    inverse, uniques = pd.factorize(values, use_na_sentinel=False)
+    encoder = LabelEncoder().fit(np.asarray(uniques))
+    return encoder, encoder.transform(np.asarray(uniques))[inverse]
+
 def create_features(df: pd.DataFrame) -> pd.DataFrame:
     """
     特徴量エンジニアリングを行う
@@ -20,39 +43,24 @@ def create_features(df: pd.DataFrame) -> pd.DataFrame:
     df_features = df.copy()
     
     # 1. 町名のエンコーディング
-    le_district = LabelEncoder()
-    df_features['DistrictName_encoded'] = le_district.fit_transform(df_features['DistrictName'])
+    le_district, district_codes = fit_label_encoder(df_features['DistrictName'])
     
     # 2. 建物タイプのエンコーディング
-    le_type = LabelEncoder()
-    df_features['Type_encoded'] = le_type.fit_transform(df_features['Type'])
-    
-    # 3. 面積の対数変換（価格との関係を線形に近づける）
-    df_features['Area_log'] = np.log1p(df_features['Area'])
-    
-    # 4. 築年数のカテゴリ化
-    def categorize_building_year(year):
-        if year == 0:
-            return 'new'  # 新築
-        elif year <= 5:
-            return 'very_new'  # 築5年以内
-        elif year <= 10:
-            return 'new'  # 築10年以内
-        elif year <= 20:
-            return 'medium'  # 築20年以内
-        elif year <= 30:
-            return 'old'  # 築30年以内
-        else:
-            return 'very_old'  # 築30年超
-    
-    df_features['BuildingYear_category'] = df_features['BuildingYear'].apply(categorize_building_year)
-    le_year = LabelEncoder()
-    df_features['BuildingYear_category_encoded'] = le_year.fit_transform(df_features['BuildingYear_category'])
-    
-    # 5. 面積と築年数の交互作用項
-    df_features['Area_BuildingYear_interaction'] = df_features['Area'] * df_features['BuildingYear']
-    
-    # 6. 価格の対数変換（ターゲット変数）
+    le_type, type_codes = fit_label_encoder(df_features['Type'])
+    
+    # 3. 築年数のカテゴリ化（APIと共通の区分）
+    building_year = df_features['BuildingYear'].to_numpy(dtype=np.float64)
+    df_features['BuildingYear_category'] = feature_transform.categorize_building_years(building_year)
+    le_year, year_category_codes = fit_label_encoder(df_features['BuildingYear_category'])
+    
+    # 4. 特徴量の計算（面積の対数変換、面積と築年数の交互作用項を含む。APIと共通）
+    features = feature_transform.compute_features(
+        district_codes, type_codes, df_features['Area'].to_numpy(dtype=np.float64), building_year, year_category_codes
+    )
+    for column in feature_transform.FEATURE_COLUMNS:
+        df_features[column] = features[column]
+    
+    # 5. 価格の対数変換（ターゲット変数）
     df_features['TradePrice_log'] = np.log1p(df_features['TradePrice'])
     
     # エンコーダーを保存
@@ -64,55 +72,232 @@ def create_features(df: pd.DataFrame) -> pd.DataFrame:
     
     return df_features
 
-def train_models(X_train, X_test, y_train, y_test):
+# train_models で学習・交差検証を並列に行うプロセス数（1で逐次実行）
+TRAINING_WORKERS = int(os.environ.get('TRAINING_WORKERS', str(os.cpu_count() or 1)))
+
+# 交差検証の分割数
+CV_FOLDS = 5
+
+# ハイパーパラメータ探索の時間予算（秒）
+SEARCH_BUDGET_SECONDS = float(os.environ.get('SEARCH_BUDGET_SECONDS', '300'))
+
+# ハイパーパラメータの探索空間
+# （勾配ブースティングは学習に渡した行から validation_fraction の割合を取り分けて早期終了する。探索の評価用の分割とは別）
+SEARCH_SPACES = {
+    'Linear Regression': {},
+    'Ridge': {'alpha': np.logspace(-3, 3, 13).tolist()},
+    'Lasso': {'alpha': np.logspace(-5, 0, 11).tolist()},
+    'Random Forest': {
+        'max_depth': [None, 10, 20, 30],
+        'min_samples_leaf': [1, 2, 5, 10],
+        'max_features': [1.0, 0.7, 0.5, 'sqrt']
+    },
+    'Gradient Boosting': {
+        'n_estimators': [1000],
+        'n_iter_no_change': [10],
+        'validation_fraction': [0.1],
+        'learning_rate': [0.03, 0.05, 0.1, 0.2],
+        'max_depth': [2, 3, 4, 5],
+        'subsample': [0.7, 0.85, 1.0],
+        'min_samples_leaf': [1, 5, 20]
+    },
+    'Hist Gradient Boosting': {
+        'model__max_iter': [1000],
+        'model__early_stopping': [True],
+        'model__learning_rate': [0.03, 0.05, 0.1, 0.2],
+        'model__max_leaf_nodes': [15, 31, 63],
+        'model__min_samples_leaf': [5, 20, 50],
+        'model__l2_regularization': [0.0, 0.1, 1.0]
+    }
+}
+
+# 特徴量のうち、カテゴリとして扱う列（町名・建物タイプのラベル）の位置
+CATEGORICAL_FEATURES = [0, 1]
+
+# 並列学習のワーカープロセスが使う学習データ（initializerで設定される）
+_training_data = None
+
+def make_candidate_models():
     """
-    複数のモデルを学習・評価する
+    候補のモデルを作成する（乱数シードを固定しているため、何度作っても同じ結果になる）
     """
-    models = {
+    return {
         'Linear Regression': LinearRegression(),
         'Ridge': Ridge(alpha=1.0),
         'Lasso': Lasso(alpha=0.1),
         'Random Forest': RandomForestRegressor(n_estimators=100, random_state=42),
-        'Gradient Boosting': GradientBoostingRegressor(n_estimators=100, random_state=42)
+        'Gradient Boosting': GradientBoostingRegressor(n_estimators=100, random_state=42),
+        'Hist Gradient Boosting': make_hist_gradient_boosting()
     }
-    
+
+def make_candidate_model(name: str, params: dict = None):
+    """
+    候補のモデルを1つ作成し、params のハイパーパラメータを設定する
+    """
+    model = make_candidate_models()[name]
+    if params:
+        model.set_params(**params)
+    return model
+
+def make_hist_gradient_boosting():
+    """
+    町名・建物タイプをカテゴリとして扱う HistGradientBoostingRegressor
+    入力は他のモデルと同じ標準化済みの特徴量で、標準化したラベルの値をOrdinalEncoderでカテゴリ番号に戻す
+    （学習データにない町名は欠損値として扱う。カテゴリ数がビン数を超える場合は出現の少ないものをまとめる）
+    """
+    categories = ColumnTransformer(
+        [('categories', OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=np.nan, max_categories=255),
+          CATEGORICAL_FEATURES)],
+        remainder='passthrough'
+    )
+    return Pipeline([
+        ('categories', categories),
+        ('model', HistGradientBoostingRegressor(categorical_features=CATEGORICAL_FEATURES, random_state=42))
+    ])
+
+def evaluate_model(model, X_test, y_test):
+    """
+    テストデータで評価指標を計算する
+    """
+    y_pred = model.predict(X_test)
+    mse = mean_squared_error(y_test, y_pred)
+    return {
+        'mse': mse,
+        'rmse': np.sqrt(mse),
+        'mae': mean_absolute_error(y_test, y_pred),
+        'r2': r2_score(y_test, y_pred)
+    }
+
+def print_model_result(result):
+    """
+    モデルの評価結果を表示する
+    """
+    print(f"学習時間: {result['train_seconds']:.2f}秒")
+    print(f"R² Score: {result['r2']:.4f}")
+    print(f"RMSE: {result['rmse']:.2f}")
+    print(f"MAE: {result['mae']:.2f}")
+    print(f"CV R² Score: {result['cv_mean']:.4f} (+/- {result['cv_std'] * 2:.4f})")
+
+def make_folds(X_train):
+    """
+    交差検証の分割（cross_val_score(cv=5) と同じ分割）
+    """
+    return list(KFold(n_splits=CV_FOLDS).split(X_train))
+
+def search_hyperparameters(X_train, y_train, budget_seconds: float = None, workers: int = None):
+    """
+    全ての候補モデルのハイパーパラメータを時間予算内で探索し、モデル名 -> 探索結果 を返す
+    """
+    budget_seconds = SEARCH_BUDGET_SECONDS if budget_seconds is None else budget_seconds
+    workers = TRAINING_WORKERS if workers is None else workers
+    search_results = successive_halving(
+        make_candidate_model, SEARCH_SPACES, X_train, np.asarray(y_train), make_folds(X_train)[0],
+        budget_seconds, workers
+    )
+
+    print(f"\n{'モデル':<26}{'検証R²':>10}{'評価数':>8}  ハイパーパラメータ")
+    for name, result in search_results.items():
+        print(f"{name:<26}{result['score']:>10.4f}{result['evaluated']:>8}  {result['params']}")
+    return search_results
+
+def train_models(X_train, X_test, y_train, y_test, workers: int = None, params: dict = None):
+    """
+    複数のモデルを学習・評価する
+    交差検証の分割は1回だけ計算し、全てのモデルで共有する（cross_val_score(cv=5) と同じ分割）
+    workers が2以上の場合は、モデル × (全データ + 各分割) の学習をプロセスプールで並列に行う
+    params（モデル名 -> ハイパーパラメータ）を指定すると、そのモデルの既定値を置き換える
+    """
+    workers = TRAINING_WORKERS if workers is None else workers
+    params = params or {}
+    y_train = np.asarray(y_train)
+    y_test = np.asarray(y_test)
+    folds = make_folds(X_train)
+
+    if workers > 1:
+        return train_models_parallel(X_train, X_test, y_train, y_test, folds, workers, params)
+
     results = {}
     
-    for name, model in models.items():
+    for name in make_candidate_models():
         print(f"\n{name} を学習中...")
+        model = make_candidate_model(name, params.get(name))
         
         # モデル学習
+        start = time.perf_counter()
         model.fit(X_train, y_train)
-        
-        # 予測
-        y_pred = model.predict(X_test)
+        train_seconds = time.perf_counter() - start
         
         # 評価指標計算
-        mse = mean_squared_error(y_test, y_pred)
-        rmse = np.sqrt(mse)
-        mae = mean_absolute_error(y_test, y_pred)
-        r2 = r2_score(y_test, y_pred)
+        result = {'model': model, **evaluate_model(model, X_test, y_test), 'train_seconds': train_seconds}
         
         # クロスバリデーション
-        cv_scores = cross_val_score(model, X_train, y_train, cv=5, scoring='r2')
+        cv_scores = cross_val_score(model, X_train, y_train, cv=folds, scoring='r2')
+        result['cv_mean'] = cv_scores.mean()
+        result['cv_std'] = cv_scores.std()
         
-        results[name] = {
-            'model': model,
-            'mse': mse,
-            'rmse': rmse,
-            'mae': mae,
-            'r2': r2,
-            'cv_mean': cv_scores.mean(),
-            'cv_std': cv_scores.std()
-        }
-        
-        print(f"R² Score: {r2:.4f}")
-        print(f"RMSE: {rmse:.2f}")
-        print(f"MAE: {mae:.2f}")
-        print(f"CV R² Score: {cv_scores.mean():.4f} (+/- {cv_scores.std() * 2:.4f})")
+        results[name] = result
+        print_model_result(result)
     
     return results
 
+def _init_training_worker(X_train, X_test, y_train, y_test, folds, params):
+    """ワーカープロセスに学習データと分割、ハイパーパラメータを設定する"""
+    global _training_data
+    _training_data = (X_train, X_test, y_train, y_test, folds, params)
+
+def _fit_job(name: str, fold: int = None):
+    """
+    1つのモデルを学習する（ワーカープロセスで実行される）
+    fold がNoneなら全学習データで学習して学習済みモデルと評価指標を、そうでなければその分割のR²を返す
+    """
+    X_train, X_test, y_train, y_test, folds, params = _training_data
+    model = make_candidate_model(name, params.get(name))
+    if fold is None:
+        start = time.perf_counter()
+        model.fit(X_train, y_train)
+        train_seconds = time.perf_counter() - start
+        return {'model': model, **evaluate_model(model, X_test, y_test), 'train_seconds': train_seconds}
+
+    train_index, valid_index = folds[fold]
+    model.fit(X_train[train_index], y_train[train_index])
+    return r2_score(y_train[valid_index], model.predict(X_train[valid_index]))
+
+def train_models_parallel(X_train, X_test, y_train, y_test, folds, workers: int, params: dict):
+    """
+    モデル × (全データ + 各分割) の学習をプロセスプールで並列に行う
+    """
+    names = list(make_candidate_models())
+    print(f"\n{len(names)} モデル × {len(folds) + 1} 回の学習を {workers} プロセスで実行中...")
+
+    # forkできる環境では学習データをコピーオンライトで共有する
+    context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_training_worker,
+                             initargs=(X_train, X_test, y_train, y_test, folds, params)) as executor:
+        # 時間のかかるアンサンブルから投入し、最後に1つだけ長いジョブが残らないようにする
+        jobs = [(name, fold) for name in reversed(names) for fold in [None] + list(range(len(folds)))]
+        futures = {job: executor.submit(_fit_job, *job) for job in jobs}
+
+        results = {}
+        for name in names:
+            result = futures[(name, None)].result()
+            cv_scores = np.array([futures[(name, fold)].result() for fold in range(len(folds))])
+            result['cv_mean'] = cv_scores.mean()
+            result['cv_std'] = cv_scores.std()
+            results[name] = result
+
+            print(f"\n{name}")
+            print_model_result(result)
+
+    return results
+
+def print_results_table(results):
+    """
+    全てのモデルの学習時間と評価指標を一覧で表示する
+    """
+    print(f"\n{'モデル':<26}{'学習時間(秒)':>12}{'R²':>10}{'CV R²':>10}{'RMSE':>10}")
+    for name, result in results.items():
+        print(f"{name:<26}{result['train_seconds']:>12.2f}{result['r2']:>10.4f}{result['cv_mean']:>10.4f}{result['rmse']:>10.4f}")
+
 def select_best_model(results):
     """
     最良のモデルを選択する
@@ -125,16 +310,121 @@ def select_best_model(results):
     
     return best_model_name, best_model
 
-def main():
+def save_best_model(best_model, model_info):
+    """
+    最良のモデル・決定木の配列・モデル情報を保存し、モデルバンドルを作り直す
+    """
+    # 最良のモデルを保存
+    joblib.dump(best_model, 'models/best_model.pkl')
+    
+    # 決定木のアンサンブルは推論エンジン用の配列も書き出す
+    tree_ensemble = export_tree_ensemble(best_model)
+    if tree_ensemble is not None:
+        save_tree_ensemble(tree_ensemble, 'models/tree_ensemble.npz')
+        print(f"決定木の配列を書き出しました: models/tree_ensemble.npz")
+    elif os.path.exists('models/tree_ensemble.npz'):
+        # 前回の学習で書き出した配列が残っていれば削除
+        os.remove('models/tree_ensemble.npz')
+    
+    joblib.dump(model_info, 'models/model_info.pkl')
+    
+    # API起動用に全ファイルを1つのバンドルにまとめる
+    save_model_bundle()
+
+def encode_features(df: pd.DataFrame, encoders: dict) -> pd.DataFrame:
+    """
+    学習済みのエンコーダーで特徴量を作成する（未知の町名・建物タイプはエンコーダーの末尾に追加する）
+    """
+    building_year = df['BuildingYear'].to_numpy(dtype=np.float64)
+    codes = {}
+    for field, values in [('district', df['DistrictName']), ('type', df['Type']),
+                          ('year', feature_transform.categorize_building_years(building_year))]:
+        added = extend_label_encoder(encoders[field], values)
+        if added:
+            print(f"エンコーダー '{field}' に {added} 件の値を追加しました")
+        codes[field] = encoders[field].transform(np.asarray(values, dtype=object))
+
+    features = feature_transform.compute_features(
+        codes['district'], codes['type'], df['Area'].to_numpy(dtype=np.float64), building_year, codes['year']
+    )
+    return pd.DataFrame({column: features[column] for column in feature_transform.FEATURE_COLUMNS}, index=df.index)
+
+def incremental_main(data_file: str):
+    """
+    追加データで学習済みの最良のモデルを差分更新する（全データでの再学習を行わない）
+    スケーラーは学習時のものを使い、エンコーダーは既存のコードを変えずに未知の値を追加する
+    """
+    print("=== 追加データによるモデルの差分更新 ===")
+    
+    model_info = joblib.load('models/model_info.pkl')
+    if 'linear_statistics' not in model_info:
+        print("学習データの十分統計量がありません。先に全データで model_training.py を実行してください。")
+        return
+    
+    df = load_preprocessed(data_file)
+    print(f"追加データ読み込み完了: {len(df)} レコード ({data_file})")
+    
+    encoder_files = {
+        'district': 'label_encoders/district_encoder.pkl',
+        'type': 'label_encoders/type_encoder.pkl',
+        'year': 'label_encoders/year_encoder.pkl'
+    }
+    encoders = {field: joblib.load(path) for field, path in encoder_files.items()}
+    scaler = joblib.load('models/scaler.pkl')
+    model = joblib.load('models/best_model.pkl')
+    model_name = model_info['best_model_name']
+    
+    # 追加データを学習用と評価用に分ける（全データで学習する場合と同じ分割方法）
+    X = encode_features(df, encoders)[model_info['feature_columns']]
+    y = np.log1p(df['TradePrice']).to_numpy()
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    X_train_scaled = scaler.transform(X_train)
+    X_test_scaled = scaler.transform(X_test)
+    
+    before = evaluate_model(model, X_test_scaled, y_test)
+    start = time.perf_counter()
+    model = update_model(model, X_train_scaled, y_train, model_info['linear_statistics'])
+    update_seconds = time.perf_counter() - start
+    after = evaluate_model(model, X_test_scaled, y_test)
+    
+    full_seconds = model_info['results'][model_name]['train_seconds']
+    n_seen = model_info['linear_statistics']['n']
+    print(f"\n{model_name}: {n_seen:,} 行で学習済み + 追加 {len(X_train):,} 行")
+    print(f"差分更新: {update_seconds:.2f}秒（全データでの学習: {full_seconds:.2f}秒 / {n_seen:,} 行）")
+    print(f"{'追加データの評価':<20}{'R²':>10}{'RMSE':>10}{'MAE':>10}")
+    for label, result in [('更新前', before), ('更新後', after)]:
+        print(f"{label:<20}{result['r2']:>10.4f}{result['rmse']:>10.4f}{result['mae']:>10.4f}")
+    
+    model_info['linear_statistics'] = merge_statistics(
+        model_info['linear_statistics'], linear_statistics(X_train_scaled, y_train)
+    )
+    model_info.setdefault('incremental_updates', []).append({
+        'data_file': data_file,
+        'rows': len(X_train),
+        'seconds': update_seconds,
+        'before': before,
+        'after': after
+    })
+    
+    for field, path in encoder_files.items():
+        joblib.dump(encoders[field], path)
+    save_best_model(model, model_info)
+    print(f"\n差分更新完了！モデルバンドル: models/model_bundle.joblib")
+
+def main(search: bool = False, search_budget: float = None):
     """
     メイン処理
+    search が真の場合は、学習の前に時間予算つきでハイパーパラメータを探索する
     """
     print("=== 不動産価格予測モデル学習 ===")
     
-    # データ読み込み
+    # データ読み込み（Parquetがなければ以前のCSVを読み込む）
+    data_file = os.environ.get('PREPROCESSED_DATA')
+    if data_file is None:
+        data_file = PREPROCESSED_FILE if os.path.exists(PREPROCESSED_FILE) else LEGACY_PREPROCESSED_FILE
     try:
-        df = pd.read_csv('preprocessed_data.csv')
-        print(f"データ読み込み完了: {len(df)} レコード")
+        df = load_preprocessed(data_file)
+        print(f"データ読み込み完了: {len(df)} レコード ({data_file})")
     except FileNotFoundError:
         print("前処理済みデータが見つかりません。先にdata_preprocessing.pyを実行してください。")
         return
@@ -143,10 +433,7 @@ def main():
     df_features = create_features(df)
     
     # 特徴量とターゲットの分離
-    feature_columns = [
-        'DistrictName_encoded', 'Type_encoded', 'Area', 'Area_log', 
-        'BuildingYear', 'BuildingYear_category_encoded', 'Area_BuildingYear_interaction'
-    ]
+    feature_columns = list(feature_transform.FEATURE_COLUMNS)
     
     X = df_features[feature_columns]
     y = df_features['TradePrice_log']  # 対数変換した価格
@@ -170,35 +457,56 @@ def main():
     # スケーラーを保存
     joblib.dump(scaler, 'models/scaler.pkl')
     
+    # ハイパーパラメータ探索（探索した設定で全ての学習データを使って学習し直し、交差検証する）
+    search_results = {}
+    if search:
+        search_results = search_hyperparameters(X_train_scaled, y_train, search_budget)
+    params = {name: result['params'] for name, result in search_results.items()}
+    
     # モデル学習・評価
-    results = train_models(X_train_scaled, X_test_scaled, y_train, y_test)
+    start = time.perf_counter()
+    results = train_models(X_train_scaled, X_test_scaled, y_train, y_test, params=params)
+    print(f"\nモデル学習・交差検証: {time.perf_counter() - start:.1f}秒（プロセス数: {TRAINING_WORKERS}）")
+    print_results_table(results)
     
     # 最良のモデルを選択
     best_model_name, best_model = select_best_model(results)
     
-    # 最良のモデルを保存
-    joblib.dump(best_model, 'models/best_model.pkl')
-    
     # 結果を保存
     model_info = {
         'best_model_name': best_model_name,
         'feature_columns': feature_columns,
         'results': {name: {k: v for k, v in result.items() if k != 'model'} 
-                   for name, result in results.items()}
+                   for name, result in results.items()},
+        # 最良のモデルのハイパーパラメータ（探索していない場合は既定値のため空）と、全てのモデルの探索結果
+        'best_params': params.get(best_model_name, {}),
+        'search': search_results,
+        # 差分更新（--incremental）用の学習データの十分統計量
+        'linear_statistics': linear_statistics(X_train_scaled, y_train)
     }
     
-    joblib.dump(model_info, 'models/model_info.pkl')
+    save_best_model(best_model, model_info)
     
     print(f"\nモデル学習完了！")
     print(f"最良のモデル: {best_model_name}")
     print(f"モデルファイル: models/best_model.pkl")
     print(f"スケーラーファイル: models/scaler.pkl")
     print(f"エンコーダーファイル: label_encoders/")
+    print(f"モデルバンドル: models/model_bundle.joblib")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='不動産価格予測モデルの学習')
+    parser.add_argument('--search', action='store_true', help='学習の前にハイパーパラメータを探索する（Successive Halving）')
+    parser.add_argument('--search-budget', type=float, default=SEARCH_BUDGET_SECONDS, help='ハイパーパラメータ探索の時間予算（秒）')
+    parser.add_argument('--incremental', metavar='DATA_FILE',
+                        help='追加データ（前処理済み）で学習済みのモデルを差分更新する（全データでの再学習を行わない）')
+    args = parser.parse_args()
+    
     # 必要なディレクトリを作成
-    import os
     os.makedirs('models', exist_ok=True)
     os.makedirs('label_encoders', exist_ok=True)
     
-    main()
+    if args.incremental:
+        incremental_main(args.incremental)
+    else:
+        main(search=args.search, search_budget=args.search_budget)
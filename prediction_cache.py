@@ -0,0 +1,99 @@
+"""
+予測結果のキャッシュ
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+class PredictionCache:
+    """
+    LRU方式の予測結果キャッシュ
+
+    - 件数の上限を超えると最も長く使われていないエントリから削除する
+    - ttl（秒）を指定すると、期限切れのエントリは使わない
+    - 読み込まれているモデルのバージョンが変わると全エントリを破棄する
+      （切り替えは get で行い、put は現在のバージョン以外の予測結果を書き込まない）
+    """
+
+    def __init__(self, max_size: int, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _check_version(self, version: Hashable):
+        # モデルが入れ替わっていれば古い予測結果を破棄する
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._version = version
+
+    def get(self, key: Hashable, version: Hashable) -> Optional[Any]:
+        """キャッシュから予測結果を取得する（ない場合はNone）"""
+        if self.max_size <= 0:
+            return None
+
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, version: Hashable):
+        """予測結果をキャッシュに追加する"""
+        if self.max_size <= 0:
+            return
+
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            # 再読み込みの前に始まったリクエストが古いモデルの予測結果を後から書き込む場合は捨てる
+            # （ここでバージョンを切り替えると、新しいモデルの予測結果が破棄されるため）
+            if version != self._version:
+                return
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """全てのエントリを破棄する"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """ヒット率などの統計情報を返す"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations
+            }
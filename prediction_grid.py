@@ -0,0 +1,232 @@
+"""
+町名 × 建物タイプ × 築年数 × 面積 の予測値グリッド
+
+全ての町名・建物タイプの組み合わせについて、築年数（整数）ごとに
+対数スケールで等間隔の面積の点で予測値を事前計算しておき、
+リクエスト時はモデルを呼び出さずに面積方向の線形補間で予測値を求める
+
+補間誤差の確認は、決定木系のモデル（面積方向に区分的に一定）では分岐の閾値で区切った部分ごとに
+モデルの予測値を求めて厳密に行い、それ以外のモデルでは区間内の検証点（CHECK_FRACTIONS）で行う
+"""
+
+import math
+import time
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+# グリッドの作成・検証で1回に予測する最大行数
+PREDICT_CHUNK_ROWS = 200000
+
+# 補間誤差を確認する区間内の位置（対数面積での割合、決定木系以外のモデル）
+CHECK_FRACTIONS = (0.25, 0.5, 0.75)
+
+# 築年数1つあたりの分岐の閾値がこれより多い場合は、閾値を含む区間を全てモデルで予測する
+# （部分ごとの予測の件数が大きくなりすぎないようにするため）
+MAX_BREAKPOINTS = 8192
+
+# 保存形式のバージョン（誤差の確認方法を変えた場合に古いグリッドを作り直すため）
+GRID_FORMAT = 3
+
+class PredictionGrid:
+    """事前計算した予測値（対数価格）のグリッド"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.arrays = arrays
+        # values: (町名, 建物タイプ, 築年数, 面積の点) の対数価格
+        self.values = arrays['values']
+        # exceeds: 補間誤差が上限を超える区間（モデルで予測する）
+        self.exceeds = arrays['exceeds']
+        self.log_area_min = float(arrays['log_area_min'])
+        self.log_area_max = float(arrays['log_area_max'])
+        self.max_building_year = int(arrays['max_building_year'])
+        self.max_error = float(arrays['max_error'])
+        self.model_version = str(arrays['model_version'])
+        self.format = int(arrays['format']) if 'format' in arrays else 1
+        # error_check: 補間誤差の確認方法（exact: 分岐の閾値ごとの厳密な確認、sampled: 検証点での確認）
+        self.error_check = str(arrays['error_check']) if 'error_check' in arrays else 'sampled'
+        self.n_area_points = self.values.shape[3]
+        self.log_area_step = (self.log_area_max - self.log_area_min) / (self.n_area_points - 1)
+
+    def matches(self, model_version: str, settings: Dict[str, float]) -> bool:
+        """保存済みのグリッドが現在のモデルと設定で作成されたものか確認する"""
+        return (
+            self.format == GRID_FORMAT
+            and self.model_version == model_version
+            and self.n_area_points == settings['n_area_points']
+            and self.max_building_year == settings['max_building_year']
+            and math.isclose(self.log_area_min, math.log(settings['area_min']))
+            and math.isclose(self.log_area_max, math.log(settings['area_max']))
+            and math.isclose(self.max_error, settings['max_error'])
+        )
+
+    def lookup(self, district_code: int, type_code: int, area: float, building_year: int) -> Optional[float]:
+        """
+        グリッドから対数価格を補間する
+        範囲外の入力や誤差の上限を超える区間の場合はNoneを返す
+        """
+        if not 0 <= building_year <= self.max_building_year or not area > 0:
+            return None
+
+        position = (math.log(area) - self.log_area_min) / self.log_area_step
+        if not 0 <= position <= self.n_area_points - 1:
+            return None
+
+        i = min(int(position), self.n_area_points - 2)
+        if self.exceeds[district_code, type_code, building_year, i]:
+            return None
+
+        weight = position - i
+        values = self.values[district_code, type_code, building_year]
+        return float((1 - weight) * values[i] + weight * values[i + 1])
+
+    def lookup_many(self, district_codes: np.ndarray, type_codes: np.ndarray,
+                    area: np.ndarray, building_year: np.ndarray):
+        """
+        複数件をまとめて補間する
+        対数価格と、グリッドで求められた行を示すマスクを返す
+        """
+        predictions = np.full(len(area), np.nan)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            position = (np.log(area) - self.log_area_min) / self.log_area_step
+
+        found = (
+            (building_year >= 0) & (building_year <= self.max_building_year)
+            & (position >= 0) & (position <= self.n_area_points - 1)
+        )
+        rows = np.flatnonzero(found)
+        d = district_codes[rows].astype(np.intp)
+        t = type_codes[rows].astype(np.intp)
+        y = building_year[rows].astype(np.intp)
+        i = np.minimum(position[rows].astype(np.intp), self.n_area_points - 2)
+
+        within_error = ~self.exceeds[d, t, y, i]
+        rows, d, t, y, i = rows[within_error], d[within_error], t[within_error], y[within_error], i[within_error]
+
+        weight = position[rows] - i
+        predictions[rows] = (1 - weight) * self.values[d, t, y, i] + weight * self.values[d, t, y, i + 1]
+
+        found = np.zeros(len(area), dtype=bool)
+        found[rows] = True
+        return predictions, found
+
+    def info(self) -> Dict[str, float]:
+        """グリッドの概要を返す"""
+        return {
+            'shape': list(self.values.shape),
+            'area_min': math.exp(self.log_area_min),
+            'area_max': math.exp(self.log_area_max),
+            'max_building_year': self.max_building_year,
+            'max_error': self.max_error,
+            'error_check': self.error_check,
+            'exceeding_ratio': float(self.exceeds.mean())
+        }
+
+def build_prediction_grid(predict: Callable, n_districts: int, n_types: int, model_version: str,
+                          settings: Dict[str, float],
+                          area_breakpoints: Optional[Callable[[int], np.ndarray]] = None) -> PredictionGrid:
+    """
+    予測値のグリッドを作成する
+
+    predict(district_codes, type_codes, area, building_year) は対数価格の配列を返す関数。
+    area_breakpoints(building_year) は、決定木系のモデルで予測値が面積方向に変わりうる面積
+    （分岐の閾値）の配列を返す関数。指定した場合は補間誤差を厳密に求め、
+    指定しない場合は各区間の内部の点（CHECK_FRACTIONS）で補間値とモデルの予測値を比較する。
+    誤差が max_error を超える区間はリクエスト時にモデルで予測する。
+    """
+    start = time.time()
+
+    log_areas = np.linspace(math.log(settings['area_min']), math.log(settings['area_max']), settings['n_area_points'])
+    building_years = np.arange(settings['max_building_year'] + 1)
+    n_years = len(building_years)
+    n_points = len(log_areas)
+    log_area_step = log_areas[1] - log_areas[0]
+
+    def predict_grid(log_area_points, years=building_years):
+        # (町名, 建物タイプ, 築年数, 面積の点) の全組み合わせを予測する
+        d, t, y, a = np.meshgrid(
+            np.arange(n_districts), np.arange(n_types), years, np.exp(log_area_points), indexing='ij'
+        )
+        d, t, y, a = d.ravel(), t.ravel(), y.ravel(), a.ravel()
+        predictions = np.empty(len(a))
+        for chunk_start in range(0, len(a), PREDICT_CHUNK_ROWS):
+            chunk = slice(chunk_start, chunk_start + PREDICT_CHUNK_ROWS)
+            predictions[chunk] = predict(d[chunk], t[chunk], a[chunk], y[chunk])
+        return predictions.reshape(n_districts, n_types, len(years), len(log_area_points))
+
+    values = predict_grid(log_areas).astype(np.float32)
+
+    # 補間誤差の確認
+    max_abs_error = np.zeros((n_districts, n_types, n_years, n_points - 1), dtype=np.float32)
+    if area_breakpoints is not None:
+        for y_index, building_year in enumerate(building_years):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                breakpoints = np.log(np.asarray(area_breakpoints(int(building_year)), dtype=np.float64))
+            breakpoints = np.unique(breakpoints[(breakpoints > log_areas[0]) & (breakpoints < log_areas[-1])])
+            if len(breakpoints) > MAX_BREAKPOINTS:
+                # 閾値を含まない区間はモデルの予測値が一定（誤差0）なので、閾値を含む区間だけを上限超過とする
+                intervals = np.searchsorted(log_areas, breakpoints, side='right') - 1
+                max_abs_error[:, :, y_index, intervals] = np.inf
+                continue
+            max_abs_error[:, :, y_index] = piecewise_interpolation_error(
+                lambda points: predict_grid(points, building_years[y_index:y_index + 1])[:, :, 0],
+                values[:, :, y_index], log_areas, breakpoints
+            )
+        error_check = 'exact'
+    else:
+        for fraction in CHECK_FRACTIONS:
+            actual = predict_grid(log_areas[:-1] + fraction * log_area_step)
+            interpolated = (1 - fraction) * values[..., :-1] + fraction * values[..., 1:]
+            np.maximum(max_abs_error, np.abs(interpolated - actual), out=max_abs_error)
+        error_check = 'sampled'
+
+    grid = PredictionGrid({
+        'values': values,
+        'exceeds': max_abs_error > settings['max_error'],
+        'log_area_min': np.array(log_areas[0]),
+        'log_area_max': np.array(log_areas[-1]),
+        'max_building_year': np.array(settings['max_building_year']),
+        'max_error': np.array(settings['max_error']),
+        'model_version': np.array(model_version),
+        'error_check': np.array(error_check),
+        'format': np.array(GRID_FORMAT)
+    })
+
+    print(f"予測グリッド作成完了: {values.shape}、誤差上限超過の区間: {grid.exceeds.mean():.1%}"
+          f"（誤差の確認: {error_check}、{time.time() - start:.1f}秒）")
+    return grid
+
+def piecewise_interpolation_error(predict_points: Callable, values: np.ndarray, log_areas: np.ndarray,
+                                  breakpoints: np.ndarray) -> np.ndarray:
+    """
+    面積方向に区分的に一定のモデルについて、区間ごとの補間誤差の最大値を厳密に求める
+
+    predict_points(log_area_points) は (町名, 建物タイプ, 点) の対数価格を返す関数、
+    values は (町名, 建物タイプ, 面積の点) のグリッドの値、breakpoints はグリッドの範囲内の分岐の位置（対数面積）。
+    グリッドの点と分岐の位置で区切った各部分ではモデルの予測値が一定なので、部分の中点で1回ずつ予測し、
+    部分の両端での補間値との差の大きい方をその部分の誤差とする
+    """
+    bounds = np.union1d(log_areas, breakpoints)
+    piece_start, piece_end = bounds[:-1], bounds[1:]
+    # 各部分が属する区間（グリッドの点は全て境界に含まれるので、どの区間にも1つ以上の部分がある）
+    intervals = np.searchsorted(log_areas, (piece_start + piece_end) / 2) - 1
+    actual = predict_points((piece_start + piece_end) / 2)
+
+    left = values[..., intervals].astype(np.float64)
+    right = values[..., intervals + 1].astype(np.float64)
+    width = log_areas[intervals + 1] - log_areas[intervals]
+    errors = np.maximum(
+        np.abs(left + (piece_start - log_areas[intervals]) / width * (right - left) - actual),
+        np.abs(left + (piece_end - log_areas[intervals]) / width * (right - left) - actual)
+    )
+    first_pieces = np.flatnonzero(np.r_[True, intervals[1:] != intervals[:-1]])
+    return np.maximum.reduceat(errors, first_pieces, axis=-1)
+
+def save_prediction_grid(grid: PredictionGrid, file_path: str):
+    """グリッドをnpz形式で保存する"""
+    np.savez(file_path, **grid.arrays)
+
+def load_prediction_grid(file_path: str) -> PredictionGrid:
+    """npz形式で保存したグリッドを読み込む"""
+    with np.load(file_path, allow_pickle=False) as data:
+        return PredictionGrid({key: data[key] for key in data.files})
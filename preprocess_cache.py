@@ -0,0 +1,97 @@
+"""
+前処理済みシャードのキャッシュ
+"""
+
+import hashlib
+import os
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+# ファイルのハッシュを計算するときに読み込む単位（バイト）
+HASH_CHUNK_BYTES = 1 << 20
+
+def file_content_hash(file_path: str) -> str:
+    """ファイルの内容のSHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class ShardCache:
+    """
+    取引データのファイルごとの前処理結果（シャード）をディスクに保存するキャッシュ
+
+    - キーはファイルの内容のハッシュと前処理のバージョン（ファイル名や更新日時は使わない）
+    - 前処理のバージョンが変わると、古いバージョンのシャードは使わずに削除する
+    - シャードはParquetで保存する（pyarrowがない場合はキャッシュを使わない）
+    """
+
+    def __init__(self, cache_dir: str, version: str):
+        self.cache_dir = cache_dir
+        self.version = version
+        self.enabled = True
+        self.hits = []
+        self.misses = []
+
+    def shard_path(self, content_hash: str) -> str:
+        """シャードのファイルパス"""
+        return os.path.join(self.cache_dir, f"{content_hash}-{self.version}.parquet")
+
+    def get(self, file_path: str, content_hash: str) -> Optional[pd.DataFrame]:
+        """キャッシュからシャードを取得する（ない場合はNone）"""
+        shard_path = self.shard_path(content_hash)
+        if self.enabled and os.path.exists(shard_path):
+            try:
+                df = pd.read_parquet(shard_path)
+            except ImportError:
+                self._disable()
+            except Exception as e:
+                # 書き込み途中などで壊れたシャードは作り直す
+                print(f"警告: キャッシュのシャード '{shard_path}' を読み込めません: {e}")
+            else:
+                self.hits.append({'file': file_path, 'hash': content_hash, 'rows': len(df)})
+                return df
+
+        self.misses.append({'file': file_path, 'hash': content_hash})
+        return None
+
+    def put(self, content_hash: str, df: pd.DataFrame):
+        """シャードを保存する（書き込み途中のファイルを読まないよう、一時ファイルから置き換える）"""
+        if not self.enabled:
+            return
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        shard_path = self.shard_path(content_hash)
+        tmp_path = f"{shard_path}.{os.getpid()}.tmp"
+        try:
+            df.to_parquet(tmp_path, index=False)
+        except ImportError:
+            self._disable()
+            return
+        os.replace(tmp_path, shard_path)
+
+    def prune(self) -> int:
+        """前処理のバージョンが異なるシャードを削除し、削除した数を返す"""
+        if not os.path.isdir(self.cache_dir):
+            return 0
+
+        removed = 0
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.parquet') and not name.endswith(f"-{self.version}.parquet"):
+                os.remove(os.path.join(self.cache_dir, name))
+                removed += 1
+        return removed
+
+    def _disable(self):
+        print("警告: シャードのキャッシュには pyarrow が必要です。キャッシュを使わずに前処理します")
+        self.enabled = False
+
+    def stats(self) -> Dict[str, Any]:
+        """ヒット・ミスしたシャードの一覧を返す"""
+        return {
+            'version': self.version,
+            'hits': self.hits,
+            'misses': self.misses
+        }
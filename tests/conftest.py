@@ -0,0 +1,39 @@
+"""
+テスト共通の設定
+"""
+
+import importlib.util
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+# プロジェクトのルートディレクトリ
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+@pytest.fixture(scope='session')
+def api():
+    """
+    api.pyを読み込む
+    （api/パッケージと名前が衝突するため、ファイルパスを指定して読み込む。モデルのパスはルートからの相対パス）
+    """
+    os.chdir(ROOT_DIR)
+    spec = importlib.util.spec_from_file_location('api_module', os.path.join(ROOT_DIR, 'api.py'))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['api_module'] = module
+    spec.loader.exec_module(module)
+    return module
+
+@pytest.fixture(scope='module')
+def client(api):
+    """
+    APIのテストクライアント
+    （起動時の処理（バックグラウンドのタスク）は行わず、モデルだけを読み込む）
+    """
+    models = api.models
+    api.models = api.load_models()
+    yield TestClient(api.app)
+    api.models = models
@@ -0,0 +1,32 @@
+"""
+/predict/batch の1件ずつの入力検証とOpenAPIのスキーマの確認
+"""
+
+def test_openapi_publishes_item_schema(api):
+    schemas = api.app.openapi()['components']['schemas']
+
+    items = schemas['BatchPropertyRequest']['properties']['properties']['items']
+    assert items == {'$ref': '#/components/schemas/PropertyRequest'}
+    assert set(schemas['PropertyRequest']['required']) == {'district_name', 'area', 'building_year'}
+
+def test_invalid_item_is_reported_per_item(api, client):
+    district = next(iter(api.models['category_lookups']['district_name']))
+    properties = [
+        {'district_name': district, 'area': 100.0, 'building_year': 10},
+        {'district_name': district, 'area': 'abc', 'building_year': 10},
+        {'district_name': district, 'building_year': 10},
+        'not an object',
+        {'district_name': district, 'area': 80.0, 'building_year': 5}
+    ]
+
+    response = client.post('/predict/batch', json={'properties': properties})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [result['index'] for result in body['results']] == [0, 1, 2, 3, 4]
+    assert [result['error'] is None for result in body['results']] == [True, False, False, False, True]
+    assert all(result['error'].startswith('入力が不正です') for result in body['results'][1:4])
+    assert (body['success_count'], body['error_count']) == (2, 3)
+
+def test_properties_must_be_a_list(client):
+    assert client.post('/predict/batch', json={'properties': 'abc'}).status_code == 422
@@ -0,0 +1,44 @@
+"""
+列をまとめて変換するクリーニング（clean_numeric_column / clean_building_year_column）が
+1行ずつ変換する元の関数（extract_numeric_value / extract_building_year）と一致することの確認
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_preprocessing import (
+    clean_building_year_column, clean_numeric_column, extract_building_year, extract_numeric_value
+)
+
+# 欠損値・空文字・空白・数字を含まない文字列・年を含む文字列・整数・小数
+VALUES = [
+    None, np.nan, pd.NA, '', ' ', '  ', 'abc', '不明', '戦前',
+    '12345年', '1990年', '平成2年', '2001年築', '築1985年', '１９９０年',
+    '100', '1,200', '約150㎡', '2000㎡以上', '12.5', '0', '-30',
+    1990, 0, 150, 12.5, 1990.0, -3
+]
+
+@pytest.mark.parametrize('dtype', [object, 'string'])
+@pytest.mark.parametrize('clean_column, extract', [
+    (clean_numeric_column, extract_numeric_value),
+    (clean_building_year_column, extract_building_year)
+], ids=['numeric', 'building_year'])
+def test_clean_column_matches_row_wise(clean_column, extract, dtype):
+    values = VALUES if dtype is object else [value if not isinstance(value, (int, float)) or pd.isna(value)
+                                            else str(value) for value in VALUES]
+    # 同じ値が複数回現れる場合も確認する
+    series = pd.Series(values * 3, dtype=dtype, name='column', index=np.arange(len(values) * 3) * 2)
+
+    expected = series.apply(extract).astype(float)
+    actual = clean_column(series)
+
+    assert actual.name == series.name
+    assert actual.index.equals(series.index)
+    np.testing.assert_array_equal(actual.to_numpy(dtype=float), expected.to_numpy())
+
+def test_clean_column_without_missing_values():
+    series = pd.Series(['1990年', '2010年', '1990年'])
+
+    np.testing.assert_array_equal(clean_building_year_column(series).to_numpy(), [34.0, 14.0, 34.0])
+    np.testing.assert_array_equal(clean_numeric_column(series).to_numpy(), [1990.0, 2010.0, 1990.0])
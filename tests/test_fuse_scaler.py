@@ -0,0 +1,90 @@
+"""
+スケーラーの畳み込み（api.fuse_scaler / tree_engine.fuse_scaler）の予測値が畳み込み前の経路と一致することの確認
+"""
+
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import Lasso, LinearRegression, Ridge
+from sklearn.preprocessing import StandardScaler
+
+import tree_engine
+
+def make_training_data(n_samples: int = 3000, seed: int = 0):
+    """特徴量の列（町名・建物タイプ・面積・対数面積・築年数・築年数カテゴリ・面積×築年数）と対数価格の合成データ"""
+    rng = np.random.default_rng(seed)
+    district = rng.integers(0, 80, n_samples)
+    property_type = rng.integers(0, 5, n_samples)
+    area = np.round(rng.uniform(10, 3000, n_samples), 1)
+    building_year = rng.integers(0, 60, n_samples)
+    X = np.column_stack([
+        district, property_type, area, np.log1p(area),
+        building_year, building_year // 10, area * building_year
+    ]).astype(np.float64)
+    y = 14 + 0.8 * np.log1p(area) - 0.02 * building_year + 0.01 * district + rng.normal(0, 0.3, n_samples)
+    return X, y
+
+@pytest.fixture(scope='module')
+def training_data():
+    X, y = make_training_data()
+    scaler = StandardScaler().fit(X)
+    # 学習に使った行（閾値の両側の点を含む）と読み込み時の確認に使う入力の両方で比較する
+    X_check = np.vstack([X, tree_engine.make_probe_rows(scaler.mean_, scaler.scale_)])
+    return X, y, scaler, X_check
+
+def unfused_predict(api, model, scaler, X):
+    """畳み込み前の経路（APIと同じ標準化関数で標準化してから予測）"""
+    return model.predict(api.compile_scaler(scaler.mean_, scaler.scale_)(X.copy()))
+
+@pytest.mark.parametrize('make_model', [
+    LinearRegression,
+    lambda: Ridge(alpha=1.0),
+    lambda: Lasso(alpha=0.001)
+], ids=['LinearRegression', 'Ridge', 'Lasso'])
+def test_linear_models_match_unfused(api, training_data, make_model):
+    X, y, scaler, X_check = training_data
+    model = make_model().fit(scaler.transform(X), y)
+
+    fused_model = api.fuse_scaler(model, scaler.mean_, scaler.scale_)
+
+    assert fused_model is not None
+    np.testing.assert_allclose(
+        fused_model.predict(X_check), unfused_predict(api, model, scaler, X_check), rtol=1e-9, atol=1e-9
+    )
+
+@pytest.mark.parametrize('make_model', [
+    lambda: RandomForestRegressor(n_estimators=20, max_depth=12, random_state=0),
+    lambda: GradientBoostingRegressor(n_estimators=50, max_depth=4, random_state=0)
+], ids=['RandomForest', 'GradientBoosting'])
+def test_tree_models_match_unfused(api, training_data, make_model):
+    X, y, scaler, X_check = training_data
+    model = make_model().fit(scaler.transform(X), y)
+    expected = unfused_predict(api, model, scaler, X_check)
+
+    # sklearnのモデルはfloat32で比較するため畳み込まない
+    assert api.fuse_scaler(model, scaler.mean_, scaler.scale_) is None
+
+    # NumPyの推論エンジンは畳み込み前も後もsklearnの経路と完全に一致する
+    ensemble = tree_engine.export_tree_ensemble(model)
+    assert np.array_equal(ensemble.predict(api.compile_scaler(scaler.mean_, scaler.scale_)(X_check.copy())), expected)
+    fused_ensemble = tree_engine.fuse_scaler(ensemble, scaler.mean_, scaler.scale_)
+    assert np.array_equal(fused_ensemble.predict(X_check), expected)
+
+def test_map_threshold_to_raw_matches_float32_comparison():
+    rng = np.random.default_rng(1)
+    n = 5000
+    mean = rng.uniform(-1000, 1000, n)
+    scale = rng.uniform(0.01, 1000, n)
+    # float32で表せない値（1101.1 など）を含むデータ点
+    x = np.round(rng.uniform(-1e5, 1e5, n), 1)
+    # 閾値がデータ点の標準化後の値と一致する場合（丸め誤差で分岐が変わりやすい）
+    threshold = ((x - mean) / scale).astype(np.float32).astype(np.float64)
+
+    raw = tree_engine.map_threshold_to_raw(threshold, mean, scale)
+
+    # データ点・変換後の閾値とそれらの前後のfloat64値で、標準化してからfloat32で比較した場合と
+    # 元の値をfloat64で比較した場合の分岐が一致する
+    for value in [x, raw]:
+        for candidate in [np.nextafter(value, -np.inf), value, np.nextafter(value, np.inf)]:
+            scaled = ((candidate - mean) / scale).astype(np.float32)
+            assert np.array_equal(scaled <= threshold, candidate <= raw)
@@ -0,0 +1,95 @@
+"""
+/predict の前処理（対応表 + float64配列）と推論が、変更前の経路（LabelEncoder + DataFrame + scaler.transform）と一致することの確認
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+@pytest.fixture(scope='module')
+def loaded(api):
+    return api.load_models()
+
+@pytest.fixture(scope='module')
+def requests(api, loaded):
+    """一致確認用の入力（未知の町名・建物タイプ、築年数カテゴリの境界を含む）"""
+    rng = np.random.default_rng(42)
+    districts = list(loaded['category_lookups']['district_name']) + ['未知の町']
+    types = list(loaded['category_lookups']['property_type']) + ['未知のタイプ']
+    return [
+        api.PropertyRequest(
+            district_name=districts[rng.integers(len(districts))],
+            area=float(rng.uniform(10, 3000)),
+            building_year=int(rng.integers(0, 60)),
+            property_type=types[rng.integers(len(types))]
+        )
+        for _ in range(300)
+    ] + [
+        api.PropertyRequest(district_name=districts[0], area=area, building_year=building_year, property_type=types[0])
+        for area in [10.0, 100.5, 3000.0]
+        for building_year in [0, 5, 10, 20, 30, 59]
+    ]
+
+def legacy_encode(encoder, value):
+    """変更前のカテゴリ変換（未知の値は例外経由で0）"""
+    try:
+        return encoder.transform([value])[0]
+    except ValueError:
+        return 0
+
+def legacy_features(api, loaded, requests) -> pd.DataFrame:
+    """変更前の前処理（LabelEncoder.transformを1件ずつ呼び出し、DataFrameを作成する）"""
+    sklearn_objects = loaded['load_sklearn']()
+    rows = []
+    for request in requests:
+        year_category = api.feature_transform.categorize_building_year(request.building_year)
+        rows.append({
+            'DistrictName_encoded': legacy_encode(sklearn_objects['district_encoder'], request.district_name),
+            'Type_encoded': legacy_encode(sklearn_objects['type_encoder'], request.property_type),
+            'Area': request.area,
+            'Area_log': np.log1p(request.area),
+            'BuildingYear': request.building_year,
+            'BuildingYear_category_encoded': legacy_encode(sklearn_objects['year_encoder'], year_category),
+            'Area_BuildingYear_interaction': request.area * request.building_year
+        })
+    return pd.DataFrame(rows)[loaded['feature_columns']]
+
+def test_preprocess_columns_matches_label_encoders(api, loaded, requests):
+    expected = legacy_features(api, loaded, requests).to_numpy(dtype=np.float64)
+
+    X = api.preprocess_columns(
+        [r.district_name for r in requests],
+        np.array([r.area for r in requests], dtype=np.float64),
+        np.array([r.building_year for r in requests], dtype=np.float64),
+        [r.property_type for r in requests],
+        loaded
+    )
+
+    np.testing.assert_array_equal(X, expected)
+    np.testing.assert_array_equal(api.preprocess_batch(requests, loaded), expected)
+
+def test_preprocess_input_matches_label_encoders(api, loaded, requests):
+    expected = legacy_features(api, loaded, requests).to_numpy(dtype=np.float64)
+
+    # build_features はスレッドごとのバッファを再利用するため、1件ずつコピーする
+    X = np.vstack([
+        loaded['build_features'](api.preprocess_input(
+            r.district_name, r.area, r.building_year, r.property_type, loaded
+        )).copy()
+        for r in requests
+    ])
+
+    np.testing.assert_array_equal(X, expected)
+
+@pytest.mark.parametrize('batch_size', [1, 32, 1000])
+def test_predictions_match_sklearn(api, loaded, requests, batch_size):
+    """推論エンジン（TREE_ENGINE_MAX_BATCH 件以下）とsklearn（それ以上）のどちらの経路でも一致する"""
+    requests = (requests * (batch_size // len(requests) + 1))[:batch_size]
+    sklearn_objects = loaded['load_sklearn']()
+    expected = sklearn_objects['model'].predict(sklearn_objects['scaler'].transform(legacy_features(api, loaded, requests)))
+
+    X = loaded['scale_features'](api.preprocess_batch(requests, loaded))
+    predictions = api.predict_log_prices(X, loaded)
+
+    # スケーラーを畳み込んだ場合は浮動小数点の丸め誤差の範囲で一致する
+    np.testing.assert_allclose(predictions, expected, rtol=1e-9, atol=1e-9)
@@ -0,0 +1,66 @@
+"""
+/predict/stream（NDJSONのストリーミング予測）の長すぎる行とクライアントの切断の扱いの確認
+"""
+
+import asyncio
+import json
+
+def property_line(api, area: float = 100.0) -> bytes:
+    district = next(iter(api.models['category_lookups']['district_name']))
+    return json.dumps({'district_name': district, 'area': area, 'building_year': 10}).encode() + b'\n'
+
+def post_stream(client, body, chunk_size: int = 2):
+    response = client.post(f'/predict/stream?chunk_size={chunk_size}', content=body,
+                           headers={'Content-Type': 'application/x-ndjson'})
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines()]
+
+def test_long_line_is_rejected_and_skipped(api, client, monkeypatch):
+    monkeypatch.setattr(api, 'MAX_STREAM_LINE_BYTES', 256)
+
+    def body():
+        yield property_line(api, 50.0)
+        # 改行が来ないまま上限を超える行（複数回に分けて届く）
+        for _ in range(10):
+            yield b'x' * 100
+        yield b'x\n' + property_line(api, 60.0)
+        # 1回で届いた上限を超える行
+        yield b'{"district_name": "' + b'y' * 300 + b'"}\n'
+        yield property_line(api, 70.0).rstrip(b'\n')
+
+    results = post_stream(client, body())
+
+    assert [result['index'] for result in results] == [0, 1, 2, 3, 4]
+    assert [result['error'] is None for result in results] == [True, False, True, False, True]
+    assert '長すぎます' in results[1]['error']
+    assert '長すぎます' in results[3]['error']
+
+def test_results_match_without_long_lines(api, client):
+    body = b''.join(property_line(api, area) for area in [50.0, 60.0, 70.0])
+
+    results = post_stream(client, body)
+
+    assert [result['index'] for result in results] == [0, 1, 2]
+    assert all(result['error'] is None and result['predicted_price'] > 0 for result in results)
+
+def test_disconnect_while_writing_stops_reading(api, client):
+    reads = []
+
+    async def body():
+        for i in range(100):
+            reads.append(i)
+            yield property_line(api, 50.0 + i)
+
+    async def send(message):
+        # 最初の結果を書き込んだ時点でクライアントが切断する
+        if message['type'] == 'http.response.body' and message['body']:
+            raise OSError('切断')
+
+    async def receive():
+        return {'type': 'http.disconnect'}
+
+    response = api.RequestStreamingResponse(api.stream_predictions(body(), chunk_size=1),
+                                            media_type='application/x-ndjson')
+    asyncio.run(response({'type': 'http', 'asgi': {'spec_version': '2.4'}}, receive, send))
+
+    assert len(reads) == 1
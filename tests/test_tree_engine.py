@@ -0,0 +1,43 @@
+"""
+決定木アンサンブルのNumPy推論エンジン（tree_engine.TreeEnsemble）の予測値がsklearnと完全に一致することの確認
+"""
+
+import joblib
+import numpy as np
+import pytest
+
+import tree_engine
+
+@pytest.fixture(scope='module')
+def trained(api):
+    """学習済みのモデル・スケーラーと、展開した決定木アンサンブル"""
+    model = joblib.load('models/best_model.pkl')
+    scaler = joblib.load('models/scaler.pkl')
+    ensemble = tree_engine.export_tree_ensemble(model)
+    if ensemble is None:
+        pytest.skip(f"決定木のアンサンブルではないため対象外です: {type(model).__name__}")
+    return model, scaler, ensemble
+
+@pytest.mark.parametrize('batch_size', [1, 10, 1000, 20000])
+def test_predict_matches_sklearn(trained, batch_size):
+    model, scaler, ensemble = trained
+    rng = np.random.default_rng(batch_size)
+    X_scaled = scaler.transform(rng.normal(scaler.mean_, scaler.scale_, size=(batch_size, len(scaler.mean_))))
+
+    np.testing.assert_array_equal(ensemble.predict(X_scaled), model.predict(X_scaled))
+
+def test_predict_matches_sklearn_on_probe_rows(trained):
+    """整数値の入力（カテゴリのコード・築年数）も含めて一致する"""
+    model, scaler, ensemble = trained
+    X_scaled = scaler.transform(tree_engine.make_probe_rows(scaler.mean_, scaler.scale_))
+
+    np.testing.assert_array_equal(ensemble.predict(X_scaled), model.predict(X_scaled))
+
+def test_save_and_load_round_trip(trained, tmp_path):
+    model, scaler, ensemble = trained
+    X_scaled = scaler.transform(tree_engine.make_probe_rows(scaler.mean_, scaler.scale_))
+
+    path = str(tmp_path / 'tree_ensemble.npz')
+    tree_engine.save_tree_ensemble(ensemble, path)
+
+    np.testing.assert_array_equal(tree_engine.load_tree_ensemble(path).predict(X_scaled), model.predict(X_scaled))
@@ -0,0 +1,239 @@
+"""
+決定木アンサンブルのNumPy推論エンジン
+
+select_best_model で選ばれた RandomForestRegressor / GradientBoostingRegressor の
+全ての木を連続した配列（feature, threshold, left, right, value）に展開し、
+sklearnの predict と同じ結果をNumPyのベクトル演算だけで計算する
+"""
+
+import numpy as np
+from typing import Dict, Optional
+
+# 1回の評価で扱う (行数 × 木の数) の上限（メモリ使用量を抑えるため）
+MAX_CELLS_PER_CHUNK = 1 << 20
+
+class TreeEnsemble:
+    """展開済みの決定木アンサンブル"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.arrays = arrays
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.value = arrays['value']
+        self.roots = arrays['roots']
+        self.aggregation = str(arrays['aggregation'])
+        self.init = float(arrays['init'])
+        self.learning_rate = float(arrays['learning_rate'])
+        self.max_depth = int(arrays['max_depth'])
+        self.n_features_in_ = int(arrays['n_features'])
+        # 閾値と比較する入力の型（sklearnと同じfloat32。スケーラーを畳み込んだ閾値は標準化前のfloat64の入力と比較する）
+        self.compare_dtype = np.dtype(str(arrays['compare_dtype'])) if 'compare_dtype' in arrays else np.dtype(np.float32)
+
+    def predict(self, X) -> np.ndarray:
+        """sklearnと同じ手順（float32で比較し、木の順に加算）で予測する（畳み込み済みの場合はfloat64で比較する）"""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"特徴量の数が一致しません: {X.shape} (期待値: {self.n_features_in_})")
+        if not np.isfinite(X).all():
+            raise ValueError("Input X contains NaN or infinity.")
+
+        # sklearnの決定木は特徴量をfloat32に変換してから閾値と比較する
+        X_compare = X.astype(self.compare_dtype)
+        n_samples = len(X_compare)
+        chunk_size = max(1, MAX_CELLS_PER_CHUNK // len(self.roots))
+
+        predictions = np.empty(n_samples, dtype=np.float64)
+        for start in range(0, n_samples, chunk_size):
+            stop = min(start + chunk_size, n_samples)
+            predictions[start:stop] = self._predict_chunk(X_compare[start:stop])
+        return predictions
+
+    def _predict_chunk(self, X_compare: np.ndarray) -> np.ndarray:
+        # 全ての木を同時に1段ずつ降りる（葉は自分自身を指すので深さ分の反復で止まる）
+        rows = np.arange(len(X_compare))[:, None]
+        node = np.broadcast_to(self.roots, (len(X_compare), len(self.roots)))
+        for _ in range(self.max_depth):
+            go_left = X_compare[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+
+        leaf_values = self.value[node]
+
+        # np.sumはペアワイズ加算で丸め誤差が変わるため、累積和で木の順に加算する
+        if self.aggregation == 'mean':
+            return np.cumsum(leaf_values, axis=1)[:, -1] / len(self.roots)
+
+        stages = np.empty((len(X_compare), len(self.roots) + 1), dtype=np.float64)
+        stages[:, 0] = self.init
+        stages[:, 1:] = self.learning_rate * leaf_values
+        return np.cumsum(stages, axis=1)[:, -1]
+
+def export_tree_ensemble(model) -> Optional[TreeEnsemble]:
+    """
+    学習済みの決定木アンサンブルを連続した配列に展開する
+    対応していないモデルの場合はNoneを返す
+    """
+    model_type = type(model).__name__
+
+    if model_type == 'RandomForestRegressor':
+        estimators = list(model.estimators_)
+        aggregation = 'mean'
+        init = 0.0
+        learning_rate = 1.0
+    elif model_type == 'GradientBoostingRegressor':
+        # 初期値が定数になるモデル（DummyRegressorまたはzero）のみ対応
+        if model.init_ != 'zero' and type(model.init_).__name__ != 'DummyRegressor':
+            return None
+        if model.estimators_.shape[1] != 1:
+            return None
+        estimators = list(model.estimators_[:, 0])
+        aggregation = 'sum'
+        init = float(model._raw_predict_init(np.zeros((1, model.n_features_in_), dtype=np.float32))[0, 0])
+        learning_rate = float(model.learning_rate)
+    else:
+        return None
+
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+
+    for estimator in estimators:
+        tree = estimator.tree_
+        node_ids = np.arange(tree.node_count)
+        is_leaf = tree.children_left == -1
+
+        # 葉は自分自身を指すようにして、全ての木を同じ反復回数で評価できるようにする
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+        lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+        rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+        values.append(tree.value[:, 0, 0])
+        roots.append(offset)
+
+        offset += tree.node_count
+        max_depth = max(max_depth, tree.max_depth)
+
+    return TreeEnsemble({
+        'feature': np.concatenate(features).astype(np.int32),
+        'threshold': np.concatenate(thresholds).astype(np.float64),
+        'left': np.concatenate(lefts).astype(np.int32),
+        'right': np.concatenate(rights).astype(np.int32),
+        'value': np.concatenate(values).astype(np.float64),
+        'roots': np.array(roots, dtype=np.int32),
+        'aggregation': np.array(aggregation),
+        'init': np.array(init),
+        'learning_rate': np.array(learning_rate),
+        'max_depth': np.array(max_depth),
+        'n_features': np.array(model.n_features_in_)
+    })
+
+def make_probe_rows(mean: np.ndarray, scale: np.ndarray, n_samples: int = 2000) -> np.ndarray:
+    """予測値の一致確認に使う入力（元の特徴量空間）を作成する"""
+    rng = np.random.default_rng(0)
+    X = rng.normal(mean, scale, size=(n_samples, len(mean)))
+
+    # カテゴリのコードや築年数のような整数値の入力も確認する
+    return np.vstack([X, np.round(X)])
+
+def save_tree_ensemble(ensemble: TreeEnsemble, file_path: str):
+    """展開済みの配列をnpz形式で保存する"""
+    np.savez(file_path, **ensemble.arrays)
+
+def load_tree_ensemble(file_path: str) -> TreeEnsemble:
+    """npz形式で保存した配列を読み込む"""
+    with np.load(file_path, allow_pickle=False) as data:
+        return TreeEnsemble({key: data[key] for key in data.files})
+
+def fuse_scaler(ensemble: TreeEnsemble, mean: np.ndarray, scale: np.ndarray) -> TreeEnsemble:
+    """
+    StandardScalerを畳み込み、閾値を元の特徴量空間に変換したアンサンブルを作成する
+    （変換後の閾値は標準化前のfloat64の入力と比較する）
+    """
+    arrays = dict(ensemble.arrays)
+    internal = arrays['left'] != np.arange(len(arrays['left']))
+    features = arrays['feature'][internal]
+
+    threshold = arrays['threshold'].copy()
+    threshold[internal] = map_threshold_to_raw(threshold[internal], mean[features], scale[features])
+    arrays['threshold'] = threshold
+    arrays['compare_dtype'] = np.array('float64')
+    return TreeEnsemble(arrays)
+
+def split_thresholds(ensemble: TreeEnsemble, feature: int) -> np.ndarray:
+    """特徴量 feature で分岐する内部ノードの閾値（重複なし、昇順）"""
+    internal = ensemble.left != np.arange(len(ensemble.left))
+    return np.unique(ensemble.threshold[internal & (ensemble.feature == feature)])
+
+def hist_gradient_boosting_split_thresholds(model) -> Optional[Dict[int, np.ndarray]]:
+    """
+    HistGradientBoostingRegressor（カテゴリを変換するColumnTransformerとのPipelineを含む）の
+    数値特徴量の分岐の閾値を、入力の列番号ごとに返す（重複なし、昇順）。対応していないモデルの場合はNone
+    HistGradientBoostingRegressorはfloat64の入力を閾値と直接比較する（入力 <= 閾値 で左）
+    """
+    columns = None
+    if type(model).__name__ == 'Pipeline':
+        if len(model.steps) != 2 or type(model.steps[0][1]).__name__ != 'ColumnTransformer':
+            return None
+        transformer = model.steps[0][1]
+        # ColumnTransformerの出力の列 -> 入力の列（変換器の順に並び、1列を1列に変換する場合のみ対応）
+        columns = []
+        for _, step, step_columns in transformer.transformers_:
+            if isinstance(step, str) and step == 'drop':
+                continue
+            try:
+                columns.extend(np.arange(transformer.n_features_in_)[step_columns].tolist())
+            except (IndexError, TypeError):
+                return None
+        model = model.steps[1][1]
+        if len(columns) != model.n_features_in_:
+            return None
+    if type(model).__name__ != 'HistGradientBoostingRegressor':
+        return None
+
+    nodes = np.concatenate([predictor.nodes for predictors in model._predictors for predictor in predictors])
+    numerical = (nodes['is_leaf'] == 0) & (nodes['is_categorical'] == 0)
+    thresholds = {}
+    for feature in np.unique(nodes['feature_idx'][numerical]):
+        column = columns[feature] if columns is not None else int(feature)
+        thresholds[column] = np.unique(nodes['num_threshold'][numerical & (nodes['feature_idx'] == feature)])
+    return thresholds
+
+def _float64_to_keys(x: np.ndarray) -> np.ndarray:
+    """float64の値を大小関係を保った整数に変換する"""
+    bits = x.view(np.int64)
+    return np.where(bits < 0, -(bits & 0x7FFFFFFFFFFFFFFF), bits)
+
+def _keys_to_float64(keys: np.ndarray) -> np.ndarray:
+    """_float64_to_keysの逆変換"""
+    bits = np.where(keys < 0, (-keys) | np.int64(-0x8000000000000000), keys)
+    return bits.astype(np.int64).view(np.float64)
+
+def map_threshold_to_raw(threshold: np.ndarray, mean: np.ndarray, scale: np.ndarray) -> np.ndarray:
+    """
+    標準化後の空間の分岐閾値を元の特徴量空間の閾値に変換する
+
+    sklearnの決定木はfloat64で標準化した特徴量をfloat32に変換して比較するため、t * scale + mean では
+    閾値がデータ点と一致する場合に丸め誤差で分岐が変わることがある。
+    そこで float32((x - mean) / scale) <= t を満たす最大のfloat64値 x を二分探索で求める
+    （x に対して単調なので、float64の入力を x <= 変換後の閾値 で比較すれば分岐が一致する。
+    float32に変換した入力と比較するとfloat32で表せない入力で分岐が変わることがあるため、float64で比較すること）
+    """
+    def goes_left(x):
+        with np.errstate(over='ignore', invalid='ignore'):
+            scaled = ((x - mean) / scale).astype(np.float32)
+        return scaled <= threshold
+
+    # float64の最小値（左へ進む）と最大値（右へ進む）の間で探索する
+    max_key = int(_float64_to_keys(np.array([np.finfo(np.float64).max]))[0])
+    lo = np.full(len(threshold), -max_key, dtype=np.int64)
+    hi = np.full(len(threshold), max_key, dtype=np.int64)
+
+    # hi - lo と lo + hi はint64の範囲を超えることがあるため、比較と中点の計算を分けて行う
+    while np.any(hi - 1 > lo):
+        mid = lo // 2 + hi // 2 + (lo % 2 + hi % 2) // 2
+        left = goes_left(_keys_to_float64(mid))
+        lo = np.where(left, mid, lo)
+        hi = np.where(left, hi, mid)
+
+    return _keys_to_float64(lo)